@@ -0,0 +1,103 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import instrument
+from extract import auto_split_items, run_extraction, select_parts, resolve_workers
+from encoders import EncodeStats, resolve_preset, BILEVEL
+import dedup
+
+DOCS_IN_FLIGHT = 2   # PDFs being rendered/scanned/encoded at once; each holds one bounded page cache
+
+class _Stopped(Exception):
+    pass
+
+# --- PER-DOCUMENT RESULT ---
+class DocResult:
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.written = []
+        self.stats = EncodeStats()
+        self.error = None      # "Type: message" when the PDF failed
+        self.duplicates = []   # [(item, label of the earlier copy)], see dedup.py
+
+# --- MULTI-PDF BATCH (no gallery) ---
+# Every PDF is auto-split and its parts picked by `rule` (extract.PART_RULES). Documents run
+# on `docs` threads that share one process pool of `workers` processes: while one document's
+# parts are cropped and encoded in the pool, the next one is rasterized and scanned, so the
+# stages overlap across documents instead of running PDF after PDF.
+#   target(pdf) -> (out_dir, base_name); outputs are <base_name>_p<n>[_<sub>].<ext>
+#   (fmt "PDF": <base_name>.pdf with every part, or one file per part without `combine`)
+#   progress(done, total, result) after each finished PDF, from the calling thread; an
+#   exception raised from it (e.g. a cancelled job) stops the batch
+# Parts already extracted (earlier in the batch or in an earlier run) are reported in
+# DocResult.duplicates, and left out with dedup="skip" (default PDFCONV_DEDUP).
+# A PDF that fails is recorded in its DocResult; the others carry on. Returns the results
+# in input order.
+def run_batch_extraction(pdfs, target, fmt, rule="all", poppler_path=None, renderer=None, dpi=300,
+                         workers=None, progress=None, preset=None, bilevel=None, docs=DOCS_IN_FLIGHT, combine=True,
+                         dedup_mode=None):
+    from page_cache import PageRenderCache
+    preset = resolve_preset(preset)
+    if bilevel is None: bilevel = BILEVEL
+    dedup_mode = dedup.resolve_mode(dedup_mode)
+    index = dedup.seen_index("extract") if dedup_mode != "off" else None
+    workers = resolve_workers(workers)
+    results = [DocResult(pdf) for pdf in pdfs]
+    stop = threading.Event()
+    trace = instrument.current()
+
+    def check(*args):
+        if stop.is_set(): raise _Stopped()
+
+    def process(res, pool):
+        instrument.attach(trace)
+        try:
+            cache = PageRenderCache(res.pdf, poppler_path, dpi=dpi, renderer=renderer)
+        except Exception as e:
+            res.error = f"{type(e).__name__}: {e}"
+            return res
+        try:
+            with instrument.span("document", file=os.path.basename(res.pdf)):
+                items = auto_split_items(cache, cache.page_count(), progress=check, fingerprint=index is not None)
+                items = select_parts(items, rule)
+                if index is not None:
+                    # Vector-split pages are only rendered at preview resolution for this
+                    dedup.hash_parts(cache, items)
+                    items, res.duplicates = dedup.filter_parts(res.pdf, items, dedup_mode, index)
+                out_dir, base_name = target(res.pdf)
+                os.makedirs(out_dir, exist_ok=True)
+                res.written = run_extraction(cache, items, out_dir, base_name, fmt, workers=workers, progress=check,
+                                             preset=preset, bilevel=bilevel, stats=res.stats, pool=pool, combine=combine)
+                if index is not None: dedup.record_parts(res.pdf, items, res.duplicates, index)
+        except _Stopped:
+            raise
+        except Exception as e:
+            res.error = f"{type(e).__name__}: {e}"
+        finally:
+            cache.close()
+            instrument.attach(None)
+        return res
+
+    done = 0
+    pending = set()
+    queue = iter(results)
+    with ProcessPoolExecutor(max_workers=workers, **instrument.pool_kwargs()) as pool, \
+         ThreadPoolExecutor(max_workers=max(1, docs)) as threads:
+        try:
+            while True:
+                for res in queue:
+                    pending.add(threads.submit(process, res, pool))
+                    if len(pending) >= docs: break
+                if not pending: break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    res = fut.result()
+                    done += 1
+                    if progress: progress(done, len(results), res)
+        except BaseException:
+            # Documents in flight stop at their next page; their queued pages are dropped
+            stop.set()
+            for fut in pending: fut.cancel()
+            raise
+    return results
@@ -0,0 +1,116 @@
+# Pages/sec and peak memory of each PDF renderer backend on the same documents.
+# Usage: python benchmarks/bench_render.py [file.pdf ...] [--pages N] [--dpi 300]
+# Without files a synthetic label PDF is generated. Each backend runs in a fresh process
+# so peak RSS is not shared; poppler's pdftoppm children are reported separately.
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import renderers
+
+# --- SYNTHETIC DOCUMENT ---
+def make_label_pdf(path, pages, seed=1234):
+    rng = random.Random(seed)
+    if renderers.PYMUPDF_AVAIL:
+        # Vector pages: text blocks plus a separator rule, like carrier-generated labels
+        doc = renderers.pymupdf.open()
+        for _ in range(pages):
+            page = doc.new_page(width=612, height=792)
+            for _ in range(rng.randint(20, 60)):
+                x, y = rng.randint(20, 500), rng.randint(20, 760)
+                page.insert_text((x, y), "SHIP TO 1234 MAIN ST", fontsize=rng.randint(7, 14))
+            y = rng.randint(250, 550)
+            page.draw_rect((10, y, 602, y + 2), color=(0, 0, 0), fill=(0, 0, 0))
+        doc.set_metadata({})           # no creation date / random ID: same seed, same bytes
+        doc.save(path, no_new_id=True)
+        doc.close()
+        return
+    # No PyMuPDF: image pages through the merge writer
+    from bench_split import make_label_page
+    from merge import merge_images_to_pdf
+    folder = tempfile.mkdtemp(prefix="pdfconv_bench_render_")
+    try:
+        imgs = []
+        for i in range(pages):
+            p = os.path.join(folder, f"{i}.png")
+            make_label_page(rng).save(p)
+            imgs.append(p)
+        merge_images_to_pdf(imgs, path)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+# --- ONE BACKEND (child process) ---
+def peak_rss_mb(children=False):
+    try: import resource
+    except ImportError: return None  # Windows
+    kb = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return kb / (1024 * 1024) if sys.platform == "darwin" else kb / 1024
+
+def worker(backend, pdf, dpi, chunk, poppler):
+    r = renderers.open_renderer(pdf, poppler, backend)
+    total = r.page_count()
+    t0 = time.perf_counter()
+    for first in range(1, total + 1, chunk):
+        imgs = r.render(first, min(first + chunk - 1, total), dpi)
+        del imgs
+    seconds = time.perf_counter() - t0
+    r.close()
+    print(json.dumps({"pages": total, "seconds": seconds,
+                      "rss_mb": peak_rss_mb(), "children_rss_mb": peak_rss_mb(children=True)}))
+
+def run_backend(backend, pdf, args):
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", backend, "--dpi", str(args.dpi),
+           "--chunk", str(args.chunk), pdf]
+    if args.poppler: cmd += ["--poppler", args.poppler]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None, (proc.stderr.strip().splitlines() or ["failed"])[-1]
+    return json.loads(proc.stdout.strip().splitlines()[-1]), None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdfs", nargs="*")
+    ap.add_argument("--pages", type=int, default=20, help="Pages in the synthetic PDF")
+    ap.add_argument("--dpi", type=int, default=300)
+    ap.add_argument("--chunk", type=int, default=4, help="Pages per render call (as the gallery does)")
+    ap.add_argument("--poppler", default=None, help="Folder containing pdftoppm")
+    ap.add_argument("--worker", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.pdfs[0], args.dpi, args.chunk, args.poppler)
+        return 0
+
+    folder = None
+    pdfs = args.pdfs
+    if not pdfs:
+        folder = tempfile.mkdtemp(prefix="pdfconv_bench_render_")
+        pdfs = [os.path.join(folder, "labels.pdf")]
+        make_label_pdf(pdfs[0], args.pages)
+
+    try:
+        for pdf in pdfs:
+            print(f"{os.path.basename(pdf)} @ {args.dpi} DPI")
+            for backend in renderers.BACKENDS:
+                res, err = run_backend(backend, pdf, args)
+                if not res:
+                    print(f"  {backend:<8} skipped ({err})")
+                    continue
+                rss = f"{res['rss_mb']:.0f} MB" if res["rss_mb"] is not None else "n/a"
+                child = f" + {res['children_rss_mb']:.0f} MB in pdftoppm" if res["children_rss_mb"] else ""
+                print(f"  {backend:<8} {res['pages'] / res['seconds']:7.2f} pages/s   peak RSS {rss}{child}")
+    finally:
+        if folder: shutil.rmtree(folder, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
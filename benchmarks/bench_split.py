@@ -0,0 +1,110 @@
+# Timing of the split detection engines, and the synthetic pages tests/test_splitter.py checks
+# them on (engine equivalence, known 4-up boxes).
+# Usage: python benchmarks/bench_split.py [--pages N]
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+import splitter
+
+PAGE_SIZE = (612, 792)  # Letter @ 72 DPI
+
+# --- SYNTHETIC PAGES ---
+def make_label_page(rng):
+    w, h = PAGE_SIZE
+    img = Image.new("RGB", (w, h), "white")
+    d = ImageDraw.Draw(img)
+    # Text-ish blocks above and below
+    for _ in range(rng.randint(20, 60)):
+        x = rng.randint(0, w - 60)
+        y = rng.randint(0, h - 10)
+        d.rectangle((x, y, x + rng.randint(10, 60), y + rng.randint(2, 6)), fill="black")
+    # The separator (sometimes missing, sometimes thick, sometimes off-band)
+    kind = rng.random()
+    if kind < 0.8:
+        y = rng.randint(int(h * 0.2), int(h * 0.8))
+        # Clear a quiet zone so the isolation check can pass
+        d.rectangle((0, y - 14, w, y + 14), fill="white")
+        d.rectangle((rng.randint(0, 40), y, w - rng.randint(0, 40), y + rng.randint(0, 3)), fill="black")
+    return img
+
+def make_photo_page(rng):
+    w, h = PAGE_SIZE
+    img = Image.new("RGB", (w, h), (rng.randint(120, 200),) * 3)
+    d = ImageDraw.Draw(img)
+    # Tire-tread style: many strong horizontal lines packed together
+    y = rng.randint(0, 40)
+    while y < h:
+        d.rectangle((0, y, w, y + rng.randint(1, 4)), fill=(rng.randint(0, 60),) * 3)
+        y += rng.randint(5, 14)
+    for _ in range(200):
+        x, yy = rng.randint(0, w), rng.randint(0, h)
+        d.ellipse((x, yy, x + 8, yy + 8), fill=(rng.randint(0, 255),) * 3)
+    return img
+
+def make_four_up(rng):
+    # Four labels on one sheet, split by a full-width and a full-height rule. Returns the page
+    # and the boxes grid mode must find, in reading order.
+    w, h = PAGE_SIZE
+    img = Image.new("RGB", (w, h), "white")
+    d = ImageDraw.Draw(img)
+    xr, yr = rng.randint(int(w * 0.4), int(w * 0.6)), rng.randint(int(h * 0.4), int(h * 0.6))
+    t = rng.randint(0, 2)
+    for x0, y0, x1, y1 in ((0, 0, xr, yr), (xr + t, 0, w, yr), (0, yr + t, xr, h), (xr + t, yr + t, w, h)):
+        # Text-ish blocks kept clear of the rules and the sheet edge
+        for _ in range(rng.randint(10, 25)):
+            x = rng.randint(x0 + 16, x1 - 76)
+            y = rng.randint(y0 + 16, y1 - 22)
+            d.rectangle((x, y, x + rng.randint(10, 60), y + rng.randint(2, 6)), fill="black")
+    d.rectangle((0, yr, w, yr + t), fill="black")
+    d.rectangle((xr, 0, xr + t, h), fill="black")
+    expected = [(0, 0, xr - 2, yr - 2), (xr + t + 2, 0, w, yr - 2),
+                (0, yr + t + 2, xr - 2, h), (xr + t + 2, yr + t + 2, w, h)]
+    return img, expected
+
+def build_corpus(n, seed=1234):
+    rng = random.Random(seed)
+    pages = []
+    for i in range(n):
+        pages.append(make_label_page(rng) if i % 3 else make_photo_page(rng))
+    return pages
+
+# --- RUN ---
+def time_engine(fn, pages):
+    t0 = time.perf_counter()
+    out = [fn(p) for p in pages]
+    return out, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=60)
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    if not splitter.NUMPY_AVAIL:
+        print("numpy not installed; nothing to compare.")
+        return 1
+
+    pages = build_corpus(args.pages, args.seed)
+    ref, t_ref = time_engine(splitter.detect_split_structure_py, pages)
+    vec, t_vec = time_engine(splitter.detect_split_structure_np, pages)
+    print(f"pages: {len(pages)}  split: {sum(1 for r in vec if len(r) > 1)}")
+    print(f"reference: {t_ref * 1000 / len(pages):8.2f} ms/page")
+    print(f"numpy:     {t_vec * 1000 / len(pages):8.2f} ms/page  ({t_ref / max(t_vec, 1e-9):.1f}x)")
+
+    for mode in ("rows", "grid"):
+        splitter.SPLIT_ENGINE = "py"
+        ref, t_ref = time_engine(lambda p: splitter.detect_split_structure(p, mode=mode), pages)
+        splitter.SPLIT_ENGINE = "auto"
+        vec, t_vec = time_engine(lambda p: splitter.detect_split_structure(p, mode=mode), pages)
+        print(f"{mode + ':':<10} {t_vec * 1000 / len(pages):8.2f} ms/page numpy, {t_ref * 1000 / len(pages):.2f} reference  "
+              f"regions: {sum(len(r) for r in vec)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
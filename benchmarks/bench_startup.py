@@ -0,0 +1,97 @@
+# Startup cost of the GUI: per-module import time and time-to-first-frame.
+# Usage: python benchmarks/bench_startup.py [--runs N] [--json out.json] [--compare baseline.json]
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WATCH = ["customtkinter", "tkinter", "tkinterdnd2", "PIL", "pillow_heif", "pdf2image", "img2pdf",
+         "numpy", "pymupdf", "splitter", "renderers", "page_cache", "extract", "convert", "merge"]
+
+# --- IMPORT COST (python -X importtime) ---
+def import_costs(module="main"):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    costs = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line: continue
+        parts = line.split("|")
+        try: cumulative = int(parts[1])
+        except ValueError: continue
+        name = parts[2].strip()
+        top = name.split(".")[0]
+        # Children are listed before their parent; the package's own line has the largest cumulative
+        if top in WATCH:
+            costs[top] = max(costs.get(top, 0.0), cumulative / 1000.0)
+    total = None
+    for line in proc.stderr.splitlines():
+        if line.rstrip().endswith(f"| {module}"):
+            total = int(line.split("|")[1]) / 1000.0
+    return total, costs
+
+# --- TIME TO FIRST FRAME (PDFCONV_STARTUP_PROBE) ---
+def first_frame(runs):
+    env = dict(os.environ, PDFCONV_STARTUP_PROBE="1")
+    wall, inproc = [], []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "main.py"], cwd=ROOT, env=env, capture_output=True, text=True)
+        t1 = time.perf_counter()
+        marker = [l for l in proc.stdout.splitlines() if l.startswith("first_frame ")]
+        if proc.returncode != 0 or not marker:
+            return None, (proc.stderr.strip().splitlines() or ["no output"])[-1]
+        wall.append((t1 - t0) * 1000)
+        inproc.append(float(marker[0].split()[1]) * 1000)
+    return {"wall_ms": statistics.median(wall), "in_process_ms": statistics.median(inproc)}, None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--json", help="Write results to this file")
+    ap.add_argument("--compare", help="Baseline JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.20, help="Allowed slowdown vs baseline (0.20 = 20%%)")
+    args = ap.parse_args()
+
+    # Import cost is noisy on a cold cache; take the best of a few runs
+    samples = [import_costs() for _ in range(max(1, min(args.runs, 3)))]
+    total = min(s[0] for s in samples if s[0] is not None)
+    modules = {}
+    for _, costs in samples:
+        for k, v in costs.items():
+            modules[k] = min(v, modules.get(k, v))
+
+    print(f"import main: {total:8.1f} ms")
+    for name, ms in sorted(modules.items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<16}{ms:8.1f} ms")
+
+    frame, err = first_frame(args.runs)
+    if frame:
+        print(f"first frame: {frame['wall_ms']:8.1f} ms wall  ({frame['in_process_ms']:.1f} ms in-process)")
+    else:
+        print(f"first frame: skipped ({err})")
+
+    result = {"import_main_ms": total, "modules_ms": modules, "first_frame": frame}
+    if args.json:
+        with open(args.json, "w") as f: json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f: base = json.load(f)
+        checks = [("import_main_ms", total, base.get("import_main_ms"))]
+        if frame and base.get("first_frame"):
+            checks.append(("first_frame.wall_ms", frame["wall_ms"], base["first_frame"]["wall_ms"]))
+        regressed = False
+        for name, now, before in checks:
+            if not before: continue
+            delta = (now - before) / before
+            flag = "REGRESSION" if delta > args.threshold else "ok"
+            regressed |= delta > args.threshold
+            print(f"{name}: {before:.1f} -> {now:.1f} ms ({delta:+.0%}) {flag}")
+        return 1 if regressed else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
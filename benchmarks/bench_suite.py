@@ -0,0 +1,287 @@
+# Reproducible benchmark suite: deterministic synthetic corpora, throughput + peak memory
+# per stage, a machine-readable baseline and regression flags.
+#
+#   python benchmarks/bench_suite.py --save baseline.json          # record a baseline
+#   python benchmarks/bench_suite.py --compare baseline.json       # exit 1 on regressions
+#   python benchmarks/bench_suite.py --quick --cases split,merge   # smaller corpus, subset
+#
+# Every case runs in a fresh child process so its peak RSS is its own. Corpora are generated
+# offline from fixed seeds (pure Python RNG, no Image.effect_noise), so two machines benchmark
+# byte-identical inputs; CORPUS_VERSION changes whenever the generators do.
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CORPUS_VERSION = 1
+SEED = 20240601
+CASES = ["split", "preview", "extract", "merge", "convert"]
+
+# --- CORPUS ---
+# Sizes per mode: (label pages, tread photos, photo count, photo size)
+SIZES = {"full": (24, 12, 12, (3000, 2000)), "quick": (8, 4, 4, (1200, 800))}
+
+def _noise_bytes(rng, n, lo, hi):
+    # randbytes is fast; fold into [lo, hi] with a lookup table
+    table = bytes(lo + (i * (hi - lo + 1) >> 8) for i in range(256))
+    return rng.randbytes(n).translate(table)
+
+def make_photo(rng, size):
+    # Gradient + grain + a few tread-like bands: compresses like a real photo
+    from PIL import Image, ImageDraw
+    base = Image.linear_gradient("L").resize(size)
+    grain = Image.frombytes("L", size, _noise_bytes(rng, size[0] * size[1], 0, 255))
+    img = Image.merge("RGB", (Image.blend(base, grain, 0.35), Image.blend(base, grain, 0.25), base))
+    d = ImageDraw.Draw(img)
+    y = rng.randint(0, size[1] // 4)
+    for _ in range(rng.randint(3, 8)):
+        d.rectangle((0, y, size[0], y + rng.randint(2, 10)), fill=(rng.randint(0, 60),) * 3)
+        y += rng.randint(10, 60)
+    return img
+
+def build_corpus(folder, mode):
+    from bench_split import make_label_page, make_photo_page
+    from bench_render import make_label_pdf
+    n_labels, n_treads, n_photos, photo_size = SIZES[mode]
+    manifest_path = os.path.join(folder, "manifest.json")
+    try:
+        with open(manifest_path) as f: manifest = json.load(f)
+        if manifest.get("version") == CORPUS_VERSION and manifest.get("mode") == mode: return manifest
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    rng = random.Random(SEED)
+
+    # Split detection: raster label pages (single label / label + instructions) and tread photos
+    pages_dir = os.path.join(folder, "pages")
+    os.makedirs(pages_dir)
+    pages = []
+    for i in range(n_labels):
+        p = os.path.join(pages_dir, f"label_{i:03d}.png")
+        make_label_page(rng).save(p)
+        pages.append(p)
+    for i in range(n_treads):
+        p = os.path.join(pages_dir, f"tread_{i:03d}.png")
+        make_photo_page(rng).save(p)
+        pages.append(p)
+
+    # Carrier-style PDF (vector if PyMuPDF is available, image pages otherwise)
+    pdf = os.path.join(folder, "labels.pdf")
+    make_label_pdf(pdf, n_labels, seed=SEED)
+
+    # Photo sets: JPEG, PNG and (if pillow_heif is installed) HEIC copies of the same photos
+    photos = {"jpeg": [], "png": [], "heic": []}
+    try:
+        from convert import ensure_heif
+        ensure_heif()
+        heif = True
+    except ImportError:
+        heif = False
+    photo_dir = os.path.join(folder, "photos")
+    os.makedirs(photo_dir)
+    for i in range(n_photos):
+        img = make_photo(rng, photo_size)
+        for ext, kwargs in (("jpeg", {"quality": 90}), ("png", {"compress_level": 6}), ("heic", {"quality": 80})):
+            if ext == "heic" and not heif: continue
+            p = os.path.join(photo_dir, f"photo_{i:03d}.{ext}")
+            if ext == "heic":
+                # x265 at its default preset takes seconds per grainy photo; decode cost is what we measure
+                try: img.save(p, enc_params={"preset": "ultrafast"}, **kwargs)
+                except Exception: img.save(p, **kwargs)
+            else:
+                img.save(p, **kwargs)
+            photos[ext].append(p)
+
+    manifest = {"version": CORPUS_VERSION, "mode": mode, "seed": SEED, "pages": pages, "pdf": pdf,
+                "photos": {k: v for k, v in photos.items() if v}}
+    with open(manifest_path, "w") as f: json.dump(manifest, f, indent=1)
+    return manifest
+
+# --- CASES (run in a child process) ---
+# Each returns (units, unit name); the parent measures nothing but wall time and RSS.
+def case_split(m, out):
+    from PIL import Image
+    from splitter import detect_split_structure
+    imgs = [Image.open(p).convert("RGB") for p in m["pages"]]
+    t0 = time.perf_counter()
+    for img in imgs: detect_split_structure(img)
+    return len(imgs), "pages", time.perf_counter() - t0
+
+def _poppler():
+    # Only consulted by the poppler backend; a missing pdftoppm fails the case (reported as skipped)
+    from page_cache import find_poppler
+    return find_poppler() or None
+
+def case_preview(m, out):
+    # What the gallery does: render in chunks at 300 DPI, downscale, detect, keep tile
+    # thumbnails in a ThumbStore (main.py THUMB_SIZE; nothing is written unless it spills)
+    from page_cache import PageRenderCache
+    from splitter import detect_split_page
+    from thumbs import ThumbStore
+    pop = _poppler()
+    t0 = time.perf_counter()
+    cache = PageRenderCache(m["pdf"], pop)
+    store = ThumbStore()
+    total = cache.page_count()
+    for first in range(1, total + 1, 4):
+        for page_num, high in cache.render_range(first, min(first + 3, total)).items():
+            p = cache.preview(page_num, high)
+            for idx, box in enumerate(detect_split_page(p, cache.vector_info(page_num))):
+                segment = p.crop(box)
+                segment.thumbnail((120, 160), reducing_gap=2.0)
+                store.put(f"p{page_num}_{idx}", segment)
+    store.close()
+    cache.close()
+    return total, "pages", time.perf_counter() - t0
+
+def case_extract(m, out):
+    from page_cache import PageRenderCache
+    from extract import auto_split_items, run_extraction
+    pop = _poppler()
+    t0 = time.perf_counter()
+    cache = PageRenderCache(m["pdf"], pop)
+    total = cache.page_count()
+    items = auto_split_items(cache, total)
+    run_extraction(cache, items, out, "bench", "PNG")
+    cache.close()
+    return total, "pages", time.perf_counter() - t0
+
+def case_merge(m, out):
+    from merge import merge_images_to_pdf
+    imgs = m["photos"]["jpeg"] + m["photos"]["png"]
+    t0 = time.perf_counter()
+    merge_images_to_pdf(imgs, os.path.join(out, "merged.pdf"))
+    return len(imgs), "images", time.perf_counter() - t0
+
+def case_convert(m, out):
+    from convert import run_batch_convert
+    imgs = m["photos"].get("heic", []) + m["photos"]["png"]
+    t0 = time.perf_counter()
+    report = run_batch_convert(imgs, out, "JPEG")
+    if report.failed: raise RuntimeError(report.summary())
+    return len(imgs), "images", time.perf_counter() - t0
+
+def peak_rss_mb():
+    from instrument import peak_rss_mb as self_peak, children_peak_rss_mb
+    kids = children_peak_rss_mb() or 0.0
+    return max(self_peak() or 0.0, kids)   # pool workers count too
+
+def child(case, corpus_dir, mode):
+    m = build_corpus(corpus_dir, mode)
+    out = tempfile.mkdtemp(prefix="pdfconv_bench_out_")
+    try:
+        units, unit, seconds = globals()["case_" + case](m, out)
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+    print(json.dumps({"units": units, "unit": unit, "seconds": seconds,
+                      "throughput": units / seconds if seconds > 0 else 0.0, "peak_rss_mb": peak_rss_mb()}))
+
+# --- DRIVER ---
+def run_case(case, corpus_dir, mode, repeat):
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", case,
+                               "--corpus", corpus_dir] + (["--quick"] if mode == "quick" else []),
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            return None, (proc.stderr.strip().splitlines() or ["failed"])[-1]
+        res = json.loads(proc.stdout.strip().splitlines()[-1])
+        # Best throughput of the repeats; memory is the worst seen
+        if best is None or res["throughput"] > best["throughput"]:
+            res["peak_rss_mb"] = max(res["peak_rss_mb"], best["peak_rss_mb"]) if best else res["peak_rss_mb"]
+            best = res
+        else:
+            best["peak_rss_mb"] = max(best["peak_rss_mb"], res["peak_rss_mb"])
+    return best, None
+
+def environment():
+    versions = {}
+    for mod in ("PIL", "numpy", "pymupdf", "pillow_heif", "pdf2image"):
+        try: versions[mod] = __import__(mod).__version__
+        except Exception: versions[mod] = None
+    from renderers import backend_name
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "renderer": backend_name(), "versions": versions}
+
+def compare(results, base, threshold, mem_threshold):
+    regressions = []
+    if base.get("corpus") != results["corpus"]:
+        print("warning: baseline was recorded on a different corpus; numbers are not comparable")
+    if base.get("environment", {}).get("cpus") != results["environment"]["cpus"]:
+        print("warning: baseline was recorded with a different CPU count")
+    for case, now in results["cases"].items():
+        before = base.get("cases", {}).get(case)
+        if not now or not before: continue
+        d_tp = (now["throughput"] - before["throughput"]) / before["throughput"]
+        d_mem = (now["peak_rss_mb"] - before["peak_rss_mb"]) / before["peak_rss_mb"] if before["peak_rss_mb"] else 0.0
+        flags = []
+        if d_tp < -threshold: flags.append("THROUGHPUT")
+        if d_mem > mem_threshold: flags.append("MEMORY")
+        print(f"  {case:<8} {before['throughput']:8.2f} -> {now['throughput']:8.2f} {now['unit']}/s ({d_tp:+.0%})   "
+              f"{before['peak_rss_mb']:6.0f} -> {now['peak_rss_mb']:6.0f} MB ({d_mem:+.0%})   "
+              f"{'REGRESSION ' + '+'.join(flags) if flags else 'ok'}")
+        if flags: regressions.append(case)
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", default=",".join(CASES), help="Comma-separated subset of: " + ", ".join(CASES))
+    ap.add_argument("--quick", action="store_true", help="Small corpus (CI smoke run)")
+    ap.add_argument("--corpus", help="Folder to build/reuse the corpus in (default: a temp folder)")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per case; the best throughput is kept")
+    ap.add_argument("--save", help="Write results as a baseline JSON")
+    ap.add_argument("--compare", help="Baseline JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.15, help="Allowed throughput drop (0.15 = 15%%)")
+    ap.add_argument("--mem-threshold", type=float, default=0.25, help="Allowed peak memory growth")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    mode = "quick" if args.quick else "full"
+
+    if args.child:
+        child(args.child, args.corpus, mode)
+        return 0
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown: ap.error(f"unknown case(s): {', '.join(unknown)}")
+
+    corpus_dir = args.corpus or tempfile.mkdtemp(prefix="pdfconv_bench_corpus_")
+    try:
+        t0 = time.perf_counter()
+        build_corpus(corpus_dir, mode)
+        print(f"corpus v{CORPUS_VERSION} ({mode}) ready in {time.perf_counter() - t0:.1f}s: {corpus_dir}")
+        results = {"corpus": {"version": CORPUS_VERSION, "mode": mode, "seed": SEED},
+                   "environment": environment(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "cases": {}}
+        for case in cases:
+            res, err = run_case(case, corpus_dir, mode, max(1, args.repeat))
+            results["cases"][case] = res
+            if res:
+                print(f"  {case:<8} {res['throughput']:8.2f} {res['unit']}/s   {res['seconds']:7.2f}s   "
+                      f"peak RSS {res['peak_rss_mb']:6.0f} MB")
+            else:
+                print(f"  {case:<8} skipped ({err})")
+    finally:
+        if not args.corpus: shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, "w") as f: json.dump(results, f, indent=2)
+        print(f"baseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as f: base = json.load(f)
+        print(f"compared with {args.compare} (throughput -{args.threshold:.0%}, memory +{args.mem_threshold:.0%} allowed):")
+        if compare(results, base, args.threshold, args.mem_threshold): return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# Time per gallery thumbnail: reduced-scale decoding (EXIF thumbnail / JPEG draft / HEIF
+# embedded thumbnail) vs a full decode of the same files.
+# Usage: python benchmarks/bench_thumbs.py [--files N] [--size 4000x3000]
+import io
+import os
+import sys
+import time
+import struct
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+import thumbs
+from convert import ensure_heif
+
+TILE = (120, 120)
+
+# --- SYNTHETIC PHOTOS ---
+def exif_with_thumbnail(jpeg_bytes):
+    # Minimal little-endian TIFF: empty IFD0 -> IFD1 holding JPEGInterchangeFormat(+Length)
+    ifd1_at = 8 + 6
+    data_at = ifd1_at + 2 + 2 * 12 + 4
+    tiff = b"II*\x00" + struct.pack("<I", 8)
+    tiff += struct.pack("<HI", 0, ifd1_at)
+    tiff += struct.pack("<H", 2)
+    tiff += struct.pack("<HHII", 0x0201, 4, 1, data_at)
+    tiff += struct.pack("<HHII", 0x0202, 4, 1, len(jpeg_bytes))
+    tiff += struct.pack("<I", 0)
+    return b"Exif\x00\x00" + tiff + jpeg_bytes
+
+def make_photo(i, size):
+    # Noise over a gradient: compresses like a real photo (large entropy-coded data)
+    base = Image.linear_gradient("L").resize(size).convert("RGB")
+    noise = Image.effect_noise(size, 40 + i % 20).convert("RGB")
+    return Image.blend(base, noise, 0.5)
+
+def build_corpus(folder, n, size):
+    files = {"jpeg+exif": [], "jpeg": [], "heic": []}
+    heif = True
+    try:
+        ensure_heif()
+    except ImportError:
+        heif = False
+    for i in range(n):
+        img = make_photo(i, size)
+        small = img.copy(); small.thumbnail((160, 160))
+        buf = io.BytesIO(); small.save(buf, "JPEG", quality=85)
+        p = os.path.join(folder, f"exif_{i}.jpg")
+        img.save(p, "JPEG", quality=90, exif=exif_with_thumbnail(buf.getvalue()))
+        files["jpeg+exif"].append(p)
+        p = os.path.join(folder, f"plain_{i}.jpg")
+        img.save(p, "JPEG", quality=90)
+        files["jpeg"].append(p)
+        if heif:
+            p = os.path.join(folder, f"photo_{i}.heic")
+            img.save(p, quality=80)
+            files["heic"].append(p)
+    return {k: v for k, v in files.items() if v}
+
+# --- RUN ---
+def run(paths, mode, threads):
+    thumbs.THUMB_DECODE = mode
+    thumbs.STATS = thumbs.ThumbStats()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        sizes = list(pool.map(lambda p: thumbs.make_thumbnail(p, TILE).size, paths))
+    return time.perf_counter() - t0, sizes, thumbs.STATS.summary()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=8)
+    ap.add_argument("--size", default="4000x3000", help="Photo size (default 12 MP)")
+    ap.add_argument("--threads", type=int, default=min(4, os.cpu_count() or 2))
+    args = ap.parse_args()
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+
+    folder = tempfile.mkdtemp(prefix="pdfconv_bench_thumbs_")
+    try:
+        corpus = build_corpus(folder, args.files, size)
+        print(f"{args.files} photos per set at {size[0]}x{size[1]}, {args.threads} loader threads")
+        mismatches = 0
+        for kind, paths in corpus.items():
+            full_t, full_sizes, _ = run(paths, "full", args.threads)
+            fast_t, fast_sizes, how = run(paths, "auto", args.threads)
+            mismatches += sum(1 for a, b in zip(full_sizes, fast_sizes) if abs(a[0] - b[0]) > 1 or abs(a[1] - b[1]) > 1)
+            print(f"  {kind:<10} full {full_t / len(paths) * 1000:7.1f} ms/thumb   "
+                  f"reduced {fast_t / len(paths) * 1000:7.1f} ms/thumb   "
+                  f"x{full_t / fast_t:5.1f}   ({how})")
+        if mismatches:
+            print(f"{mismatches} thumbnails differ in size between the two paths")
+            return 1
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
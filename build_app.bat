@@ -40,7 +40,7 @@ call venv\Scripts\activate
 
 :: Install standard + new requirements (pillow-heif, tkinterdnd2)
 echo [INFO] Installing libraries...
-pip install customtkinter pdf2image img2pdf pyinstaller pillow packaging tkinterdnd2 pillow-heif
+pip install customtkinter pdf2image pyinstaller pillow packaging tkinterdnd2 pillow-heif numpy pymupdf watchdog
 
 :: --- 4. Auto-Generate Icon ---
 echo [STEP] Checking Icon...
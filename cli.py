@@ -0,0 +1,345 @@
+# Headless command line for the three conversion flows (no tkinter / customtkinter).
+#
+#   python -m cli extract "in/*.pdf" --format PNG --output "{dir}/labels/{stem}"
+#   python -m cli merge "photos/*.jpg" -o merged.pdf
+#   python -m cli convert "photos/*.heic" --format JPEG --output-dir "{dir}/jpeg"
+#   python -m cli watch inbox/ --output "{dir}/labels/{stem}" --jobs 2
+#   python -m cli cache --prune
+#
+# Exit status: 0 = everything converted, 1 = at least one input failed, 2 = usage error.
+import os
+import sys
+import glob
+import shutil
+import argparse
+import traceback
+
+P2I_FORMATS = ["PNG", "JPEG", "TIFF", "BMP", "PDF"]
+I2I_FORMATS = ["JPEG", "PNG", "TIFF", "BMP", "WEBP"]
+PRESETS = ["balanced", "fast", "small", "sharp"]   # encoders.PRESET_NAMES (not imported: keeps Pillow out of --help)
+DEDUP_MODES = ["off", "flag", "skip"]              # dedup.DEDUP_MODES
+
+# --- HELPERS ---
+def expand_inputs(patterns, exts=None):
+    # Returns (files, unmatched_patterns). Globs are expanded here so quoting works on Windows too.
+    files, missing = [], []
+    for pat in patterns:
+        hits = sorted(glob.glob(pat, recursive=True)) if glob.has_magic(pat) else ([pat] if os.path.isfile(pat) else [])
+        if exts: hits = [h for h in hits if h.lower().endswith(exts)]
+        if hits: files.extend(hits)
+        else: missing.append(pat)
+    seen = set()
+    return [f for f in files if not (f in seen or seen.add(f))], missing
+
+def fill_template(template, src_path):
+    src_dir = os.path.dirname(os.path.abspath(src_path))
+    name = os.path.basename(src_path)
+    return template.format(dir=src_dir, name=name, stem=os.path.splitext(name)[0])
+
+def resolve_poppler(arg):
+    if arg: return arg
+    from page_cache import find_poppler
+    found = find_poppler()
+    if found: return found
+    # Fall back to pdftoppm on PATH (server installs)
+    return None if shutil.which("pdftoppm") else ""
+
+def log(args, msg):
+    if not args.quiet: print(msg, file=sys.stderr)
+
+def open_dedup(args, scope):
+    # (mode, persistent index of the flow or None when off)
+    import dedup
+    mode = dedup.resolve_mode(args.dedup, images=scope != "extract")
+    return mode, dedup.seen_index(scope) if mode != "off" else None
+
+def log_duplicates(args, dups, mode, label):
+    for what, match in dups:
+        log(args, f"  {label(what)}: duplicate of {match}" + (" (skipped)" if mode == "skip" else ""))
+
+# --- COMMANDS ---
+def extract_one(pdf, args, pop, backend):
+    # Auto-split + extract one PDF (same steps as the PDF to Image card); returns the written paths.
+    # Its own trace run under `watch`, a span of the command's run otherwise.
+    from instrument import run
+    with run("extract"):
+        return _extract_one(pdf, args, pop, backend)
+
+def _extract_one(pdf, args, pop, backend):
+    from page_cache import PageRenderCache
+    from extract import auto_split_items, run_extraction, select_parts
+    from encoders import EncodeStats, row_text
+    import dedup
+
+    mode, index = open_dedup(args, "extract")
+    cache = PageRenderCache(pdf, pop, dpi=args.dpi, renderer=backend)
+    try:
+        total = cache.page_count()
+        items = auto_split_items(cache, total, progress=lambda d, t: log(args, f"  {os.path.basename(pdf)}: analyzed {d}/{t} pages"),
+                                 fingerprint=index is not None)
+        items = select_parts(items, args.parts)
+        dups = []
+        if index is not None:
+            dedup.hash_parts(cache, items)
+            items, dups = dedup.filter_parts(pdf, items, mode, index)
+            log_duplicates(args, dups, mode, lambda item: dedup.part_label(pdf, item))
+
+        target = fill_template(args.output, pdf)
+        out_dir = os.path.dirname(target) or "."
+        os.makedirs(out_dir, exist_ok=True)
+        stats = EncodeStats()
+        written = run_extraction(cache, items, out_dir, os.path.basename(target), args.format, workers=args.workers,
+                                 preset=args.preset, bilevel=None if args.bilevel is None else args.bilevel == "auto",
+                                 stats=stats, combine=not args.separate)
+        if index is not None: dedup.record_parts(pdf, items, dups, index)
+        for row in sorted(stats.rows): log(args, "  " + row_text(row))
+        log(args, f"  {stats.summary()}")
+        return written
+    finally:
+        cache.close()
+
+def resolve_backend(args):
+    # Returns (poppler_path, backend) or None after printing why rendering is impossible
+    from renderers import backend_name
+    try: backend = backend_name(args.renderer)
+    except (ValueError, ImportError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return None
+    pop = resolve_poppler(args.poppler)
+    if pop == "" and backend == "poppler":
+        print("error: Poppler not found (use --poppler DIR, or install pymupdf)", file=sys.stderr)
+        return None
+    return pop, backend
+
+def cmd_extract(args):
+    pdfs, missing = expand_inputs(args.inputs, (".pdf",))
+    failures = len(missing)
+    for pat in missing: print(f"error: no PDF matches {pat!r}", file=sys.stderr)
+
+    resolved = resolve_backend(args)
+    if not resolved: return 1
+    if len(pdfs) > 1: return 1 if extract_batch(pdfs, args, *resolved) or failures else 0
+
+    for pdf in pdfs:
+        try:
+            written = extract_one(pdf, args, *resolved)
+            log(args, f"{pdf}: {len(written)} images -> {os.path.dirname(fill_template(args.output, pdf)) or '.'}")
+        except Exception as e:
+            failures += 1
+            print(f"error: {pdf}: {type(e).__name__}: {e}", file=sys.stderr)
+            if args.verbose: traceback.print_exc()
+    return 1 if failures or not pdfs else 0
+
+def extract_batch(pdfs, args, pop, backend):
+    # Several PDFs: rendering of one overlaps with encoding of another (see batch.py)
+    from batch import run_batch_extraction
+    from encoders import row_text
+    import dedup
+
+    def target(pdf):
+        t = fill_template(args.output, pdf)
+        return os.path.dirname(t) or ".", os.path.basename(t)
+
+    def progress(done, total, res):
+        if res.error:
+            print(f"error: {res.pdf}: {res.error}", file=sys.stderr)
+            return
+        log_duplicates(args, res.duplicates, dedup.resolve_mode(args.dedup), lambda item: dedup.part_label(res.pdf, item))
+        for row in sorted(res.stats.rows): log(args, "  " + row_text(row))
+        log(args, f"{res.pdf}: {len(res.written)} images -> {target(res.pdf)[0]}  ({res.stats.summary()}) [{done}/{total}]")
+
+    results = run_batch_extraction(pdfs, target, args.format, rule=args.parts, poppler_path=pop, renderer=backend,
+                                   dpi=args.dpi, workers=args.workers, progress=progress, preset=args.preset,
+                                   bilevel=None if args.bilevel is None else args.bilevel == "auto", docs=args.docs,
+                                   combine=not args.separate, dedup_mode=args.dedup)
+    return 1 if any(r.error for r in results) else 0
+
+def cmd_watch(args):
+    from watch import FolderWatcher, WATCHDOG_AVAIL
+    if not WATCHDOG_AVAIL:
+        print("error: watchdog is not installed (pip install watchdog)", file=sys.stderr)
+        return 1
+    if not os.path.isdir(args.inbox):
+        print(f"error: not a folder: {args.inbox}", file=sys.stderr)
+        return 1
+    inbox = os.path.abspath(args.inbox)
+    # PDF output dropped into the inbox would be picked up as new input, again and again
+    out_dir = os.path.dirname(fill_template(args.output, os.path.join(inbox, "probe.pdf"))) or "."
+    if args.format == "PDF" and os.path.realpath(out_dir) == os.path.realpath(inbox):
+        print(f"error: --format PDF would write into the watched folder {inbox}; pass an --output outside it "
+              f"(e.g. \"{{dir}}/labels/{{stem}}\")", file=sys.stderr)
+        return 2
+    resolved = resolve_backend(args)
+    if not resolved: return 1
+
+    watcher = FolderWatcher(inbox, lambda pdf: len(extract_one(pdf, args, *resolved)),
+                            done_dir=args.done_dir.format(dir=inbox), failed_dir=args.failed_dir.format(dir=inbox),
+                            jobs=args.jobs, queue_size=args.queue,
+                            log=lambda msg: print(msg, file=sys.stderr) if msg.startswith("error") or not args.quiet else None)
+    return 1 if watcher.run() else 0
+
+def cmd_merge(args):
+    from merge import merge_images_to_pdf
+    import dedup
+
+    imgs, missing = expand_inputs(args.inputs)
+    for pat in missing: print(f"error: no image matches {pat!r}", file=sys.stderr)
+    if not imgs: return 1
+    mode, index = open_dedup(args, "merge")
+    if index is not None:
+        from extract import resolve_workers
+        imgs, dups, hashes = dedup.filter_images(imgs, mode, index, workers=resolve_workers(args.workers))
+        log_duplicates(args, dups, mode, os.path.basename)
+        if not imgs:
+            log(args, "every image is a duplicate; nothing to merge")
+            return 1 if missing else 0
+
+    out = fill_template(args.output, imgs[0])
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    try:
+        merge_images_to_pdf(imgs, out, progress=lambda d, t: log(args, f"  merged {d}/{t}"))
+    except Exception as e:
+        print(f"error: {type(e).__name__}: {e}", file=sys.stderr)
+        if args.verbose: traceback.print_exc()
+        return 1
+    if index is not None: dedup.record_images(imgs, dups, hashes, index)
+    log(args, f"{len(imgs)} pages -> {out}")
+    return 1 if missing else 0
+
+def cmd_convert(args):
+    from convert import run_batch_convert
+    from encoders import row_text
+    import dedup
+
+    imgs, missing = expand_inputs(args.inputs)
+    for pat in missing: print(f"error: no image matches {pat!r}", file=sys.stderr)
+    found = bool(imgs)
+    mode, index = open_dedup(args, "convert")
+    if index is not None:
+        from extract import resolve_workers
+        imgs, dups, hashes = dedup.filter_images(imgs, mode, index, workers=resolve_workers(args.workers))
+        log_duplicates(args, dups, mode, os.path.basename)
+
+    # Group by resolved output folder so templates like "{dir}/out" work across source folders
+    groups = {}
+    for img in imgs:
+        groups.setdefault(fill_template(args.output_dir, img), []).append(img)
+
+    failures = len(missing)
+    for out_dir, paths in groups.items():
+        os.makedirs(out_dir, exist_ok=True)
+        report = run_batch_convert(paths, out_dir, args.format, workers=args.workers, preset=args.preset,
+                                   progress=lambda r: log(args, f"  {r.status_text()}"))
+        for in_path, out_path, out_bytes, seconds in report.converted:
+            log(args, "  " + row_text((out_path, out_bytes, seconds, args.format)))
+        if index is not None: dedup.record_images([c[0] for c in report.converted], dups, hashes, index)
+        log(args, report.summary(max_failures=len(report.failed)))
+        failures += len(report.failed)
+    return 1 if failures or not found else 0
+
+def cmd_cache(args):
+    from split_cache import SplitCache
+    from splitter import detector_signature
+    from dedup import seen_index, SCOPES
+
+    db = SplitCache()
+    if args.clear:
+        db.clear()
+        log(args, f"cleared {db.root}")
+    elif args.prune:
+        log(args, f"removed {db.prune_stale(detector_signature())} stale entries")
+    seen = [seen_index(scope) for scope in SCOPES]
+    if args.forget_seen:
+        for index in seen: index.clear()
+        log(args, f"cleared {os.path.dirname(seen[0].path)}")
+    print(f"{db.root}: {db.size() / (1024 * 1024):.1f} MB")
+    for scope, index in zip(SCOPES, seen): print(f"{index.path}: {len(index)} {scope} fingerprints")
+    return 0
+
+# --- ENTRY POINT ---
+def build_parser():
+    ap = argparse.ArgumentParser(prog="pdfconv", description="Headless PDF and Image Converter")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    common.add_argument("-q", "--quiet", action="store_true", help="Only print errors")
+    common.add_argument("-v", "--verbose", action="store_true", help="Print tracebacks on failure")
+    common.add_argument("--trace", metavar="DIR", default=None, help="Write timing spans for each run to DIR (PDFCONV_TRACE_DIR)")
+    common.add_argument("--trace-format", choices=["chrome", "jsonl"], default=None, help="Span file format (default chrome)")
+    common.add_argument("--profile", action="store_true", default=None, help="Also save a cProfile capture per run (needs --trace)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    dedup = argparse.ArgumentParser(add_help=False)
+    dedup.add_argument("--dedup", type=str.lower, choices=DEDUP_MODES, default=None,
+                       help="Near-duplicates of parts/images already written: flag = report them, skip = leave them out "
+                            "(default for PDFs: PDFCONV_DEDUP or flag; for merge/convert, which need an extra decode "
+                            "of every image: PDFCONV_DEDUP_IMAGES or off)")
+
+    render = argparse.ArgumentParser(add_help=False)
+    render.add_argument("--output", default="{dir}/{stem}",
+                        help="Base name template; parts become <base>_p<n>[_<sub>].<ext> (fields: {dir} {stem} {name})")
+    render.add_argument("--format", type=str.upper, choices=P2I_FORMATS, default="PNG")
+    render.add_argument("--preset", type=str.lower, choices=PRESETS, default=None,
+                        help="Encoder speed/size preset (default: PDFCONV_PRESET or balanced)")
+    render.add_argument("--bilevel", choices=["auto", "off"], default=None,
+                        help="auto = write black-and-white parts as 1-bit PNG/BMP or Group 4 TIFF "
+                             "(default: PDFCONV_BILEVEL or auto)")
+    render.add_argument("--separate", action="store_true",
+                        help="With --format PDF: one PDF per part instead of all parts in <base>.pdf")
+    render.add_argument("--dpi", type=int, default=300, help="Render resolution (default 300)")
+    render.add_argument("--parts", choices=["all", "first", "last"], default="all", help="Which split parts to keep per page")
+    render.add_argument("--split", choices=["single", "rows", "grid"], default=None,
+                        help="single = one centre rule, rows = every horizontal rule, grid = rows + vertical rules "
+                             "(default: PDFCONV_SPLIT_MODE or single)")
+    render.add_argument("--poppler", default=None, help="Folder containing pdftoppm")
+    render.add_argument("--renderer", choices=["auto", "poppler", "pymupdf"], default=None,
+                        help="PDF rasterizer (default: PDFCONV_RENDERER or auto = PyMuPDF if installed)")
+
+    p = sub.add_parser("extract", parents=[common, render, dedup], help="Auto-split PDFs and save each part as an image")
+    p.add_argument("inputs", nargs="+", help="PDF files or glob patterns")
+    p.add_argument("--docs", type=int, default=2, help="PDFs in flight at once when several are given (they share --workers)")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("watch", parents=[common, render, dedup], help="Extract every PDF dropped into a folder (runs until Ctrl+C)")
+    p.add_argument("inbox", help="Folder to watch (not recursive)")
+    p.add_argument("--done-dir", default="{dir}/processed", help="Where finished PDFs are moved ({dir} = the inbox)")
+    p.add_argument("--failed-dir", default="{dir}/failed", help="Where PDFs that failed are moved ({dir} = the inbox)")
+    p.add_argument("--jobs", type=int, default=1, help="PDFs processed at once (each uses --workers processes)")
+    p.add_argument("--queue", type=int, default=32, help="Max PDFs queued in memory; a larger burst is rescanned later")
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("merge", parents=[common, dedup], help="Merge images into one PDF")
+    p.add_argument("inputs", nargs="+", help="Image files or glob patterns (merged in the order given)")
+    p.add_argument("-o", "--output", required=True, help="Output PDF path (fields: {dir} {stem} {name} of the first image)")
+    p.set_defaults(func=cmd_merge)
+
+    p = sub.add_parser("convert", parents=[common, dedup], help="Batch convert images to another format")
+    p.add_argument("inputs", nargs="+", help="Image files or glob patterns")
+    p.add_argument("--format", type=str.upper, choices=I2I_FORMATS, default="JPEG")
+    p.add_argument("--preset", type=str.lower, choices=PRESETS, default=None,
+                   help="Encoder speed/size preset (default: PDFCONV_PRESET or balanced)")
+    p.add_argument("--output-dir", default="{dir}", help="Output folder template (fields: {dir} {stem} {name})")
+    p.set_defaults(func=cmd_convert)
+
+    p = sub.add_parser("cache", parents=[common], help="Inspect or invalidate the split-detection cache")
+    p.add_argument("--prune", action="store_true", help="Delete entries made with other detector settings")
+    p.add_argument("--clear", action="store_true", help="Delete every entry")
+    p.add_argument("--forget-seen", action="store_true", help="Empty the index of parts/images already written (see --dedup)")
+    p.set_defaults(func=cmd_cache)
+    return ap
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    import instrument
+    instrument.configure(args.trace, args.trace_format, args.profile)
+    if getattr(args, "split", None):
+        import splitter
+        splitter.SPLIT_MODE = args.split
+    if args.command == "watch":
+        return args.func(args)  # one run per watched PDF
+    with instrument.run(args.command):
+        return args.func(args)
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
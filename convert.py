@@ -0,0 +1,158 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from PIL import Image
+
+from extract import resolve_workers, output_ext
+from instrument import span, pool_kwargs
+from encoders import encode, save_params, resolve_preset
+from strips import over_budget, band_rows, iter_bands, raw_band_reader, stream_mode, open_stream
+
+HEIF_EXTS = ('.heic', '.heif')
+IN_FLIGHT_PER_WORKER = 2   # Queued files per worker; keeps 48 MP HEIC batches from piling up in RAM
+
+# --- IMAGE OPEN HELPER ---
+# pillow_heif is only imported (and its opener registered) once a .heic/.heif path shows up.
+# This also covers pool workers, which never run the GUI's imports.
+_HEIF_READY = False
+
+def ensure_heif():
+    global _HEIF_READY
+    if not _HEIF_READY:
+        from pillow_heif import register_heif_opener
+        register_heif_opener()
+        _HEIF_READY = True
+
+def open_image(path):
+    if path.lower().endswith(HEIF_EXTS): ensure_heif()
+    return Image.open(path)
+
+# --- BANDED CONVERSION (images over the memory budget, see strips.py) ---
+# Uncompressed sources are read band by band and written by the streaming PNG/TIFF/BMP
+# encoders. Compressed sources keep the plain path: Pillow decodes them whole anyway and
+# then encodes in place, so bands would only add copies. Returns the seconds spent encoding.
+def _convert_banded(im, img_path, out_path, fmt, mode, read, workers, preset):
+    name = os.path.basename(img_path)
+    sink = open_stream(out_path, fmt, im.size, mode, save_params(fmt, preset))
+    seconds = 0.0
+    try:
+        for top, bottom in iter_bands(im.height, band_rows(im.width, len(im.getbands()), workers)):
+            with span("decode", file=name, top=top):
+                band = read(top, bottom)
+            if band.mode != mode:
+                with span("convert"): band = band.convert(mode)
+            t0 = time.perf_counter()
+            with span("encode", format=fmt): sink.write(band)
+            seconds += time.perf_counter() - t0
+    finally:
+        sink.close()
+    return seconds
+
+# --- WORKER (runs in a child process) ---
+# Never raises: returns (path, in_bytes, out_path, out_bytes, encode_seconds, error)
+def convert_file(img_path, out_dir, fmt, workers=1, preset=None):
+    ext = output_ext(fmt)
+    try:
+        in_bytes = os.path.getsize(img_path)
+        with open_image(img_path) as im:
+            base = os.path.splitext(os.path.basename(img_path))[0]
+            out_path = os.path.join(out_dir, f"{base}.{ext}")
+            mode = stream_mode(im.mode, fmt)
+            read = raw_band_reader(im, img_path) if mode and over_budget(im.size, len(im.getbands()), workers) else None
+            if read:
+                seconds = _convert_banded(im, img_path, out_path, fmt, mode, read, workers, preset)
+                return img_path, in_bytes, out_path, os.path.getsize(out_path), seconds, None
+            with span("decode", file=os.path.basename(img_path)): im.load()
+            if fmt == "JPEG" and im.mode in ("RGBA", "P"):
+                with span("convert"): im = im.convert("RGB")
+            _, out_bytes, seconds, _ = encode(im, out_path, fmt, preset)
+        return img_path, in_bytes, out_path, out_bytes, seconds, None
+    except Exception as e:
+        return img_path, 0, None, 0, 0.0, f"{type(e).__name__}: {e}"
+
+# --- BATCH REPORT ---
+class BatchReport:
+    def __init__(self, total):
+        self.total = total
+        self.converted = []    # (in_path, out_path, out_bytes, encode_seconds)
+        self.failed = []       # (in_path, reason)
+        self.in_bytes = 0
+        self.out_bytes = 0
+        self.encode_seconds = 0.0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def done(self):
+        return len(self.converted) + len(self.failed)
+
+    def files_per_sec(self):
+        t = self.elapsed or (time.perf_counter() - self.started)
+        return self.done / t if t > 0 else 0.0
+
+    def mb_per_sec(self):
+        t = self.elapsed or (time.perf_counter() - self.started)
+        return self.in_bytes / (1024 * 1024) / t if t > 0 else 0.0
+
+    def add(self, result):
+        in_path, in_bytes, out_path, out_bytes, seconds, error = result
+        if error:
+            self.failed.append((in_path, error))
+        else:
+            self.converted.append((in_path, out_path, out_bytes, seconds))
+            self.in_bytes += in_bytes
+            self.out_bytes += out_bytes
+            self.encode_seconds += seconds
+
+    def status_text(self):
+        return f"{self.done}/{self.total} files  {self.files_per_sec():.1f} files/s  {self.mb_per_sec():.1f} MB/s"
+
+    def summary(self, max_failures=10):
+        lines = [f"Converted {len(self.converted)} of {self.total} files in {self.elapsed:.1f}s "
+                 f"({self.files_per_sec():.1f} files/s, {self.mb_per_sec():.1f} MB/s).",
+                 f"Wrote {self.out_bytes / (1024 * 1024):.1f} MB, {self.encode_seconds:.1f}s encoding."]
+        if self.failed:
+            lines.append("")
+            lines.append(f"{len(self.failed)} failed:")
+            for path, reason in self.failed[:max_failures]:
+                lines.append(f"  {os.path.basename(path)}: {reason}")
+            if len(self.failed) > max_failures:
+                lines.append(f"  ... and {len(self.failed) - max_failures} more")
+        return "\n".join(lines)
+
+# --- POOLED BATCH CONVERSION ---
+# progress(report) is called from the calling thread after every finished file; an
+# exception raised from it stops the batch. preset defaults to PDFCONV_PRESET.
+def run_batch_convert(imgs, out_dir, fmt, workers=None, progress=None, preset=None):
+    preset = resolve_preset(preset)
+    report = BatchReport(len(imgs))
+    workers = min(resolve_workers(workers), len(imgs)) if imgs else 1
+
+    if workers <= 1:
+        for img_path in imgs:
+            report.add(convert_file(img_path, out_dir, fmt, 1, preset))
+            if progress: progress(report)
+        report.elapsed = time.perf_counter() - report.started
+        return report
+
+    max_in_flight = workers * IN_FLIGHT_PER_WORKER
+    pending = set()
+    queue = iter(imgs)
+    with ProcessPoolExecutor(max_workers=workers, **pool_kwargs()) as pool:
+        while True:
+            # Top up to the in-flight bound, then wait for at least one file to finish
+            for img_path in queue:
+                pending.add(pool.submit(convert_file, img_path, out_dir, fmt, workers, preset))
+                if len(pending) >= max_in_flight: break
+            if not pending: break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            try:
+                for fut in finished:
+                    report.add(fut.result())
+                    if progress: progress(report)
+            except BaseException:
+                pool.shutdown(cancel_futures=True)   # e.g. the job was cancelled from progress()
+                raise
+    report.elapsed = time.perf_counter() - report.started
+    return report
@@ -0,0 +1,312 @@
+import os
+import json
+import math
+import time
+import threading
+
+from PIL import Image
+
+from split_cache import default_cache_root
+
+# --- DEPENDENCY CHECK: NUMPY ---
+try:
+    import numpy as np
+    NUMPY_AVAIL = True
+except ImportError:
+    NUMPY_AVAIL = False
+
+# --- SETTINGS ---
+# PDFCONV_DEDUP: flag (default) marks near-duplicate parts and images (gallery cards, reports),
+# skip also leaves them out of extraction, conversion and merges, off turns the index off.
+# PDFCONV_DEDUP_DISTANCE: differing bits (of 256) up to which two pictures count as the same.
+# Measured on the synthetic label corpus (tests/test_dedup.py): re-renders at another DPI, JPEG
+# recompression, 3 px crop shifts and gallery/EXIF-sized thumbnails of one part stay under 32
+# bits; different parts, including the two halves of one page, are 95+ apart (random is 128).
+# 40 leaves most of that gap on the keeping side. Labels from one template that differ only
+# in a line of text can hash closer than that: use flag first on a new kind of document.
+DEDUP_MODES = ("off", "flag", "skip")
+DEFAULT_MODE = os.environ.get("PDFCONV_DEDUP", "flag").lower()
+# Merge / convert have no preview to hash: fingerprinting costs an extra (reduced, but for PNG
+# and HEIC often full) decode of every input, so those flows only do it when asked to
+# (PDFCONV_DEDUP_IMAGES=flag|skip, or --dedup on the command line).
+IMAGE_MODE = os.environ.get("PDFCONV_DEDUP_IMAGES", "off").lower()
+DEDUP_DISTANCE = int(os.environ.get("PDFCONV_DEDUP_DISTANCE", "40") or 40)
+HASH_VERSION = 2           # bump when phash() changes: indexes and cached part hashes are per version
+HASH_GRID = 32
+HASH_SIDE = 16
+HASH_BYTES = HASH_SIDE * HASH_SIDE // 8
+ASPECT_TOL = 0.05          # relative width/height difference still treated as the same picture
+HASH_THUMB = (96, 96)      # decode target for image files: EXIF thumbnail / JPEG draft are enough
+MAX_ENTRIES = 100000       # index entries kept on disk per flow (oldest dropped first)
+PACK_EVERY = 256           # entries added before the numpy copy of the index is rebuilt
+# One index per flow: parts extracted yesterday are skipped when extracting again, but still
+# merge into a PDF or convert normally
+SCOPES = ("extract", "merge", "convert")
+
+def resolve_mode(mode=None, images=False):
+    name = (mode or (IMAGE_MODE if images else DEFAULT_MODE)).lower()
+    if name not in DEDUP_MODES: raise ValueError(f"unknown dedup mode {name!r} (choose from {', '.join(DEDUP_MODES)})")
+    return name
+
+def default_index_path(scope):
+    # Next to the split cache (PDFCONV_CACHE_DIR overrides both)
+    return os.path.join(os.path.dirname(default_cache_root()), "dedup", f"seen_{scope}_v{HASH_VERSION}.jsonl")
+
+# --- PERCEPTUAL HASH ---
+# DCT hash: a 32x32 box-filtered grayscale copy, its 16x16 lowest-frequency DCT coefficients,
+# one bit per coefficient above their median (DC left out), as 64 hex digits. Comparing with
+# the median makes it blind to brightness and contrast, and half the bits are set whatever
+# the picture, so mostly-white label art still spreads over all 256. Always taken from
+# low-res pictures that already exist (72 DPI previews, gallery-sized thumbnails), never
+# from a 300 DPI raster.
+_COS = [[math.cos(math.pi * (2 * x + 1) * k / (2 * HASH_GRID)) for x in range(HASH_GRID)] for k in range(HASH_SIDE)]
+if NUMPY_AVAIL: _COS_NP = np.array(_COS)
+
+def _dct_lowpass(px):
+    # px: HASH_GRID x HASH_GRID gray bytes -> HASH_SIDE x HASH_SIDE coefficients, row-major
+    n = HASH_GRID
+    if NUMPY_AVAIL:
+        g = np.frombuffer(px, dtype=np.uint8).reshape(n, n).astype(np.float64)
+        return (_COS_NP @ g @ _COS_NP.T).ravel().tolist()
+    rows = [[sum(ck[x] * px[y * n + x] for x in range(n)) for ck in _COS] for y in range(n)]
+    return [sum(ck[y] * rows[y][u] for y in range(n)) for ck in _COS for u in range(HASH_SIDE)]
+
+def phash(img):
+    coeffs = _dct_lowpass(img.convert("L").resize((HASH_GRID, HASH_GRID), Image.BOX).tobytes())
+    ac = sorted(coeffs[1:])
+    med = ac[len(ac) // 2]
+    h = 0
+    for c in coeffs: h = (h << 1) | (c > med)
+    return f"{h:0{HASH_BYTES * 2}x}"
+
+def aspect(size):
+    return size[0] / max(1, size[1])
+
+def box_aspect(box):
+    return aspect((box[2] - box[0], box[3] - box[1]))
+
+def _popcounts(x):
+    # Set bits per row of an (N, HASH_BYTES // 8) uint64 array (NumPy 2 has it built in)
+    if hasattr(np, "bitwise_count"): return np.bitwise_count(x).sum(axis=1, dtype=np.int64)
+    return _POPCOUNT[x.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+if NUMPY_AVAIL: _POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# --- SEEN INDEX ---
+# Hashes of every part / image written so far, as JSON lines {"h", "a" (aspect), "src", "t"}
+# appended after each run. Lines another process (CLI, a second window) appends are picked up
+# on the next lookup. path=None keeps the index in memory only (duplicates within one document
+# or one image set). Lookups scan the whole index: vectorized with NumPy, plain loop otherwise.
+class SeenIndex:
+    def __init__(self, path=None, distance=None):
+        self.path = path
+        self.distance = DEDUP_DISTANCE if distance is None else distance
+        self.lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self.hashes, self.aspects, self.sources, self.times = [], [], [], []
+        self.pending = []       # lines added since the last save()
+        self.offset = 0         # bytes of the file already read
+        self._packed = None     # (N x 4 uint64 hash words, aspects) of the first N entries
+
+    def __len__(self):
+        with self.lock:
+            self._sync()
+            return len(self.hashes)
+
+    def _append(self, value, asp, src, t):
+        self.hashes.append(value)
+        self.aspects.append(asp)
+        self.sources.append(src)
+        self.times.append(t)
+
+    def _sync(self):
+        if not self.path: return
+        try: size = os.path.getsize(self.path)
+        except OSError: return
+        if size < self.offset:
+            # Compacted or cleared by another process: read it again, keeping this session's entries
+            pending = self.pending
+            self._clear()
+            for e in pending: self._append(int(e["h"], 16), e["a"], e["src"], e["t"])
+            self.pending = pending
+        if size == self.offset: return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b"\n") + 1            # a line still being written is read next time
+        for line in data[:end].splitlines():
+            try:
+                e = json.loads(line)
+                self._append(int(e["h"], 16), float(e["a"]), e["src"], e.get("t", 0))
+            except (ValueError, KeyError, TypeError):
+                continue
+        self.offset += end
+
+    def find(self, h, asp):
+        # Label of the closest earlier picture within `distance` bits (and ASPECT_TOL), or None
+        value = int(h, 16)
+        with self.lock:
+            self._sync()
+            start, best, best_d = 0, None, self.distance + 1
+            if NUMPY_AVAIL and self.hashes:
+                if self._packed is None or len(self.hashes) - len(self._packed[1]) >= PACK_EVERY: self._pack()
+                arr, asps = self._packed
+                start = len(asps)
+                if start:
+                    q = np.frombuffer(value.to_bytes(HASH_BYTES, "big"), dtype=np.uint64)
+                    dist = _popcounts(arr ^ q)
+                    dist[np.abs(asps - asp) > ASPECT_TOL * asp] = best_d
+                    i = int(np.argmin(dist))
+                    if dist[i] < best_d: best, best_d = self.sources[i], int(dist[i])
+            for i in range(start, len(self.hashes)):
+                if abs(self.aspects[i] - asp) > ASPECT_TOL * asp: continue
+                d = bin(self.hashes[i] ^ value).count("1")
+                if d < best_d: best, best_d = self.sources[i], d
+            return best
+
+    def _pack(self):
+        arr = np.frombuffer(b"".join(v.to_bytes(HASH_BYTES, "big") for v in self.hashes), dtype=np.uint64)
+        self._packed = (arr.reshape(-1, HASH_BYTES // 8), np.array(self.aspects, dtype=np.float64))
+
+    def add(self, h, asp, src):
+        t = round(time.time())
+        with self.lock:
+            self._append(int(h, 16), asp, src, t)
+            if self.path: self.pending.append({"h": h, "a": round(asp, 4), "src": src, "t": t})
+
+    def save(self):
+        # Appends this session's entries; past MAX_ENTRIES the file is rewritten with the newest
+        with self.lock:
+            if not self.path or not self.pending: return
+            self._sync()
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for e in self.pending: f.write(json.dumps(e) + "\n")
+            self.pending = []
+            self.offset = os.path.getsize(self.path)
+            if len(self.hashes) > MAX_ENTRIES: self._compact(MAX_ENTRIES * 3 // 4)
+
+    def _compact(self, keep):
+        rows = list(zip(self.hashes, self.aspects, self.sources, self.times))[-keep:]
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for value, asp, src, t in rows:
+                f.write(json.dumps({"h": f"{value:0{HASH_BYTES * 2}x}", "a": round(asp, 4), "src": src, "t": t}) + "\n")
+        os.replace(tmp, self.path)
+        self._clear()
+        self._sync()
+
+    def clear(self):
+        with self.lock:
+            if self.path:
+                try: os.remove(self.path)
+                except FileNotFoundError: pass
+            self._clear()
+
+_DEFAULT = {}
+_DEFAULT_LOCK = threading.Lock()
+
+def seen_index(scope):
+    # The persistent index of one flow (SCOPES), shared by every run of it in this process
+    if scope not in SCOPES: raise ValueError(f"unknown dedup scope {scope!r}")
+    with _DEFAULT_LOCK:
+        if scope not in _DEFAULT: _DEFAULT[scope] = SeenIndex(default_index_path(scope))
+        return _DEFAULT[scope]
+
+def check(h, asp, src, local, index):
+    # Match in this document / image set (`local`) or an earlier run (`index`); the picture then joins `local`
+    match = local.find(h, asp) or (index.find(h, asp) if index is not None else None)
+    local.add(h, asp, src)
+    return match
+
+# --- PDF PARTS ---
+# Items are the gallery / auto-split dicts; their "phash" comes from the preview segment.
+def part_label(pdf_path, item):
+    return f"{os.path.basename(pdf_path)} p{item['page']}-{item['sub_idx']}"
+
+def hash_parts(cache, items):
+    # Fills in items without a "phash" from cache.low_preview(): a cached raster is downscaled,
+    # other pages are rendered at preview resolution only
+    by_page = {}
+    for item in items:
+        if "phash" not in item: by_page.setdefault(item['page'], []).append(item)
+    for page_num, parts in by_page.items():
+        p = cache.low_preview(page_num)
+        for item in parts:
+            s = p.width / item['orig_w']
+            box = tuple(int(v * s) for v in item['box'])
+            item["phash"] = phash(p.crop(box))
+
+def hash_cached_parts(items, version):
+    # Split-cache items: hashes of another HASH_VERSION are dropped, missing ones are taken
+    # from the cached gallery thumbnail (item["path"]) instead of rendering the page again
+    for item in items:
+        if version != HASH_VERSION: item.pop("phash", None)
+        if "phash" in item: continue
+        try: item["phash"] = hash_image_file(item["path"])[0]
+        except Exception: pass
+
+# Returns (items to extract, [(item, label of the earlier copy)]): with "skip" the duplicates
+# are left out, with "flag" they are only reported.
+def filter_parts(pdf_path, items, mode, index=None):
+    local = SeenIndex()
+    kept, dups = [], []
+    for item in items:
+        match = None
+        if "phash" in item:
+            match = check(item["phash"], box_aspect(item['box']), part_label(pdf_path, item), local, index)
+            if match: dups.append((item, match))
+        if not (match and mode == "skip"): kept.append(item)
+    return kept, dups
+
+def record_parts(pdf_path, items, dups, index):
+    # Adds the extracted parts (not the duplicates: their first copy is indexed) and saves
+    skip = {id(item) for item, _ in dups}
+    for item in items:
+        if "phash" in item and id(item) not in skip:
+            index.add(item["phash"], box_aspect(item['box']), part_label(pdf_path, item))
+    index.save()
+
+# --- IMAGE FILES ---
+def hash_image_file(path):
+    from thumbs import make_thumbnail
+    img = make_thumbnail(path, HASH_THUMB)
+    return phash(img), aspect(img.size)
+
+def _try_hash(path):
+    try: return hash_image_file(path)
+    except Exception: return None
+
+# Returns (paths to process, [(path, label of the earlier copy)], {path: (hash, aspect)}).
+# An unreadable file is kept: the conversion reports it. Files are decoded on `workers`
+# threads (Pillow releases the GIL while decoding); progress(done, total) after each file.
+def filter_images(paths, mode, index=None, progress=None, workers=1):
+    from concurrent.futures import ThreadPoolExecutor
+    local = SeenIndex()
+    kept, dups, hashes = [], [], {}
+    threads = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        for done, (path, h) in enumerate(zip(paths, threads.map(_try_hash, paths)), 1):
+            if h is not None: hashes[path] = h
+            match = None
+            if path in hashes:
+                match = check(*hashes[path], os.path.basename(path), local, index)
+                if match: dups.append((path, match))
+            if not (match and mode == "skip"): kept.append(path)
+            if progress: progress(done, len(paths))
+    finally:
+        # A cancelled job (raised from progress) drops the files not started yet
+        threads.shutdown(cancel_futures=True)
+    return kept, dups, hashes
+
+def record_images(paths, dups, hashes, index):
+    skip = {path for path, _ in dups}
+    for path in paths:
+        if path in hashes and path not in skip: index.add(*hashes[path], os.path.basename(path))
+    index.save()
+
+def summary(dups, mode, noun="parts"):
+    if not dups: return ""
+    return f"{len(dups)} near-duplicate {noun} {'skipped' if mode == 'skip' else 'found'}"
@@ -0,0 +1,100 @@
+import os
+import time
+
+from PIL import Image, ImageChops
+
+from instrument import span, save_image
+
+# --- PRESETS ---
+# Pillow save() parameters per output format. "balanced" is Pillow's defaults (the output
+# the app always wrote); "fast" trades size for encode speed, "small" the other way round,
+# "sharp" keeps full-resolution chroma for JPEG text and barcodes.
+# PDFCONV_PRESET picks the default; the CLI takes --preset, the GUI cards a Preset box.
+PRESETS = {
+    "balanced": {},
+    "fast": {"PNG": {"compress_level": 1}, "WEBP": {"method": 0}},
+    "small": {"PNG": {"optimize": True}, "JPEG": {"quality": 70, "optimize": True, "progressive": True},
+              "TIFF": {"compression": "tiff_adobe_deflate"}, "WEBP": {"quality": 75, "method": 6}},
+    "sharp": {"JPEG": {"quality": 90, "subsampling": 0}, "WEBP": {"quality": 90}},
+}
+PRESET_NAMES = ["balanced", "fast", "small", "sharp"]
+DEFAULT_PRESET = os.environ.get("PDFCONV_PRESET", "balanced").lower()
+
+def resolve_preset(preset=None):
+    name = (preset or DEFAULT_PRESET).lower()
+    if name not in PRESETS: raise ValueError(f"unknown preset {name!r} (choose from {', '.join(PRESET_NAMES)})")
+    return name
+
+def save_params(fmt, preset=None):
+    return dict(PRESETS[resolve_preset(preset)].get(fmt, {}))
+
+# --- BILEVEL DETECTION ---
+# Label art rendered at 300 DPI is black and white apart from antialiased edges. A crop counts
+# as near-monochrome when a sparse pixel sample (nearest neighbour, so edges are not averaged
+# into gray) has almost no colour and few mid-gray pixels. Such crops are thresholded at 50%
+# and written as 1-bit PNG / BMP or CCITT Group 4 TIFF, a fraction of the 8-bit size.
+# PDFCONV_BILEVEL=auto (default) or off; PDF to Image only, photos are never touched.
+BILEVEL = os.environ.get("PDFCONV_BILEVEL", "auto").lower() != "off"
+BILEVEL_PARAMS = {"PNG": {}, "BMP": {}, "TIFF": {"compression": "group4"}}
+SAMPLE_STEP = 3          # every 3rd pixel in both directions
+CHROMA_TOL = 40          # max channel difference still counted as gray
+COLOR_FRAC = 0.002
+GRAY_LO, GRAY_HI = 64, 192
+GRAY_FRAC = 0.06
+
+def looks_bilevel(img):
+    if img.mode not in ("1", "L", "RGB", "RGBA"): return False
+    if img.mode == "1": return True
+    sample = img.resize((max(1, img.width // SAMPLE_STEP), max(1, img.height // SAMPLE_STEP)), Image.NEAREST)
+    n = sample.width * sample.height
+    if sample.mode == "RGBA":
+        if sample.getchannel("A").getextrema()[0] < 255: return False   # transparency would be lost
+        sample = sample.convert("RGB")
+    if sample.mode == "RGB":
+        r, g, b = sample.split()
+        chroma = ImageChops.lighter(ImageChops.difference(r, g), ImageChops.difference(g, b))
+        if sum(chroma.histogram()[CHROMA_TOL:]) > n * COLOR_FRAC: return False
+        sample = sample.convert("L")
+    return sum(sample.histogram()[GRAY_LO:GRAY_HI]) <= n * GRAY_FRAC
+
+def to_bilevel(img):
+    if img.mode != "L": img = img.convert("L")
+    return img.convert("1", dither=Image.Dither.NONE)
+
+# --- ENCODE ---
+# Returns (path, bytes written, seconds, kind); kind is the format, or "1-bit <format>"
+def encode(img, path, fmt, preset=None, bilevel=False):
+    params = save_params(fmt, preset)
+    kind = fmt
+    t0 = time.perf_counter()
+    if bilevel and fmt in BILEVEL_PARAMS and looks_bilevel(img):
+        with span("convert", to="1"): img = to_bilevel(img)
+        params.update(BILEVEL_PARAMS[fmt])
+        kind = "1-bit " + fmt
+    save_image(img, path, fmt, **params)
+    return path, os.path.getsize(path), time.perf_counter() - t0, kind
+
+# --- REPORT ---
+# Collects encode() results from every worker: per-file rows plus totals.
+class EncodeStats:
+    def __init__(self):
+        self.rows = []
+
+    def add(self, row):
+        self.rows.append(row)
+
+    def total_bytes(self):
+        return sum(r[1] for r in self.rows)
+
+    def encode_seconds(self):
+        return sum(r[2] for r in self.rows)
+
+    def summary(self):
+        bilevel = sum(1 for r in self.rows if r[3].startswith("1-bit"))
+        text = (f"{len(self.rows)} files, {self.total_bytes() / (1024 * 1024):.1f} MB written, "
+                f"{self.encode_seconds():.1f}s encoding")
+        return text + (f" ({bilevel} as 1-bit)" if bilevel else "")
+
+def row_text(row):
+    path, size, seconds, kind = row
+    return f"{os.path.basename(path)}  {kind}  {size / 1024:.1f} KB  {seconds * 1000:.0f} ms"
@@ -0,0 +1,257 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+from instrument import span, pool_kwargs
+from encoders import encode, save_params, resolve_preset, BILEVEL
+
+# Worker count for the extraction pool. 0 = one per core. Override with PDFCONV_WORKERS.
+DEFAULT_WORKERS = int(os.environ.get("PDFCONV_WORKERS", "0") or 0)
+
+def resolve_workers(workers=None):
+    n = DEFAULT_WORKERS if workers is None else workers
+    if n <= 0: n = os.cpu_count() or 1
+    return max(1, n)
+
+def output_ext(fmt):
+    return "jpg" if fmt == "JPEG" else fmt.lower()
+
+# Which parts of each page a gallery-less run keeps: "first" is the label above the rule,
+# "last" the instructions below it
+PART_RULES = ("all", "first", "last")
+
+def select_parts(items, rule):
+    if rule == "all": return items
+    by_page = {}
+    for item in items: by_page.setdefault(item['page'], []).append(item)
+    pick = 0 if rule == "first" else -1
+    return [parts[pick] for parts in by_page.values()]
+
+def group_by_page(items):
+    pages_map = {}
+    for item in items:
+        p = item['page']
+        if p not in pages_map: pages_map[p] = []
+        pages_map[p].append(item)
+    return pages_map
+
+# --- CROP + ENCODE ---
+# Output naming is {base}_p{n} for a single part, {base}_p{n}_{sub} when a page was split.
+# Returns one encoders.encode() row (path, bytes, seconds, kind) per part.
+def save_page_parts(full_page_img, p_num, p_items, out_dir, base_name, fmt, preset=None, bilevel=False):
+    ext = output_ext(fmt)
+    written = []
+    low_w = p_items[0]['orig_w']
+    high_w = full_page_img.width
+    scale = high_w / low_w
+
+    for item in p_items:
+        lx, ly, ux, uy = item['box']
+        crop_box = (int(lx * scale), int(ly * scale), int(ux * scale), int(uy * scale))
+        with span("crop", page=p_num):
+            final_img = full_page_img.crop(crop_box)
+        if fmt == "JPEG" and final_img.mode != "RGB":
+            with span("convert", page=p_num): final_img = final_img.convert("RGB")
+
+        suffix = f"_p{p_num}"
+        if len(p_items) > 1: suffix += f"_{item['sub_idx']}"
+
+        out_path = os.path.join(out_dir, f"{base_name}{suffix}.{ext}")
+        written.append(encode(final_img, out_path, fmt, preset, bilevel))
+    return written
+
+# --- AUTO-SPLIT (headless) ---
+# Returns every detected part as an item dict shaped like the gallery's (page, sub_idx,
+# box, orig_w). Pages whose separator is a vector rule are split from the drawing
+# operations alone; only the rest are rendered (in chunks, through the cache) and scanned.
+# fingerprint=True also gives the parts of scanned pages their "phash" (dedup.py) from the
+# preview they were scanned on.
+def auto_split_items(cache, total_pages, chunk_pages=4, progress=None, fingerprint=False):
+    from splitter import detect_split_vector, detect_split_structure, VECTOR_SPLIT  # keeps numpy out of pool workers
+    from dedup import phash
+    items = []
+
+    def add(page_num, boxes, orig_w, preview=None):
+        for idx, box in enumerate(boxes):
+            item = {"id": f"p{page_num}_{idx}", "page": page_num, "sub_idx": idx + 1, "box": box, "orig_w": orig_w}
+            if preview is not None: item["phash"] = phash(preview.crop(box))
+            items.append(item)
+
+    for first in range(1, total_pages + 1, chunk_pages):
+        last = min(first + chunk_pages - 1, total_pages)
+        raster_pages = []
+        for page_num in range(first, last + 1):
+            vec = cache.vector_info(page_num) if VECTOR_SPLIT else None
+            size = cache.preview_size(vec["size"]) if vec else None
+            with span("detect", page=page_num, engine="vector"):
+                boxes = detect_split_vector(vec, size) if vec else None
+            if boxes: add(page_num, boxes, size[0])
+            else: raster_pages.append(page_num)
+        cache.prefetch(raster_pages, chunk_pages)
+        for page_num in raster_pages:
+            p = cache.preview(page_num)
+            with span("detect", page=page_num, engine="raster"):
+                boxes = detect_split_structure(p)
+            add(page_num, boxes, p.width, p if fingerprint else None)
+        if progress: progress(last, total_pages)
+    items.sort(key=lambda it: (it["page"], it["sub_idx"]))
+    return items
+
+# --- WORKER (runs in a child process) ---
+# Gets a path to the cached 300 DPI raster so only a short string crosses the
+# process boundary, then decodes, crops and encodes in the child.
+# source = (pdf_path, poppler_path, renderer name, dpi) for the re-render fallback.
+def _load_raster(raster_path, source, p_num):
+    try:
+        with span("decode", page=p_num), Image.open(raster_path) as f:
+            return f.copy()
+    except (OSError, AttributeError, TypeError):
+        # Raster was evicted from the disk cache after being queued; render it here instead
+        from renderers import open_renderer
+        pdf_path, poppler_path, backend, dpi = source
+        renderer = open_renderer(pdf_path, poppler_path, backend)
+        try: return renderer.render(p_num, p_num, dpi)[0]
+        finally: renderer.close()
+
+def extract_page(raster_path, source, p_num, p_items, out_dir, base_name, fmt, preset=None, bilevel=False):
+    full_page_img = _load_raster(raster_path, source, p_num)
+    return p_num, save_page_parts(full_page_img, p_num, p_items, out_dir, base_name, fmt, preset, bilevel)
+
+# --- BANDED EXTRACTION (pages over the memory budget, see strips.py) ---
+# The page is rendered band by band at `dpi` and every part takes its rows from each band.
+# PNG/TIFF/BMP parts are encoded as the bands arrive (8-bit only: a part's bilevel check would
+# need all of it); other formats hold only the part, never the page. `workers` shares the
+# budget between concurrent pool workers.
+def extract_page_banded(source, p_num, p_items, out_dir, base_name, fmt, workers=1, preset=None, bilevel=False):
+    from renderers import open_renderer
+    from strips import band_rows, iter_bands, stream_mode, open_stream
+    pdf_path, poppler_path, backend, dpi = source
+    ext = output_ext(fmt)
+    renderer = open_renderer(pdf_path, poppler_path, backend)
+    parts = []
+    rows = {}       # out_path -> encode row; streamed parts start at 0 s and add up per band
+    try:
+        w, h = renderer.page_size(p_num, dpi)
+        scale = w / p_items[0]['orig_w']
+        mode = stream_mode("RGB", fmt)
+        for item in p_items:
+            lx, ly, ux, uy = item['box']
+            box = (int(lx * scale), int(ly * scale), min(w, int(ux * scale)), min(h, int(uy * scale)))
+            suffix = f"_p{p_num}"
+            if len(p_items) > 1: suffix += f"_{item['sub_idx']}"
+            out_path = os.path.join(out_dir, f"{base_name}{suffix}.{ext}")
+            size = (box[2] - box[0], box[3] - box[1])
+            parts.append((box, out_path, open_stream(out_path, fmt, size, mode, save_params(fmt, preset)) if mode else Image.new("RGB", size)))
+            rows[out_path] = (out_path, 0, 0.0, fmt)
+
+        top, bottom = min(p[0][1] for p in parts), max(p[0][3] for p in parts)
+        for y0, y1 in iter_bands(bottom, band_rows(w, 3, workers), start=top):
+            with span("rasterize", page=p_num, top=y0, bottom=y1):
+                band = renderer.render_band(p_num, dpi, y0, y1)
+            for box, out_path, sink in parts:
+                a, b = max(box[1], y0), min(box[3], y1)
+                if a >= b: continue
+                with span("crop", page=p_num):
+                    piece = band.crop((box[0], a - y0, box[2], b - y0))
+                if isinstance(sink, Image.Image): sink.paste(piece, (0, a - box[1]))
+                else:
+                    t0 = time.perf_counter()
+                    with span("encode", format=fmt): sink.write(piece)
+                    rows[out_path] = (out_path, 0, rows[out_path][2] + time.perf_counter() - t0, fmt)
+            del band
+        for box, out_path, sink in parts:
+            if isinstance(sink, Image.Image): rows[out_path] = encode(sink, out_path, fmt, preset, bilevel)
+    finally:
+        for box, out_path, sink in parts:
+            if not isinstance(sink, Image.Image): sink.close()
+        renderer.close()
+    return p_num, [(r[0], os.path.getsize(r[0]), r[2], r[3]) for r in rows.values()]
+
+def _collect(rows, stats):
+    if stats is not None:
+        for row in rows: stats.add(row)
+    return [row[0] for row in rows]
+
+def fit_workers(cache, page_nums, workers):
+    # Whole-page workers each decode one page: no more of them than the budget holds
+    from strips import budget, raster_bytes
+    size_fn = getattr(cache.renderer, "page_size", None)
+    if not size_fn or not page_nums: return workers
+    biggest = max(raster_bytes(size_fn(p, cache.dpi)) for p in page_nums)
+    return max(1, min(workers, budget() // max(1, biggest)))
+
+# --- POOLED EXTRACTION ---
+# progress(done, total, page_num) is called from the calling thread as pages finish;
+# an exception raised from it stops the extraction. Returns the written paths; `stats`
+# (an encoders.EncodeStats) also gets bytes and encode time per file. preset / bilevel
+# default to PDFCONV_PRESET / PDFCONV_BILEVEL. `pool` shares a process pool of `workers`
+# processes with other documents (batch.py); by default each call starts its own.
+# fmt "PDF" cuts the parts out of the PDF itself (pdfcrop.py): nothing is rendered, and
+# `combine` puts them all into <base_name>.pdf.
+def run_extraction(cache, items, out_dir, base_name, fmt, workers=None, progress=None,
+                   preset=None, bilevel=None, stats=None, pool=None, combine=True):
+    if fmt == "PDF":
+        from pdfcrop import extract_pdf_regions
+        return _collect(extract_pdf_regions(cache.pdf_path, items, out_dir, base_name, combine, progress), stats)
+    preset = resolve_preset(preset)
+    if bilevel is None: bilevel = BILEVEL
+    pages_map = group_by_page(items)
+    total = len(pages_map)
+    banded = {p for p in pages_map if cache.is_large(p)}
+    whole = [p for p in pages_map if p not in banded]
+    if pool is None: workers = fit_workers(cache, whole, min(resolve_workers(workers), total)) if total else 1
+    else: workers = resolve_workers(workers)
+    # Pages not rendered yet (e.g. the gallery came from the split cache) are rendered in batches
+    cache.prefetch(whole)
+    source = (cache.pdf_path, cache.poppler_path, cache.renderer.name, cache.dpi)
+    written = []
+    done = 0
+
+    if pool is None and workers <= 1:
+        for p_num, p_items in pages_map.items():
+            if p_num in banded:
+                rows = extract_page_banded(source, p_num, p_items, out_dir, base_name, fmt, 1, preset, bilevel)[1]
+            else:
+                full_page_img = cache.get(p_num)
+                # Same outcome as the pooled path, where the worker's own render would fail: no silent gaps
+                if full_page_img is None: raise RuntimeError(f"Page {p_num} could not be rendered")
+                rows = save_page_parts(full_page_img, p_num, p_items, out_dir, base_name, fmt, preset, bilevel)
+            written.extend(_collect(rows, stats))
+            done += 1
+            if progress: progress(done, total, p_num)
+        return written
+
+    if pool is None:
+        with ProcessPoolExecutor(max_workers=workers, **pool_kwargs()) as own:
+            return _run_pooled(own, workers, cache, pages_map, banded, source, out_dir, base_name, fmt,
+                               progress, preset, bilevel, stats)
+    return _run_pooled(pool, workers, cache, pages_map, banded, source, out_dir, base_name, fmt,
+                       progress, preset, bilevel, stats)
+
+def _run_pooled(pool, workers, cache, pages_map, banded, source, out_dir, base_name, fmt,
+                progress, preset, bilevel, stats):
+    total = len(pages_map)
+    written = []
+    done = 0
+    futures = []
+    for p_num, p_items in pages_map.items():
+        if p_num in banded:
+            futures.append(pool.submit(extract_page_banded, source, p_num, p_items, out_dir, base_name, fmt,
+                                       workers, preset, bilevel))
+            continue
+        # Rendering (if a page was evicted) stays in this process; workers only decode/crop/encode
+        futures.append(pool.submit(extract_page, cache.disk_path(p_num), source,
+                                   p_num, p_items, out_dir, base_name, fmt, preset, bilevel))
+    try:
+        for fut in as_completed(futures):
+            p_num, rows = fut.result()
+            written.extend(_collect(rows, stats))
+            done += 1
+            if progress: progress(done, total, p_num)
+    except BaseException:
+        # Failure or cancellation (raised by progress): this document's pages not started yet are dropped
+        for fut in futures: fut.cancel()
+        raise
+    return written
@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import time
+import threading
+
+# --- SETTINGS ---
+# PDFCONV_TRACE_DIR=<folder> turns tracing on: every run (a GUI flow, or a CLI command /
+# watched PDF) writes its spans there. PDFCONV_TRACE_FORMAT=chrome (default, open in
+# chrome://tracing or ui.perfetto.dev) or jsonl. PDFCONV_PROFILE=1 also saves a cProfile
+# capture (<run>.prof) of the thread that ran the flow. Off by default: span() is a no-op.
+TRACE_DIR = os.environ.get("PDFCONV_TRACE_DIR", "")
+TRACE_FORMAT = os.environ.get("PDFCONV_TRACE_FORMAT", "chrome").lower()
+PROFILE = os.environ.get("PDFCONV_PROFILE", "0") not in ("0", "", "false", "no")
+
+def configure(trace_dir=None, fmt=None, profile=None):
+    global TRACE_DIR, TRACE_FORMAT, PROFILE
+    if trace_dir is not None: TRACE_DIR = trace_dir
+    if fmt is not None: TRACE_FORMAT = fmt.lower()
+    if profile is not None: PROFILE = profile
+
+def enabled():
+    return bool(TRACE_DIR)
+
+# --- PEAK MEMORY ---
+def reset_peak_rss():
+    # Linux only: lets each run report its own peak instead of the process lifetime's
+    try:
+        with open("/proc/self/clear_refs", "w") as f: f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"): return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if sys.platform.startswith("win"):
+        import ctypes
+        from ctypes import wintypes
+        class PMC(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        pmc = PMC(cb=ctypes.sizeof(PMC))
+        if ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(pmc), pmc.cb):
+            return pmc.PeakWorkingSetSize / (1024 * 1024)
+        return None
+    import resource
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb / (1024 * 1024) if sys.platform == "darwin" else kb / 1024
+
+def children_peak_rss_mb():
+    # Largest finished child (pool worker / pdftoppm) so far; None on Windows
+    try: import resource
+    except ImportError: return None
+    kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return kb / (1024 * 1024) if sys.platform == "darwin" else kb / 1024
+
+# --- SPANS ---
+class _NullSpan:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+NULL_SPAN = _NullSpan()
+_local = threading.local()
+_worker_sink = None        # pool workers: (run id, path of this process's span file)
+
+class _Span:
+    __slots__ = ("sink", "name", "args", "ts", "t0")
+    def __init__(self, sink, name, args):
+        self.sink, self.name, self.args = sink, name, args
+
+    def __enter__(self):
+        self.ts = time.time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.sink(self.name, self.ts, time.perf_counter() - self.t0, self.args)
+        return False
+
+def span(name, **args):
+    # with span("encode", page=3): ...   (no-op unless a run is active on this thread)
+    run = getattr(_local, "run", None)
+    if run is not None: return _Span(run.add, name, args)
+    if _worker_sink is not None: return _Span(_worker_add, name, args)
+    return NULL_SPAN
+
+def record(name, ts, seconds, **args):
+    # Adds an already-measured span (e.g. time accumulated inside a file object)
+    run = getattr(_local, "run", None)
+    if run is not None: run.add(name, ts, seconds, args)
+    elif _worker_sink is not None: _worker_add(name, ts, seconds, args)
+
+def active():
+    return getattr(_local, "run", None) is not None or _worker_sink is not None
+
+def current():
+    return getattr(_local, "run", None)
+
+def attach(run):
+    # Helper threads of a flow record into its run: attach(current() of the flow's thread)
+    _local.run = run
+
+def _event(name, ts, seconds, args):
+    return {"name": name, "ts": ts, "dur": seconds, "pid": os.getpid(), "tid": threading.get_ident(), "args": args}
+
+# --- POOL WORKERS ---
+# Child processes append their spans to <run>.<pid>.part; the run merges them when it finishes.
+def _worker_init(run_id, trace_dir):
+    global _worker_sink
+    _local.run = None  # a forked child inherits the parent thread's run; its spans must go to the file
+    _worker_sink = (run_id, os.path.join(trace_dir, f"{run_id}.{os.getpid()}.part"))
+
+def _worker_add(name, ts, seconds, args):
+    with open(_worker_sink[1], "a", encoding="utf-8") as f:
+        f.write(json.dumps(_event(name, ts, seconds, args)) + "\n")
+
+def pool_kwargs():
+    # Extra ProcessPoolExecutor(...) arguments so pool workers report into the current run
+    run = getattr(_local, "run", None)
+    return {"initializer": _worker_init, "initargs": (run.id, run.trace_dir)} if run else {}
+
+# --- REPORTS ---
+# Summaries of things that are not runs (a gallery's thumbnail decodes over its lifetime):
+# <name>-<time>-<pid>.json next to the traces, plus the usual stderr line. Tracing off: nothing.
+def report(name, info):
+    if not enabled(): return None
+    path = os.path.join(TRACE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json")
+    try:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f: json.dump({"report": name, **info}, f)
+    except OSError as e:
+        print(f"trace: could not write {name} report: {e}", file=sys.stderr)
+        return None
+    print(f"trace: {name} {info.get('summary', '')} -> {path}", file=sys.stderr)
+    return path
+
+# --- TIMED OUTPUT ---
+# Splits Image.save() into "encode" and "write": the file object adds up the time spent in
+# write() calls, so no extra buffer copy of the encoded output is needed.
+class _TimedFile:
+    def __init__(self, f):
+        self.f = f
+        self.write_time = 0.0
+
+    def write(self, data):
+        t0 = time.perf_counter()
+        n = self.f.write(data)
+        self.write_time += time.perf_counter() - t0
+        return n
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+def save_image(img, path, fmt, **params):
+    if not active():
+        img.save(path, fmt, **params)
+        return
+    ts = time.time()
+    t0 = time.perf_counter()
+    with open(path, "wb") as raw:
+        f = _TimedFile(raw)
+        img.save(f, fmt, **params)
+    total = time.perf_counter() - t0
+    record("encode", ts, total - f.write_time, format=fmt)
+    record("write", ts + total - f.write_time, f.write_time, bytes=os.path.getsize(path))
+
+# --- RUNS ---
+class Run:
+    def __init__(self, name, trace_dir):
+        self.name = name
+        self.trace_dir = trace_dir
+        self.id = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident() % 10000}"
+        self.events = []
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+
+    def add(self, name, ts, seconds, args):
+        ev = _event(name, ts, seconds, args)
+        with self.lock: self.events.append(ev)
+
+    def _merge_workers(self):
+        prefix = self.id + "."
+        for fn in os.listdir(self.trace_dir):
+            if not (fn.startswith(prefix) and fn.endswith(".part")): continue
+            path = os.path.join(self.trace_dir, fn)
+            with open(path, encoding="utf-8") as f:
+                self.events.extend(json.loads(line) for line in f if line.strip())
+            os.remove(path)
+
+    def summary(self, peak_mb, child_mb):
+        totals = {}
+        for ev in self.events:
+            totals[ev["name"]] = totals.get(ev["name"], 0.0) + ev["dur"]
+        return {"run": self.id, "wall_s": time.perf_counter() - self.t0,
+                "stages_s": {k: round(v, 4) for k, v in sorted(totals.items())},
+                "peak_rss_mb": peak_mb, "children_peak_rss_mb": child_mb}
+
+    def finish(self, peak_mb, child_mb):
+        self._merge_workers()
+        self.events.sort(key=lambda ev: ev["ts"])
+        info = self.summary(peak_mb, child_mb)
+        if TRACE_FORMAT == "jsonl":
+            path = os.path.join(self.trace_dir, self.id + ".jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                for ev in self.events:
+                    f.write(json.dumps({"run": self.id, "name": ev["name"], "ts": ev["ts"], "dur_ms": ev["dur"] * 1000,
+                                        "pid": ev["pid"], "tid": ev["tid"], "args": ev["args"]}) + "\n")
+                f.write(json.dumps({"run": self.id, "summary": info}) + "\n")
+        else:
+            path = os.path.join(self.trace_dir, self.id + ".trace.json")
+            events = [{"name": ev["name"], "cat": self.name, "ph": "X", "ts": ev["ts"] * 1e6, "dur": ev["dur"] * 1e6,
+                       "pid": ev["pid"], "tid": ev["tid"], "args": ev["args"]} for ev in self.events]
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": info}, f)
+        return path, info
+
+class _RunContext:
+    def __init__(self, name):
+        self.name = name
+        self.run = None
+        self.outer = None
+        self.profiler = None
+
+    def __enter__(self):
+        self.outer = getattr(_local, "run", None)
+        if not enabled(): return None
+        if self.outer is not None:
+            # Nested flow (e.g. extract inside a CLI command): just a span of the outer run
+            self.span = _Span(self.outer.add, self.name, {})
+            self.span.__enter__()
+            return self.outer
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        reset_peak_rss()
+        self.run = _local.run = Run(self.name, TRACE_DIR)
+        if PROFILE:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self.run
+
+    def __exit__(self, *exc):
+        if not enabled(): return False
+        if self.outer is not None:
+            self.span.__exit__(*exc)
+            return False
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(os.path.join(TRACE_DIR, self.run.id + ".prof"))
+        _local.run = None
+        try:
+            path, info = self.run.finish(peak_rss_mb(), children_peak_rss_mb())
+            stages = ", ".join(f"{k} {v:.2f}s" for k, v in info["stages_s"].items())
+            peak = f"{info['peak_rss_mb']:.0f} MB" if info["peak_rss_mb"] else "n/a"
+            print(f"trace: {self.name} {info['wall_s']:.2f}s ({stages}) peak RSS {peak} -> {path}", file=sys.stderr)
+        except OSError as e:
+            print(f"trace: could not write {self.run.id}: {e}", file=sys.stderr)
+        return False
+
+def run(name):
+    # with instrument.run("work_p2i"): ...   Collects the spans of this thread (and its pools)
+    return _RunContext(name)
@@ -0,0 +1,154 @@
+import os
+import time
+import threading
+import traceback
+from collections import deque
+
+# --- CANCELLATION ---
+# Raised by Job.progress() / Job.check() once the job was cancelled. Work functions only
+# have to report progress regularly; the scheduler treats this exception as a clean stop.
+class Cancelled(Exception):
+    pass
+
+# --- JOB ---
+# fn(job) runs on its own thread. job.workers is the number of CPU slots it was granted:
+# pass it on as the process pool size so all jobs together stay within the core count.
+class Job:
+    def __init__(self, scheduler, name, fn, slots, cleanup):
+        self.scheduler = scheduler
+        self.name = name
+        self.fn = fn
+        self.want = max(1, slots)
+        self.workers = 0
+        self.state = "queued"          # queued / running / done / failed / cancelled
+        self.done = self.total = 0
+        self.text = None
+        self.started = None
+        self.cleanups = [cleanup] if cleanup else []
+        self._cancel = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        self.scheduler._dispatch()   # a queued job stops (and cleans up) right away
+
+    def check(self):
+        if self._cancel.is_set(): raise Cancelled(self.name)
+
+    def progress(self, done, total, text=None):
+        self.done, self.total, self.text = done, total, text
+        self.scheduler._notify(self)
+        self.check()
+
+    def eta(self):
+        if not self.started or not self.total or self.done <= 0 or self.done >= self.total: return None
+        return (time.perf_counter() - self.started) / self.done * (self.total - self.done)
+
+    def status_text(self):
+        if self.state == "queued": return f"{self.name} (queued)"
+        text = f"{self.name}... {self.text or (f'{self.done}/{self.total}' if self.total else '')}".rstrip()
+        eta = self.eta()
+        if eta is not None: text += f"  ETA {int(eta) // 60}:{int(eta) % 60:02d}"
+        return text
+
+    def add_cleanup(self, fn):
+        # Runs once the worker has stopped; immediately if it already has
+        with self._lock:
+            if not self._stopped.is_set():
+                self.cleanups.append(fn)
+                return
+        fn()
+
+    def wait(self, timeout=None):
+        return self._stopped.wait(timeout)
+
+    def _stop(self):
+        with self._lock:
+            cleanups, self.cleanups = self.cleanups, []
+            self._stopped.set()
+        for fn in cleanups:
+            try: fn()
+            except Exception: traceback.print_exc()
+
+# --- SCHEDULER ---
+# One per app, shared by every card. Jobs start in submission order while CPU slots are
+# free (default: one per core); a job asking for more slots than are free gets what is
+# left, a job finding none waits in the queue. notify(job) is called from worker threads
+# on every state change and progress report.
+class JobScheduler:
+    def __init__(self, slots=None, notify=None):
+        self.slots = max(1, slots or os.cpu_count() or 1)
+        self.free = self.slots
+        self.notify = notify
+        self.queue = deque()
+        self.running = []
+        self.lock = threading.Lock()
+
+    def submit(self, name, fn, slots=1, cleanup=None):
+        job = Job(self, name, fn, slots, cleanup)
+        with self.lock: self.queue.append(job)
+        self._notify(job)
+        self._dispatch()
+        return job
+
+    def jobs(self):
+        with self.lock: return self.running + list(self.queue)
+
+    def cancel_all(self):
+        for job in self.jobs(): job._cancel.set()
+        self._dispatch()
+
+    def status_text(self):
+        jobs = self.jobs()
+        if not jobs: return ""
+        running = [j for j in jobs if j.state == "running"]
+        text = " | ".join(j.status_text() for j in running) or jobs[0].status_text()
+        queued = len(jobs) - max(1, len(running))
+        return text + (f"  (+{queued} queued)" if queued > 0 else "")
+
+    def _notify(self, job):
+        if self.notify:
+            try: self.notify(job)
+            except Exception: traceback.print_exc()
+
+    def _dispatch(self):
+        dropped = []
+        with self.lock:
+            for job in [j for j in self.queue if j.cancelled]:
+                self.queue.remove(job)
+                job.state = "cancelled"
+                dropped.append(job)
+            while self.queue and self.free > 0:
+                job = self.queue.popleft()
+                job.workers = min(job.want, self.free)
+                self.free -= job.workers
+                job.state = "running"
+                self.running.append(job)
+                threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        for job in dropped:
+            job._stop()
+            self._notify(job)
+
+    def _run(self, job):
+        job.started = time.perf_counter()
+        self._notify(job)
+        try:
+            job.fn(job)
+            job.state = "cancelled" if job.cancelled else "done"
+        except Cancelled:
+            job.state = "cancelled"
+        except Exception:
+            traceback.print_exc()
+            job.state = "failed"
+        finally:
+            with self.lock:
+                self.running.remove(job)
+                self.free += job.workers
+            job._stop()     # temp files go only now, after the worker is done with them
+            self._notify(job)
+            self._dispatch()
@@ -1,19 +1,24 @@
+import time
+_T0 = time.perf_counter()  # Startup reference for PDFCONV_STARTUP_PROBE
+
 import os
 import sys
-import threading
-import tempfile
-import shutil
-import math
+import queue
 import traceback
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 import subprocess 
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
-from PIL import Image, ImageTk, ImageOps
+from PIL import Image  # Already loaded by customtkinter (CTkImage)
+from jobs import JobScheduler, Cancelled
 
-# --- HEIC SUPPORT IMPORT ---
-from pillow_heif import register_heif_opener
-register_heif_opener() 
+# --- LAZY ENGINES ---
+# Codec and PDF stacks (pillow_heif, pdf2image, numpy, the engine modules) are imported
+# inside the flows that use them, so the window paints before any of them load.
+# HEIF support is registered by convert.open_image the first time a .heic/.heif path is opened.
 
 # --- ANTI-FLICKER PATCH (WINDOWS) ---
 if sys.platform.startswith("win"):
@@ -33,9 +38,6 @@ except ImportError:
     DND_AVAIL = False
     print("Warning: tkinterdnd2 not found. Drag and drop will be disabled.")
 
-from pdf2image import convert_from_path
-import img2pdf
-
 # --- CONFIGURATION ---
 ctk.set_appearance_mode("Light") 
 ctk.set_default_color_theme("blue")
@@ -51,6 +53,12 @@ COLOR_TEXT_WHITE = "white"      # White Text
 COLOR_DROPDOWN_BG = "#FFFFFF"   # White Dropdown Background
 COLOR_BORDER = "#E0E0E0"        # Light Grey Border for Cards
 
+# --- PREVIEW STREAMING ---
+PREVIEW_CHUNK_PAGES = 4         # Pages rasterized (at 300 DPI) per renderer call in the gallery
+PREVIEW_QUEUE_CHUNKS = 4        # Chunks of gallery items waiting for the UI thread before the loader blocks
+PREVIEW_POLL_MS = 30            # How often the UI thread picks up new chunks
+THUMB_SIZE = (120, 160)         # Gallery tile thumbnails
+
 # --- RESOURCE HELPER ---
 def resource_path(relative_path):
     try:
@@ -59,63 +67,191 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-# --- REFINED SPLITTER ENGINE (Isolation Check) ---
-def detect_split_structure(img, threshold=100):
-    w, h = img.size
-    gray = img.convert("L")
-    pixels = gray.load()
-
-    start_y = int(h * 0.25)
-    end_y = int(h * 0.75)
-    
-    candidate_y = -1
-    best_score = 0
-    
-    for y in range(start_y, end_y):
-        dark_pixel_count = 0
-        for x in range(0, w, 5):
-            if pixels[x, y] < threshold:
-                dark_pixel_count += 1
-        
-        dark_percent = dark_pixel_count / (w / 5)
-        
-        if dark_percent > 0.45:
-            is_isolated = True
-            for offset in [-10, 10]: 
-                check_y = y + offset
-                if 0 <= check_y < h:
-                    adj_dark_count = 0
-                    for ax in range(0, w, 10): 
-                         if pixels[ax, check_y] < threshold:
-                             adj_dark_count += 1
-                    
-                    adj_percent = adj_dark_count / (w / 10)
-                    if adj_percent > 0.15: 
-                        is_isolated = False
-                        break
-            
-            if is_isolated:
-                dist_from_center = abs(y - (h // 2))
-                score = 10000 - dist_from_center 
-                if score > best_score:
-                    best_score = score
-                    candidate_y = y
-
-    if candidate_y != -1:
-        return [(0, 0, w, candidate_y - 2), (0, candidate_y + 2, w, h)]
-    else:
-        return [(0, 0, w, h)]
+# --- VIRTUAL GRID (shared by both galleries) ---
+# Only the rows in view (plus a little overscan) have widgets. Cards are created once per
+# pool slot and re-bound to other items on scroll, and thumbnails are decoded in the
+# background (reduced-scale, see thumbs.py) and kept in a small LRU, so thousands of items cost a few dozen widgets.
+#   make_card(canvas)             -> new card widget for a pool slot
+#   bind_card(card, index, image) -> show item `index` on the card (a blank placeholder while loading)
+#   thumb_key(index)              -> stable cache key for the item's thumbnail
+#   load_thumb(key)               -> PIL image for that key, called on a worker thread
+#   peek_thumb(key)               -> optional: PIL image already in memory (or None), called on the UI thread
+class VirtualGrid(ctk.CTkFrame):
+    OVERSCAN_ROWS = 1
+    THUMB_CACHE_SIZE = 400
+    LOADER_THREADS = min(4, os.cpu_count() or 2)   # Pillow releases the GIL while decoding
+
+    def __init__(self, parent, cols, cell_w, cell_h, make_card, bind_card, load_thumb, thumb_key, thumb_size, peek_thumb=None, **kwargs):
+        super().__init__(parent, fg_color=COLOR_MAIN_BG, **kwargs)
+        self.cols, self.cell_w, self.cell_h = cols, cell_w, cell_h
+        self.make_card, self.bind_card = make_card, bind_card
+        self.load_thumb, self.thumb_key, self.peek_thumb = load_thumb, thumb_key, peek_thumb
+        self.thumb_size = tuple(thumb_size)
+        self.count = 0
+        self.slots = []                 # [{"card", "win", "index"}]
+        self.thumbs = OrderedDict()     # (key, size) -> CTkImage (LRU)
+        self.pending = set()
+        self.loader = ThreadPoolExecutor(max_workers=self.LOADER_THREADS)
+        # CTk widgets keep their old image when given None, so recycled cards get a blank one instead
+        blank = Image.new("RGBA", thumb_size, (0, 0, 0, 0))
+        self.placeholder = ctk.CTkImage(light_image=blank, dark_image=blank, size=thumb_size)
+
+        self.canvas = tk.Canvas(self, bg=COLOR_MAIN_BG, highlightthickness=0, bd=0,
+                                yscrollincrement=max(1, cell_h // 4))
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.canvas.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
+        self.canvas.bind("<Configure>", lambda e: self.update_visible())
+
+        # Wheel events bubble to the toplevel through bindtags; the handler checks the pointer is over us
+        top = self.winfo_toplevel()
+        top.bind("<MouseWheel>", self._on_wheel, add="+")
+        top.bind("<Button-4>", lambda e: self._on_wheel(e, -1), add="+")
+        top.bind("<Button-5>", lambda e: self._on_wheel(e, 1), add="+")
+        self.canvas.bind("<Destroy>", lambda e: self.loader.shutdown(wait=False, cancel_futures=True), add="+")
+
+    # --- SIZE / SCROLL ---
+    def set_count(self, count):
+        self.count = count
+        rows = -(-count // self.cols)
+        self.canvas.configure(scrollregion=(0, 0, self.cols * self.cell_w, rows * self.cell_h))
+        self.update_visible()
+
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.update_visible()
+
+    def _on_wheel(self, event, direction=None):
+        try: w = self.winfo_containing(event.x_root, event.y_root)
+        except (KeyError, tk.TclError): return  # pointer over a menu / foreign window
+        if w is None or not str(w).startswith(str(self)): return
+        if direction is None:
+            direction = -1 if event.delta > 0 else 1
+            steps = max(1, abs(event.delta) // 120) if abs(event.delta) >= 120 else 1
+        else:
+            steps = 1
+        self.canvas.yview_scroll(direction * steps * 2, "units")
+
+    def index_at(self, x_root, y_root):
+        # Item index under a screen point and whether the point is on its right half
+        if not self.count: return -1, False
+        cx = x_root - self.canvas.winfo_rootx()
+        cy = self.canvas.canvasy(y_root - self.canvas.winfo_rooty())
+        col = min(max(int(cx // self.cell_w), 0), self.cols - 1)
+        row = max(int(cy // self.cell_h), 0)
+        idx = row * self.cols + col
+        if idx >= self.count: return self.count - 1, True
+        return idx, (cx - col * self.cell_w) > self.cell_w / 2
+
+    # --- SLOT RECYCLING ---
+    def _visible_range(self):
+        top = self.canvas.canvasy(0)
+        height = max(self.canvas.winfo_height(), self.cell_h)
+        first_row = max(0, int(top // self.cell_h) - self.OVERSCAN_ROWS)
+        last_row = int((top + height) // self.cell_h) + self.OVERSCAN_ROWS
+        return first_row * self.cols, min(self.count, (last_row + 1) * self.cols)
+
+    def update_visible(self, force=False):
+        start, end = self._visible_range()
+        wanted = set(range(start, end))
+        free = []
+        for slot in self.slots:
+            if slot["index"] in wanted and not force:
+                wanted.discard(slot["index"])
+            else:
+                free.append(slot)
+        for idx in sorted(wanted):
+            slot = free.pop() if free else self._new_slot()
+            slot["index"] = idx
+            row, col = divmod(idx, self.cols)
+            self.canvas.coords(slot["win"], col * self.cell_w, row * self.cell_h)
+            self.canvas.itemconfigure(slot["win"], state="normal")
+            self.bind_card(slot["card"], idx, self._thumb(idx))
+        for slot in free:
+            slot["index"] = -1
+            self.canvas.itemconfigure(slot["win"], state="hidden")
+
+    def _new_slot(self):
+        card = self.make_card(self.canvas)
+        win = self.canvas.create_window(0, 0, window=card, anchor="nw")
+        slot = {"card": card, "win": win, "index": -1}
+        self.slots.append(slot)
+        return slot
+
+    def refresh(self):
+        # Re-bind every visible card (after a selection change)
+        self.update_visible(force=True)
+
+    def rebind(self, start, end=None):
+        # Re-bind only the visible cards whose index is in [start, end) - a reorder touches
+        # just the moved range, so its cost does not grow with the item count
+        end = self.count if end is None else min(end, self.count)
+        for slot in self.slots:
+            if start <= slot["index"] < end:
+                self.bind_card(slot["card"], slot["index"], self._thumb(slot["index"]))
+
+    def card_for(self, index):
+        for slot in self.slots:
+            if slot["index"] == index: return slot["card"]
+        return None
+
+    # --- THUMBNAILS ---
+    def cached_thumb(self, key):
+        # Decoded thumbnail for a key, or None if it has not been loaded yet
+        return self.thumbs.get((key, self.thumb_size))
+
+    def _thumb(self, idx):
+        key = self.thumb_key(idx)
+        img = self.thumbs.get((key, self.thumb_size))
+        if img is not None:
+            self.thumbs.move_to_end((key, self.thumb_size))
+            return img
+        pil = self.peek_thumb(key) if self.peek_thumb else None
+        if pil is not None: return self._remember(key, pil)
+        if key not in self.pending:
+            self.pending.add(key)
+            self.loader.submit(self._load, key)
+        return self.placeholder
+
+    def _load(self, key):
+        try: pil = self.load_thumb(key)
+        except Exception: pil = None
+        try: self.after(0, lambda: self._loaded(key, pil))
+        except Exception: pass
+
+    def _loaded(self, key, pil):
+        self.pending.discard(key)
+        if not self.winfo_exists(): return
+        # Unreadable files keep the blank placeholder instead of being retried on every scroll
+        img = self._remember(key, pil)
+        for slot in self.slots:
+            if slot["index"] >= 0 and self.thumb_key(slot["index"]) == key:
+                self.bind_card(slot["card"], slot["index"], img)
+
+    def _remember(self, key, pil):
+        img = self.placeholder if pil is None else ctk.CTkImage(light_image=pil, dark_image=pil, size=pil.size)
+        self.thumbs[(key, self.thumb_size)] = img
+        while len(self.thumbs) > self.THUMB_CACHE_SIZE:
+            self.thumbs.popitem(last=False)
+        return img
+
+def report_thumbs(gallery, stats):
+    # Per-method thumbnail decode cost of one gallery (thumbs.ThumbStats) when it closes; goes to
+    # PDFCONV_TRACE_DIR with the traces, nothing when tracing is off
+    from instrument import report
+    if stats.data: report(gallery, {"thumbnails": stats.as_dict(), "summary": stats.summary()})
 
 # --- 1. SMART PAGE SELECTOR ---
 class VisualPageSelector(ctk.CTkToplevel):
-    def __init__(self, parent, pdf_path, poppler_path):
+    def __init__(self, parent, pdf_path, poppler_path, page_cache, scheduler):
         super().__init__(parent)
         self.title("Select Parts to Extract")
         self.geometry("1100x750")
         
-        self.temp_dir = tempfile.mkdtemp()
         self.pdf_path = pdf_path
         self.poppler_path = poppler_path
+        self.page_cache = page_cache
         
         icon_path = resource_path("icon.ico")
         if os.path.exists(icon_path):
@@ -127,9 +263,20 @@ class VisualPageSelector(ctk.CTkToplevel):
         self.configure(fg_color=COLOR_MAIN_BG)
 
         self.selected_ids = set()
-        self.card_refs = {}
+        self.item_order = []            # item ids in gallery order
+        self.page_counts = {}           # page -> number of parts (for "Page N-sub" labels)
         self.item_data = {} 
+        self.dups = {}                  # item id -> label of the earlier copy (dedup.py)
+        self.dedup_mode = "off"
         self.result = None
+        self.closed = False
+        # Segment thumbnails go from the loader to the UI in memory (spilled to disk past a budget);
+        # chunks of items reach the UI thread through a bounded queue
+        from thumbs import ThumbStore, ThumbStats
+        self.thumbs = ThumbStore()
+        self.thumb_stats = ThumbStats()   # split-cache hits decode their thumbnails from files
+        self.feed = queue.Queue(maxsize=PREVIEW_QUEUE_CHUNKS)
+        self.protocol("WM_DELETE_WINDOW", self.close_safe)
         
         # Header (Blue)
         top = ctk.CTkFrame(self, fg_color=COLOR_HEADER_BG, corner_radius=0)
@@ -147,100 +294,218 @@ class VisualPageSelector(ctk.CTkToplevel):
         ctk.CTkButton(btn_frame, text="Select All", width=120, fg_color=COLOR_ACCENT, text_color="white", hover_color=COLOR_BTN_HOVER, command=self.select_all).pack(side="left", padx=5)
         ctk.CTkButton(btn_frame, text="Deselect All", width=120, fg_color="transparent", border_width=1, border_color="white", text_color="white", command=self.deselect_all).pack(side="left", padx=5)
 
-        # Gallery
-        self.scroll = ctk.CTkScrollableFrame(self, fg_color=COLOR_MAIN_BG)
+        # Gallery (virtualized: only visible rows have widgets)
+        self.scroll = VirtualGrid(self, cols=5, cell_w=170, cell_h=240, make_card=self.make_card,
+                                  bind_card=self.bind_card, thumb_key=lambda i: self.item_order[i],
+                                  load_thumb=self.load_thumb, peek_thumb=self.thumbs.peek, thumb_size=THUMB_SIZE)
         self.scroll.pack(fill="both", expand=True, padx=20, pady=10)
 
         # Footer
         bot = ctk.CTkFrame(self, fg_color="transparent", height=60)
         bot.pack(fill="x", padx=20, pady=20)
+        self.progress_lbl = ctk.CTkLabel(bot, text="", font=("Roboto", 12), text_color="gray60")
+        self.progress_lbl.pack(side="left")
         ctk.CTkButton(bot, text="Cancel", fg_color="transparent", text_color="gray", hover_color="#EEEEEE", command=self.close_safe).pack(side="right", padx=10)
         ctk.CTkButton(bot, text="Confirm Selection", width=150, height=40, font=("Roboto Medium", 14), fg_color=COLOR_ACCENT, text_color="white", hover_color=COLOR_BTN_HOVER, command=self.on_confirm).pack(side="right")
 
         self.loading_lbl = ctk.CTkLabel(self.scroll, text="Analyzing PDF Structure...\n(Scanning for split lines...)", font=("Roboto", 16), text_color="black")
-        self.loading_lbl.pack(pady=150)
+        self.loading_lbl.place(relx=0.5, rely=0.4, anchor="center")
 
-        threading.Thread(target=self.thread_load_smart, daemon=True).start()
+        self.job = scheduler.submit("Loading preview", self.thread_load_smart)
+        self.after(PREVIEW_POLL_MS, self.drain_feed)
 
-    def thread_load_smart(self):
-        try:
-            pages = convert_from_path(self.pdf_path, dpi=72, poppler_path=self.poppler_path, fmt='jpeg')
-            display_items = []
-            
-            for i, p in enumerate(pages):
-                page_num = i + 1
-                boxes = detect_split_structure(p)
-                
-                for idx, box in enumerate(boxes):
-                    segment = p.crop(box)
-                    seg_filename = f"p{page_num}_{idx}.jpg"
-                    seg_path = os.path.join(self.temp_dir, seg_filename)
-                    segment.save(seg_path, "JPEG")
-                    
-                    item_id = f"p{page_num}_{idx}"
-                    self.item_data[item_id] = {
-                        "id": item_id, "page": page_num, "sub_idx": idx + 1,
-                        "box": box, "orig_w": p.width, "path": seg_path
-                    }
-                    display_items.append(self.item_data[item_id])
-
-            self.after(0, lambda: self.build_ui(display_items))
+    def thread_load_smart(self, job):
+        # Spans for this load go to PDFCONV_TRACE_DIR when tracing is on (see instrument.py)
+        from instrument import run
+        with run("preview"):
+            self.load_smart(job)
 
+    def load_smart(self, job):
+        # Streams the PDF in chunks of PREVIEW_CHUNK_PAGES so only one chunk of pages is ever in memory
+        split_db, key = None, None
+        try:
+            from splitter import detect_split_page, detector_signature, VECTOR_SPLIT
+            from instrument import span
+            import split_cache
+            import dedup
+
+            # Near-duplicates (earlier in this PDF or already extracted in an earlier run) are flagged
+            self.dedup_mode = dedup.resolve_mode()
+            index = dedup.seen_index("extract") if self.dedup_mode != "off" else None
+            local = dedup.SeenIndex()
+
+            # Known document: boxes + segment thumbnails come straight from the split cache
+            if split_cache.cache_enabled():
+                split_db = split_cache.SplitCache()
+                key = split_db.key(self.pdf_path, self.page_cache.preview_dpi, self.page_cache.dpi,
+                                   detector_signature(), self.page_cache.renderer.name)
+                meta = split_db.load(key)
+                if meta:
+                    for item in meta["items"]: self.item_data[item["id"]] = item
+                    if index is not None:
+                        dedup.hash_cached_parts(meta["items"], meta.get("hash"))
+                        self.flag_duplicates(meta["items"], local, index)
+                    self.send(job, ("items", meta["items"], meta["pages"], meta["pages"]))
+                    return
+
+            total = self.page_cache.page_count()
+            if total < 1:
+                raise ValueError("PDF has no pages.")
+
+            all_items = []
+            for first in range(1, total + 1, PREVIEW_CHUNK_PAGES):
+                if job.cancelled: break
+                last = min(first + PREVIEW_CHUNK_PAGES - 1, total)
+                # Rendered once at 300 DPI; the preview is a downscale of the cached raster
+                pages = self.page_cache.render_range(first, last)
+                chunk_items = []
+
+                for page_num, high in pages.items():
+                    p = self.page_cache.preview(page_num, high)
+                    # Vector separator from the PDF drawing operations when present, pixel scan otherwise
+                    vec = self.page_cache.vector_info(page_num) if VECTOR_SPLIT else None
+                    with span("detect", page=page_num):
+                        boxes = detect_split_page(p, vec)
+
+                    for idx, box in enumerate(boxes):
+                        item_id = f"p{page_num}_{idx}"
+                        self.item_data[item_id] = {
+                            "id": item_id, "page": page_num, "sub_idx": idx + 1,
+                            "box": box, "orig_w": p.width
+                        }
+                        with span("thumbnail", page=page_num):
+                            segment = p.crop(box)
+                            # Fingerprinted at preview resolution, before the tile downscale (stored in the split cache)
+                            if index is not None: self.item_data[item_id]["phash"] = dedup.phash(segment)
+                            segment.thumbnail(THUMB_SIZE, reducing_gap=2.0)
+                        self.thumbs.put(item_id, segment)
+                        chunk_items.append(self.item_data[item_id])
+                del pages
+                if index is not None: self.flag_duplicates(chunk_items, local, index)
+                all_items.extend(chunk_items)
+
+                self.send(job, ("items", chunk_items, last, total))
+                job.progress(last, total, f"{last}/{total} pages")
+
+            # The gallery is complete before the split cache is written
+            job.check()
+            if split_db:
+                seg_dir = split_db.begin(key)
+                for item in all_items:
+                    item["path"] = os.path.join(seg_dir, f"{item['id']}.jpg")
+                    if not self.thumbs.write(item["id"], item["path"]): raise OSError(f"thumbnail {item['id']} missing")
+                split_db.commit(key, total, all_items, hash=dedup.HASH_VERSION)
+
+        except Cancelled:
+            if split_db: split_db.discard(key)
         except Exception as e:
             traceback.print_exc()
-            self.after(0, lambda: self.show_error(str(e)))
+            if split_db: split_db.discard(key)
+            if not job.cancelled:
+                try: self.send(job, ("error", str(e)))
+                except Cancelled: pass
+
+    def flag_duplicates(self, items, local, index):
+        # Loader thread; the flags reach the UI with the chunk
+        import dedup
+        for item in items:
+            if "phash" not in item: continue
+            match = dedup.check(item["phash"], dedup.box_aspect(item["box"]), dedup.part_label(self.pdf_path, item), local, index)
+            if match: self.dups[item["id"]] = match
+
+    def send(self, job, msg):
+        # Blocks while the UI is PREVIEW_QUEUE_CHUNKS chunks behind; raises Cancelled once the gallery closes
+        while True:
+            try:
+                self.feed.put(msg, timeout=0.1)
+                return
+            except queue.Full:
+                job.check()
+
+    def drain_feed(self):
+        # UI thread: applies every queued chunk, then polls again until the loader is done
+        if self.closed or not self.winfo_exists(): return
+        try:
+            while True:
+                msg = self.feed.get_nowait()
+                if msg[0] == "items": self.build_ui(*msg[1:])
+                else: self.show_error(msg[1])
+        except queue.Empty:
+            pass
+        if self.job.state in ("queued", "running") or not self.feed.empty():
+            self.after(PREVIEW_POLL_MS, self.drain_feed)
 
     def show_error(self, msg):
-        self.loading_lbl.configure(text=f"Error: {msg}", text_color="#D32F2F")
+        if self.loading_lbl.winfo_exists():
+            self.loading_lbl.configure(text=f"Error: {msg}", text_color="#D32F2F")
+        else:
+            self.progress_lbl.configure(text=f"Error: {msg}", text_color="#D32F2F")
+
+    def build_ui(self, items, done, total):
+        # Appends one streamed chunk of items; the grid only builds cards for visible rows
+        if self.closed: return
+        if self.loading_lbl.winfo_exists():
+            self.loading_lbl.destroy()
+        text = f"Loaded {done} of {total} pages" if done < total else f"{total} pages"
+        if self.dups:
+            text += f" · {len(self.dups)} near-duplicates" + (" (left out of Select All)" if self.dedup_mode == "skip" else "")
+        self.progress_lbl.configure(text=text)
+        for item in items:
+            self.item_order.append(item['id'])
+            self.page_counts[item['page']] = self.page_counts.get(item['page'], 0) + 1
+        self.scroll.set_count(len(self.item_order))
+
+    def load_thumb(self, iid):
+        # Loader thread: spilled thumbnails, or files of a split-cache hit
+        img = self.thumbs.get(iid)
+        if img is not None: return img
+        from thumbs import make_thumbnail
+        return make_thumbnail(self.item_data[iid]["path"], THUMB_SIZE, self.thumb_stats)
+
+    def make_card(self, parent):
+        # Card Style: White with Light Grey Border
+        card = ctk.CTkFrame(parent, corner_radius=10, border_width=2, 
+                            border_color=COLOR_BORDER, fg_color=COLOR_CARD_BG)
+        card.btn = ctk.CTkButton(
+            card, text="", 
+            fg_color="transparent", hover_color="#EEEEEE",
+            width=130, height=170
+        )
+        card.btn.pack(padx=5, pady=(5,0))
+        card.lbl = ctk.CTkLabel(card, text="", font=("Roboto", 13, "bold"), text_color=COLOR_TEXT_BLACK)
+        card.lbl.pack(pady=5)
+        return card
 
-    def build_ui(self, items):
-        self.loading_lbl.destroy()
-        cols = 5
-        for i, item in enumerate(items):
-            try:
-                pil_img = Image.open(item['path'])
-                pil_img.thumbnail((120, 160))
-                ctk_img = ctk.CTkImage(light_image=pil_img, dark_image=pil_img, size=pil_img.size)
-            except: continue
-
-            # Card Style: White with Light Grey Border
-            card = ctk.CTkFrame(self.scroll, corner_radius=10, border_width=2, 
-                                border_color=COLOR_BORDER, fg_color=COLOR_CARD_BG)
-            card.grid(row=i//cols, column=i%cols, padx=10, pady=10)
-
-            btn = ctk.CTkButton(
-                card, text="", image=ctk_img, 
-                fg_color="transparent", hover_color="#EEEEEE",
-                width=130, height=170,
-                command=lambda x=item['id']: self.toggle_item(x)
-            )
-            btn.pack(padx=5, pady=(5,0))
-            
-            lbl_txt = f"Page {item['page']}"
-            count_on_page = len([x for x in items if x['page'] == item['page']])
-            if count_on_page > 1:
-                lbl_txt += f"-{item['sub_idx']}"
-                
-            ctk.CTkLabel(card, text=lbl_txt, font=("Roboto", 13, "bold"), text_color=COLOR_TEXT_BLACK).pack(pady=5)
-            self.card_refs[item['id']] = card
-            
-            # Default state: Deselected
-            self.toggle_item(item['id'], force_state=False)
+    def bind_card(self, card, index, thumb):
+        item = self.item_data[self.item_order[index]]
+        lbl_txt = f"Page {item['page']}"
+        if self.page_counts.get(item['page'], 0) > 1:
+            lbl_txt += f"-{item['sub_idx']}"
+        dup = item['id'] in self.dups
+        if dup: lbl_txt += " · dup"
+        card.btn.configure(image=thumb, command=lambda x=item['id']: self.toggle_item(x))
+        card.lbl.configure(text=lbl_txt, text_color="gray50" if dup else COLOR_TEXT_BLACK)
+        card.iid = item['id']
+        card.configure(border_color=COLOR_ACCENT if item['id'] in self.selected_ids else COLOR_BORDER)
 
     def toggle_item(self, iid, force_state=None):
-        card = self.card_refs[iid]
         is_sel = force_state if force_state is not None else (iid not in self.selected_ids)
         if is_sel:
             self.selected_ids.add(iid)
-            card.configure(border_color=COLOR_ACCENT) # Red Border when selected
         else:
             self.selected_ids.discard(iid)
-            card.configure(border_color=COLOR_BORDER) # Grey Border when deselected
+        # Only a visible card needs repainting; off-screen cards pick the state up when bound
+        for slot in self.scroll.slots:
+            if slot["index"] >= 0 and getattr(slot["card"], "iid", None) == iid:
+                slot["card"].configure(border_color=COLOR_ACCENT if is_sel else COLOR_BORDER) # Red Border when selected
 
     def select_all(self):
-        for iid in self.card_refs: self.toggle_item(iid, force_state=True)
+        skip = self.dups if self.dedup_mode == "skip" else ()
+        self.selected_ids.update(iid for iid in self.item_order if iid not in skip)
+        self.scroll.refresh()
     def deselect_all(self):
-        for iid in self.card_refs: self.toggle_item(iid, force_state=False)
+        self.selected_ids.clear()
+        self.scroll.refresh()
     def on_confirm(self):
         if not self.selected_ids: return
         selected = [self.item_data[iid] for iid in self.selected_ids]
@@ -248,8 +513,11 @@ class VisualPageSelector(ctk.CTkToplevel):
         self.result = selected
         self.close_safe()
     def close_safe(self):
-        try: shutil.rmtree(self.temp_dir)
-        except: pass
+        # Stops the loader at its next chunk; spilled thumbnails are removed once it has exited
+        self.closed = True
+        self.job.cancel()
+        self.job.add_cleanup(self.thumbs.close)
+        report_thumbs("page_selector", self.thumb_stats)
         self.destroy()
 
 # --- 2. VISUAL SORT INTERFACE ---
@@ -263,11 +531,13 @@ class VisualSortInterface(ctk.CTkToplevel):
         self.result_paths = None
         self.drag_data = {"item_idx": None, "widget": None}
         self.drag_window = None 
-        self.card_widgets = [] 
         
         self.transient(parent)
         self.grab_set()
         self.configure(fg_color=COLOR_MAIN_BG)
+        from thumbs import ThumbStats
+        self.thumb_stats = ThumbStats()
+        self.bind("<Destroy>", lambda e: report_thumbs("sort_gallery", self.thumb_stats) if e.widget is self else None, add="+")
         
         # Header (Blue)
         top = ctk.CTkFrame(self, fg_color=COLOR_HEADER_BG, corner_radius=0)
@@ -279,7 +549,9 @@ class VisualSortInterface(ctk.CTkToplevel):
         ctk.CTkLabel(title_frame, text="Arrange Images", font=("Roboto Medium", 22), text_color="white").pack(side="left")
         ctk.CTkLabel(title_frame, text="(Drag to reorder)", font=("Roboto", 14), text_color="#DDDDDD").pack(side="left", padx=10)
         
-        self.scroll = ctk.CTkScrollableFrame(self, fg_color=COLOR_MAIN_BG)
+        self.scroll = VirtualGrid(self, cols=4, cell_w=200, cell_h=260, make_card=self.make_card,
+                                  bind_card=self.bind_card, thumb_key=lambda i: self.image_paths[i],
+                                  load_thumb=self.make_square_thumb, thumb_size=(120, 120))
         self.scroll.pack(fill="both", expand=True, padx=20, pady=10)
         
         bot = ctk.CTkFrame(self, fg_color="transparent")
@@ -290,55 +562,67 @@ class VisualSortInterface(ctk.CTkToplevel):
         
         self.refresh_grid()
 
+    def make_square_thumb(self, path, size=(120, 120)):
+        # PIL only (safe on the grid's loader thread); reduced-scale decode where the codec allows
+        from thumbs import make_thumbnail
+        img = make_thumbnail(path, size, self.thumb_stats)
+        bg = Image.new('RGBA', size, (0, 0, 0, 0))
+        offset = ((size[0] - img.size[0]) // 2, (size[1] - img.size[1]) // 2)
+        bg.paste(img, offset)
+        return bg
+
     def get_square_thumb(self, path, size=(120, 120)):
         try:
-            img = Image.open(path) 
-            img.thumbnail(size)
-            bg = Image.new('RGBA', size, (0, 0, 0, 0))
-            offset = ((size[0] - img.size[0]) // 2, (size[1] - img.size[1]) // 2)
-            bg.paste(img, offset)
+            bg = self.make_square_thumb(path, size)
             return ctk.CTkImage(light_image=bg, dark_image=bg, size=size)
         except:
             return None
 
-    def refresh_grid(self):
-        for w in self.scroll.winfo_children(): w.destroy()
-        self.card_widgets = []
-        cols = 4 
+    def refresh_grid(self, start=0, end=None):
+        # Only cards whose position changed (indices start..end-1) are re-bound; thumbnails
+        # come from the grid's (path, size) cache, so nothing is re-decoded
+        self.scroll.set_count(len(self.image_paths))
+        self.scroll.rebind(start, end)
+
+    def make_card(self, parent):
+        f = ctk.CTkFrame(parent, fg_color=COLOR_CARD_BG, width=180, height=240, corner_radius=10, border_width=1, border_color=COLOR_BORDER)
+        f.pack_propagate(False) 
+        f.index = -1
         
-        for i, path in enumerate(self.image_paths):
-            f = ctk.CTkFrame(self.scroll, fg_color=COLOR_CARD_BG, width=180, height=240, corner_radius=10, border_width=1, border_color=COLOR_BORDER)
-            f.pack_propagate(False) 
-            f.grid(row=i//cols, column=i%cols, padx=10, pady=10)
-            self.card_widgets.append(f)
-            
-            top_bar = ctk.CTkFrame(f, fg_color="transparent", height=25)
-            top_bar.pack(fill="x", padx=5, pady=(5,0))
-            ctk.CTkButton(top_bar, text="X", width=24, height=24, fg_color="#FF5555", hover_color="#990000", text_color="white",
-                          command=lambda idx=i: self.remove(idx)).pack(side="right")
-
-            img_container = ctk.CTkLabel(f, text="", cursor="hand2")
-            thumb = self.get_square_thumb(path)
-            if thumb: img_container.configure(image=thumb)
-            else: img_container.configure(text="Error")
-            img_container.pack(pady=5, padx=10, expand=True)
-            
-            img_container.bind("<ButtonPress-1>", lambda event, idx=i: self.on_drag_start(event, idx))
-            img_container.bind("<B1-Motion>", self.on_drag_motion)
-            img_container.bind("<ButtonRelease-1>", self.on_drag_stop)
-            
-            ctrl = ctk.CTkFrame(f, fg_color="transparent", height=40)
-            ctrl.pack(side="bottom", fill="x", pady=10, padx=5)
-            
-            if i > 0:
-                ctk.CTkButton(ctrl, text="<", width=30, fg_color=COLOR_ACCENT, text_color="white", hover_color=COLOR_BTN_HOVER, 
-                              command=lambda idx=i: self.move_left(idx)).pack(side="left")
-            
-            ctk.CTkLabel(ctrl, text=str(i+1), font=("Roboto", 14, "bold"), text_color=COLOR_TEXT_BLACK).pack(side="left", expand=True)
-            
-            if i < len(self.image_paths) - 1:
-                ctk.CTkButton(ctrl, text=">", width=30, fg_color=COLOR_ACCENT, text_color="white", hover_color=COLOR_BTN_HOVER, 
-                              command=lambda idx=i: self.move_right(idx)).pack(side="right")
+        top_bar = ctk.CTkFrame(f, fg_color="transparent", height=25)
+        top_bar.pack(fill="x", padx=5, pady=(5,0))
+        ctk.CTkButton(top_bar, text="X", width=24, height=24, fg_color="#FF5555", hover_color="#990000", text_color="white",
+                      command=lambda: self.remove(f.index)).pack(side="right")
+
+        f.img = ctk.CTkLabel(f, text="", cursor="hand2")
+        f.img.pack(pady=5, padx=10, expand=True)
+        
+        f.img.bind("<ButtonPress-1>", lambda event: self.on_drag_start(event, f.index))
+        f.img.bind("<B1-Motion>", self.on_drag_motion)
+        f.img.bind("<ButtonRelease-1>", self.on_drag_stop)
+        
+        ctrl = ctk.CTkFrame(f, fg_color="transparent", height=40)
+        ctrl.pack(side="bottom", fill="x", pady=10, padx=5)
+        ctrl.grid_columnconfigure(1, weight=1)
+        
+        f.left = ctk.CTkButton(ctrl, text="<", width=30, fg_color=COLOR_ACCENT, text_color="white", hover_color=COLOR_BTN_HOVER, 
+                               command=lambda: self.move_left(f.index))
+        f.left.grid(row=0, column=0)
+        f.num = ctk.CTkLabel(ctrl, text="", font=("Roboto", 14, "bold"), text_color=COLOR_TEXT_BLACK)
+        f.num.grid(row=0, column=1)
+        f.right = ctk.CTkButton(ctrl, text=">", width=30, fg_color=COLOR_ACCENT, text_color="white", hover_color=COLOR_BTN_HOVER, 
+                                command=lambda: self.move_right(f.index))
+        f.right.grid(row=0, column=2)
+        return f
+
+    def bind_card(self, f, i, thumb):
+        f.index = i
+        f.img.configure(image=thumb)
+        f.num.configure(text=str(i+1))
+        if i > 0: f.left.grid()
+        else: f.left.grid_remove()
+        if i < len(self.image_paths) - 1: f.right.grid()
+        else: f.right.grid_remove()
 
     def on_drag_start(self, event, idx):
         self.drag_data["item_idx"] = idx
@@ -349,7 +633,11 @@ class VisualSortInterface(ctk.CTkToplevel):
         self.drag_window.attributes("-alpha", 0.7) 
         
         path = self.image_paths[idx]
-        thumb = self.get_square_thumb(path, size=(100, 100))
+        cached = self.scroll.cached_thumb(path)
+        if cached is not None and cached is not self.scroll.placeholder:
+            thumb = ctk.CTkImage(light_image=cached.cget("light_image"), size=(100, 100))
+        else:
+            thumb = self.get_square_thumb(path, size=(100, 100))
         lbl = ctk.CTkLabel(self.drag_window, text="", image=thumb)
         lbl.pack()
         x, y = event.x_root, event.y_root
@@ -372,27 +660,12 @@ class VisualSortInterface(ctk.CTkToplevel):
         x_root = self.winfo_pointerx()
         y_root = self.winfo_pointery()
         
-        closest_idx = -1
-        min_dist = float('inf')
-        
-        for i, card in enumerate(self.card_widgets):
-            try:
-                cx = card.winfo_rootx() + (card.winfo_width() // 2)
-                cy = card.winfo_rooty() + (card.winfo_height() // 2)
-                dist = math.hypot(x_root - cx, y_root - cy)
-                
-                if dist < min_dist:
-                    min_dist = dist
-                    closest_idx = i
-            except: continue
-            
+        # Drop slot comes straight from the grid geometry (off-screen cards have no widgets)
+        closest_idx, right_half = self.scroll.index_at(x_root, y_root)
         if closest_idx == -1: return
-
-        target_card = self.card_widgets[closest_idx]
-        card_center_x = target_card.winfo_rootx() + (target_card.winfo_width() // 2)
         
         insert_at = closest_idx
-        if x_root > card_center_x: insert_at = closest_idx + 1
+        if right_half: insert_at = closest_idx + 1
 
         if src_idx != insert_at:
             item = self.image_paths.pop(src_idx)
@@ -400,22 +673,56 @@ class VisualSortInterface(ctk.CTkToplevel):
             if insert_at < 0: insert_at = 0
             if insert_at > len(self.image_paths): insert_at = len(self.image_paths)
             self.image_paths.insert(insert_at, item)
-            self.refresh_grid()
+            self.refresh_grid(min(src_idx, insert_at), max(src_idx, insert_at) + 1)
         self.drag_data["item_idx"] = None
 
     def move_left(self, i):
         self.image_paths[i], self.image_paths[i-1] = self.image_paths[i-1], self.image_paths[i]
-        self.refresh_grid()
+        self.refresh_grid(i - 1, i + 1)
     def move_right(self, i):
         self.image_paths[i], self.image_paths[i+1] = self.image_paths[i+1], self.image_paths[i]
-        self.refresh_grid()
+        self.refresh_grid(i, i + 2)
     def remove(self, i):
         self.image_paths.pop(i)
-        self.refresh_grid()
+        # The card before i changes too when it becomes the last one (its ">" button goes)
+        self.refresh_grid(max(0, i - 1))
     def on_confirm(self):
         self.result_paths = self.image_paths
         self.destroy()
 
+# --- BATCH OPTIONS (several PDFs, no gallery) ---
+class BatchOptionsDialog(ctk.CTkToplevel):
+    RULES = [("first", "Label part only (above the split line)"),
+             ("all", "All parts"),
+             ("last", "Bottom part only (below the split line)")]
+
+    def __init__(self, parent, count):
+        super().__init__(parent)
+        self.title("Batch Extract")
+        self.geometry("420x260")
+        self.resizable(False, False)
+        self.transient(parent)
+        self.grab_set()
+        self.after(200, lambda: self.focus())
+        self.configure(fg_color=COLOR_MAIN_BG)
+        self.result = None
+
+        ctk.CTkLabel(self, text=f"Extract {count} PDFs", font=("Roboto Medium", 18), text_color=COLOR_TEXT_BLACK).pack(anchor="w", padx=20, pady=(20, 10))
+        self.rule = ctk.StringVar(value="first")
+        for value, text in self.RULES:
+            ctk.CTkRadioButton(self, text=text, variable=self.rule, value=value, fg_color=COLOR_ACCENT,
+                               text_color=COLOR_TEXT_BLACK).pack(anchor="w", padx=30, pady=4)
+
+        bot = ctk.CTkFrame(self, fg_color="transparent")
+        bot.pack(fill="x", padx=20, pady=20, side="bottom")
+        ctk.CTkButton(bot, text="Cancel", fg_color="transparent", text_color="gray", hover_color="#EEEEEE", command=self.destroy).pack(side="right", padx=10)
+        ctk.CTkButton(bot, text="Extract", width=120, height=36, font=("Roboto Medium", 14), fg_color=COLOR_ACCENT,
+                      text_color="white", hover_color=COLOR_BTN_HOVER, command=self.on_confirm).pack(side="right")
+
+    def on_confirm(self):
+        self.result = self.rule.get()
+        self.destroy()
+
 # --- 3. MAIN APP ---
 BaseClass = TkinterDnD.DnDWrapper if DND_AVAIL else object
 
@@ -446,7 +753,9 @@ class ModernApp(ctk.CTk, BaseClass):
         main_frame.pack(fill="both", expand=True, padx=30, pady=20)
 
         # 1. PDF -> Image (DROP ZONE 1)
-        self.card_p2i = self.create_card(main_frame, "PDF to Image", "Convert To", "fmt_var", ["PNG", "JPEG", "TIFF", "BMP"], "OPEN PDF...", self.flow_p2i)
+        # PDF = the selected parts cut from the original pages into one PDF (no rasterizing)
+        self.card_p2i = self.create_card(main_frame, "PDF to Image", "Convert To", "fmt_var", ["PNG", "JPEG", "TIFF", "BMP", "PDF"], "OPEN PDF...", self.flow_p2i,
+                                         preset_var_name="preset_var")
         
         # 2. Image -> PDF (DROP ZONE 2)
         # Filters include .heic and .heif
@@ -454,7 +763,8 @@ class ModernApp(ctk.CTk, BaseClass):
 
         # 3. Image Converter (DROP ZONE 3)
         # Filters include .heic and .heif
-        self.card_i2i = self.create_card(main_frame, "Image Converter", "Convert To", "fmt_var_i2i", ["JPEG", "PNG", "TIFF", "BMP", "WEBP"], "SELECT IMAGES...", self.flow_i2i)
+        self.card_i2i = self.create_card(main_frame, "Image Converter", "Convert To", "fmt_var_i2i", ["JPEG", "PNG", "TIFF", "BMP", "WEBP"], "SELECT IMAGES...", self.flow_i2i,
+                                         preset_var_name="preset_var_i2i")
 
         # Footer
         if DND_AVAIL:
@@ -467,10 +777,17 @@ class ModernApp(ctk.CTk, BaseClass):
             self.card_i2i.drop_target_register(DND_FILES)
             self.card_i2i.dnd_bind('<<Drop>>', self.on_drop_i2i)
 
-        self.status = ctk.CTkLabel(self, text="Ready", text_color="gray60")
-        self.status.pack(side="bottom", pady=10)
+        status_bar = ctk.CTkFrame(self, fg_color="transparent")
+        status_bar.pack(side="bottom", pady=10)
+        self.status = ctk.CTkLabel(status_bar, text="Ready", text_color="gray60")
+        self.status.pack(side="left")
+        self.cancel_btn = ctk.CTkButton(status_bar, text="Cancel", width=70, height=24, fg_color="transparent",
+                                        text_color="gray", hover_color="#EEEEEE", command=self.cancel_jobs)
+
+        # Background work of all cards: queued, capped at one CPU slot per core, cancellable
+        self.jobs = JobScheduler(notify=lambda job: self.after(0, self.update_status))
 
-    def create_card(self, parent, title, sub_label, dropdown_var_name, dropdown_vals, btn_text, cmd, is_pdf_mode=False):
+    def create_card(self, parent, title, sub_label, dropdown_var_name, dropdown_vals, btn_text, cmd, is_pdf_mode=False, preset_var_name=None):
         card = ctk.CTkFrame(parent, fg_color=COLOR_CARD_BG, corner_radius=8, border_width=1, border_color=COLOR_BORDER)
         card.pack(fill="x", pady=10, ipady=10)
 
@@ -494,6 +811,17 @@ class ModernApp(ctk.CTk, BaseClass):
                             fg_color=COLOR_DROPDOWN_BG, border_width=2, border_color=COLOR_HEADER_BG, # Blue Border
                             button_color=COLOR_HEADER_BG, button_hover_color="#004080", text_color=COLOR_TEXT_BLACK).pack(pady=(2,0))
 
+        # Encoder speed/size preset (see encoders.py), names kept in sync with encoders.PRESET_NAMES
+        if preset_var_name:
+            middle = ctk.CTkFrame(content, fg_color="transparent")
+            middle.pack(side="left", padx=(15, 0))
+            ctk.CTkLabel(middle, text="Preset", font=("Roboto", 12), text_color="gray40").pack(anchor="w")
+            var = ctk.StringVar(value=os.environ.get("PDFCONV_PRESET", "balanced").lower())
+            setattr(self, preset_var_name, var)
+            ctk.CTkComboBox(middle, variable=var, values=["balanced", "fast", "small", "sharp"], width=110, state="readonly",
+                            fg_color=COLOR_DROPDOWN_BG, border_width=2, border_color=COLOR_HEADER_BG,
+                            button_color=COLOR_HEADER_BG, button_hover_color="#004080", text_color=COLOR_TEXT_BLACK).pack(pady=(2,0))
+
         ctk.CTkButton(content, text=btn_text, height=40, font=("Roboto Medium", 13),
                       fg_color=COLOR_ACCENT, text_color="white", hover_color=COLOR_BTN_HOVER,
                       command=cmd).pack(side="left", padx=(20, 0), fill="x", expand=True, anchor="s")
@@ -501,9 +829,11 @@ class ModernApp(ctk.CTk, BaseClass):
 
     # --- SPECIFIC DROP HANDLERS ---
     def on_drop_p2i(self, event):
-        files = self.tk.splitlist(event.data)
-        if files and files[0].lower().endswith(".pdf"):
-            self.process_p2i_path(files[0])
+        pdfs = [f for f in self.tk.splitlist(event.data) if f.lower().endswith(".pdf")]
+        if len(pdfs) == 1:
+            self.process_p2i_path(pdfs[0])
+        elif pdfs:
+            self.process_p2i_batch(pdfs)
         else:
             messagebox.showerror("Error", "Please drop a PDF file here.")
 
@@ -525,31 +855,45 @@ class ModernApp(ctk.CTk, BaseClass):
 
     # --- UTILS & FLOWS ---
     def get_poppler(self):
-        if getattr(sys, 'frozen', False):
-            base = sys._MEIPASS
-            p = os.path.join(base, 'poppler_bin')
-            if os.path.exists(os.path.join(p, 'pdftoppm.exe')): return p
-        local = os.path.join(os.getcwd(), 'poppler', 'Library', 'bin')
-        if os.path.exists(os.path.join(local, 'pdftoppm.exe')): return local
-        local2 = os.path.join(os.getcwd(), 'poppler', 'bin')
-        if os.path.exists(os.path.join(local2, 'pdftoppm.exe')): return local2
-        return ""
+        from page_cache import find_poppler
+        return find_poppler()
 
     def set_state(self, busy, msg=""):
         self.status.configure(text=f"● {msg}" if busy else "Ready", text_color=COLOR_ACCENT if busy else "gray60")
 
+    def update_status(self):
+        text = self.jobs.status_text()
+        self.set_state(bool(text), text)
+        if text: self.cancel_btn.pack(side="left", padx=(10, 0))
+        else: self.cancel_btn.pack_forget()
+
+    def cancel_jobs(self):
+        self.jobs.cancel_all()
+
     def flow_p2i(self):
-        pdf = filedialog.askopenfilename(filetypes=[("PDF", "*.pdf")])
-        if pdf: self.process_p2i_path(pdf)
+        pdfs = filedialog.askopenfilenames(filetypes=[("PDF", "*.pdf")])
+        if len(pdfs) == 1: self.process_p2i_path(pdfs[0])
+        elif pdfs: self.process_p2i_batch(list(pdfs))
 
     def process_p2i_path(self, pdf):
+        from renderers import backend_name
+        from page_cache import PageRenderCache
         pop = self.get_poppler()
-        if not pop:
-            messagebox.showerror("Error", "Poppler not found.")
+        try:
+            # Poppler is only required when PyMuPDF (in-process renderer) is unavailable or not selected
+            if not pop and backend_name() == "poppler":
+                messagebox.showerror("Error", "Poppler not found.")
+                return
+            cache = PageRenderCache(pdf, pop)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not open PDF:\n{e}")
             return
-        gal = VisualPageSelector(self, pdf, pop)
+        gal = VisualPageSelector(self, pdf, pop, cache, self.jobs)
         self.wait_window(gal)
-        if not gal.result: return
+        # The preview job may still be finishing its chunk: the cache closes once it has stopped
+        if not gal.result:
+            gal.job.add_cleanup(cache.close)
+            return
 
         fmt = self.fmt_var.get()
         target_file = filedialog.asksaveasfilename(
@@ -558,49 +902,97 @@ class ModernApp(ctk.CTk, BaseClass):
             defaultextension="." + fmt.lower(),
             filetypes=[(fmt, "*." + fmt.lower())]
         )
-        if not target_file: return
+        if not target_file:
+            gal.job.add_cleanup(cache.close)
+            return
         
         out_dir = os.path.dirname(target_file)
         base_name = os.path.splitext(os.path.basename(target_file))[0]
-        self.set_state(True, "Extracting...")
-        self.update() 
-        threading.Thread(target=self.work_p2i, args=(pdf, out_dir, base_name, gal.result, pop, fmt), daemon=True).start()
+        from extract import resolve_workers
+        preset = self.preset_var.get()
+        dups = [(item, gal.dups[item['id']]) for item in gal.result if item['id'] in gal.dups]
+        self.jobs.submit("Extracting", lambda job: self.work_p2i(job, out_dir, base_name, gal.result, cache, fmt, preset, dups),
+                         slots=resolve_workers(), cleanup=lambda: gal.job.add_cleanup(cache.close))
 
-    def work_p2i(self, pdf, out_dir, base_name, items, pop, fmt):
+    def work_p2i(self, job, out_dir, base_name, items, cache, fmt, preset, dups=()):
         try:
-            ext = "jpg" if fmt == "JPEG" else fmt.lower()
-            pages_map = {}
-            for item in items:
-                p = item['page']
-                if p not in pages_map: pages_map[p] = []
-                pages_map[p].append(item)
-
-            for p_num, p_items in pages_map.items():
-                high_res_imgs = convert_from_path(pdf, poppler_path=pop, dpi=300, first_page=p_num, last_page=p_num)
-                if not high_res_imgs: continue
-                
-                full_page_img = high_res_imgs[0]
-                low_w = p_items[0]['orig_w']
-                high_w = full_page_img.width
-                scale = high_w / low_w
-                
-                for item in p_items:
-                    lx, ly, ux, uy = item['box']
-                    crop_box = (int(lx * scale), int(ly * scale), int(ux * scale), int(uy * scale))
-                    final_img = full_page_img.crop(crop_box)
-                    if fmt == "JPEG" and final_img.mode != "RGB": final_img = final_img.convert("RGB")
-                    
-                    suffix = f"_p{p_num}"
-                    if len(p_items) > 1: suffix += f"_{item['sub_idx']}"
-                    
-                    final_img.save(os.path.join(out_dir, f"{base_name}{suffix}.{ext}"), fmt)
-
-            self.after(0, lambda: messagebox.showinfo("Success", "Extraction Complete!"))
-            self.after(0, lambda: self.set_state(False))
+            from extract import run_extraction
+            from encoders import EncodeStats
+            import dedup
+
+            def progress(done, total, p_num):
+                job.progress(done, total, f"{done}/{total} pages")
+
+            # Pages are spread across a process pool sized to the CPU slots the job was granted
+            # Black-and-white label parts are written 1-bit (PDFCONV_BILEVEL=off keeps 8-bit)
+            stats = EncodeStats()
+            from instrument import run
+            with run("work_p2i"):
+                run_extraction(cache, items, out_dir, base_name, fmt, workers=job.workers, progress=progress,
+                               preset=preset, stats=stats)
+            # Remembered for the duplicate flags of later runs
+            if dedup.resolve_mode() != "off": dedup.record_parts(cache.pdf_path, items, dups, dedup.seen_index("extract"))
+
+            self.after(0, lambda: messagebox.showinfo("Success", "Extraction Complete!\n\n" + stats.summary()))
+        except Cancelled:
+            pass
         except Exception as e:
             traceback.print_exc()
-            self.after(0, lambda: messagebox.showerror("Error", str(e)))
-            self.after(0, lambda: self.set_state(False))
+            msg = str(e)  # `e` is unbound once the except block ends, before the callback runs
+            self.after(0, lambda m=msg: messagebox.showerror("Error", m))
+
+    # Several PDFs: no gallery, parts are picked by rule (see batch.py)
+    def process_p2i_batch(self, pdfs):
+        from renderers import backend_name
+        pop = self.get_poppler()
+        if not pop and backend_name() == "poppler":
+            messagebox.showerror("Error", "Poppler not found.")
+            return
+        dlg = BatchOptionsDialog(self, len(pdfs))
+        self.wait_window(dlg)
+        if not dlg.result: return
+        out_dir = filedialog.askdirectory(title="Select Output Folder")
+        if not out_dir: return
+
+        fmt, preset, rule = self.fmt_var.get(), self.preset_var.get(), dlg.result
+        from extract import resolve_workers
+        self.jobs.submit(f"Extracting {len(pdfs)} PDFs", lambda job: self.work_p2i_batch(job, pdfs, pop, out_dir, fmt, preset, rule),
+                         slots=resolve_workers())
+
+    def work_p2i_batch(self, job, pdfs, pop, out_dir, fmt, preset, rule):
+        try:
+            from batch import run_batch_extraction
+            import dedup
+
+            def progress(done, total, res):
+                job.progress(done, total, f"{done}/{total} PDFs")
+
+            # Outputs are <out_dir>/<pdf name>_p<n>[_<sub>]
+            target = lambda pdf: (out_dir, os.path.splitext(os.path.basename(pdf))[0])
+            from instrument import run
+            with run("work_p2i_batch"):
+                results = run_batch_extraction(pdfs, target, fmt, rule=rule, poppler_path=pop, workers=job.workers,
+                                               progress=progress, preset=preset)
+
+            # Failures are listed in the completion dialog (windowed builds have no console)
+            failed = [r for r in results if r.error]
+            images = sum(len(r.written) for r in results)
+            mb = sum(r.stats.total_bytes() for r in results) / (1024 * 1024)
+            text = f"{len(results) - len(failed)} of {len(results)} PDFs extracted: {images} images, {mb:.1f} MB."
+            dups = dedup.summary([d for r in results for d in r.duplicates], dedup.resolve_mode())
+            if dups: text += f"\n{dups}."
+            if failed:
+                text += "\n\nFailed:\n" + "\n".join(f"  {os.path.basename(r.pdf)}: {r.error}" for r in failed[:10])
+                if len(failed) > 10: text += f"\n  ... and {len(failed) - 10} more"
+                self.after(0, lambda: messagebox.showwarning("Finished with Errors", text))
+            else:
+                self.after(0, lambda: messagebox.showinfo("Success", "Extraction Complete!\n\n" + text))
+        except Cancelled:
+            pass
+        except Exception as e:
+            traceback.print_exc()
+            msg = str(e)
+            self.after(0, lambda m=msg: messagebox.showerror("Error", m))
 
     def flow_i2p(self):
         imgs = filedialog.askopenfilenames(filetypes=[("Images", "*.png;*.jpg;*.jpeg;*.bmp;*.tiff;*.heic;*.heif")])
@@ -612,28 +1004,39 @@ class ModernApp(ctk.CTk, BaseClass):
         if not sorter.result_paths: return
         save = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF", "*.pdf")])
         if not save: return
-        self.set_state(True, "Merging...")
-        self.update()
-        threading.Thread(target=self.work_i2p, args=(sorter.result_paths, save), daemon=True).start()
+        imgs = sorter.result_paths
+        self.jobs.submit("Merging", lambda job: self.work_i2p(job, imgs, save))
 
-    def work_i2p(self, imgs, save_path):
+    def work_i2p(self, job, imgs, save_path):
         try:
-            image_list = []
-            for img_path in imgs:
-                img = Image.open(img_path) 
-                if img.mode != "RGB": img = img.convert("RGB")
-                image_list.append(img)
-            
-            if image_list:
-                first = image_list[0]
-                rest = image_list[1:]
-                first.save(save_path, "PDF", resolution=100.0, save_all=True, append_images=rest)
-
-            self.after(0, lambda: messagebox.showinfo("Success", "PDF Created!"))
-            self.after(0, lambda: self.set_state(False))
+            from merge import merge_images_to_pdf
+            import dedup
+
+            def progress(done, total):
+                job.progress(done, total, f"{done}/{total} pages")
+
+            # JPEG/JPEG2000 are embedded as-is; pages are streamed straight to disk
+            # (a cancelled merge removes its partial file)
+            from instrument import run
+            with run("work_i2p"):
+                # Repeated shots are fingerprinted from thumbnail-sized decodes (opt-in: PDFCONV_DEDUP_IMAGES)
+                mode = dedup.resolve_mode(images=True)
+                index = dedup.seen_index("merge") if mode != "off" else None
+                dups = []
+                if index is not None:
+                    imgs, dups, hashes = dedup.filter_images(imgs, mode, index, lambda d, t: job.progress(d, t, f"Fingerprinting {d}/{t}"),
+                                                               workers=job.workers)
+                if imgs: merge_images_to_pdf(imgs, save_path, progress=progress)
+                if index is not None: dedup.record_images(imgs, dups, hashes, index)
+
+            text = dedup.summary(dups, mode, "images")
+            if not imgs: self.after(0, lambda: messagebox.showinfo("Nothing to Merge", f"{text}; no PDF was written."))
+            else: self.after(0, lambda: messagebox.showinfo("Success", "PDF Created!" + (f"\n\n{text}." if text else "")))
+        except Cancelled:
+            pass
         except Exception as e:
-            self.after(0, lambda: messagebox.showerror("Error", str(e)))
-            self.after(0, lambda: self.set_state(False))
+            msg = str(e)
+            self.after(0, lambda m=msg: messagebox.showerror("Error", m))
 
     def flow_i2i(self):
         imgs = filedialog.askopenfilenames(filetypes=[("Images", "*.png;*.jpg;*.jpeg;*.bmp;*.tiff;*.webp;*.heic;*.heif")])
@@ -643,26 +1046,49 @@ class ModernApp(ctk.CTk, BaseClass):
         out_dir = filedialog.askdirectory(title="Select Output Folder")
         if not out_dir: return
         fmt = self.fmt_var_i2i.get()
-        self.set_state(True, f"Converting to {fmt}...")
-        self.update()
-        threading.Thread(target=self.work_i2i, args=(imgs, out_dir, fmt), daemon=True).start()
+        preset = self.preset_var_i2i.get()
+        from extract import resolve_workers
+        self.jobs.submit(f"Converting to {fmt}", lambda job: self.work_i2i(job, imgs, out_dir, fmt, preset),
+                         slots=min(resolve_workers(), len(imgs)))
 
-    def work_i2i(self, imgs, out_dir, fmt):
+    def work_i2i(self, job, imgs, out_dir, fmt, preset):
         try:
-            ext = "jpg" if fmt == "JPEG" else fmt.lower()
-            for img_path in imgs:
-                try:
-                    with Image.open(img_path) as im:
-                        base = os.path.splitext(os.path.basename(img_path))[0]
-                        if fmt == "JPEG" and im.mode in ("RGBA", "P"): im = im.convert("RGB")
-                        im.save(os.path.join(out_dir, f"{base}.{ext}"), fmt)
-                except: pass
-            self.after(0, lambda: messagebox.showinfo("Success", "Batch Conversion Complete!"))
-            self.after(0, lambda: self.set_state(False))
+            from convert import run_batch_convert
+            import dedup
+
+            def progress(report):
+                job.progress(report.done, report.total, report.status_text())
+
+            from instrument import run
+            with run("work_i2i"):
+                mode = dedup.resolve_mode(images=True)
+                index = dedup.seen_index("convert") if mode != "off" else None
+                dups = []
+                if index is not None:
+                    imgs, dups, hashes = dedup.filter_images(imgs, mode, index, lambda d, t: job.progress(d, t, f"Fingerprinting {d}/{t}"),
+                                                               workers=job.workers)
+                report = run_batch_convert(imgs, out_dir, fmt, workers=job.workers, progress=progress, preset=preset)
+                if index is not None: dedup.record_images([c[0] for c in report.converted], dups, hashes, index)
+
+            text = report.summary()   # lists the failed files (up to 10) with their reasons
+            if dups: text += f"\n{dedup.summary(dups, mode, 'images')}."
+            if report.failed:
+                self.after(0, lambda: messagebox.showwarning("Finished with Errors", text))
+            else:
+                self.after(0, lambda: messagebox.showinfo("Success", "Batch Conversion Complete!\n\n" + text))
+        except Cancelled:
+            pass
         except Exception as e:
-            self.after(0, lambda: messagebox.showerror("Error", str(e)))
-            self.after(0, lambda: self.set_state(False))
+            msg = str(e)
+            self.after(0, lambda m=msg: messagebox.showerror("Error", m))
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = ModernApp()
+    if os.environ.get("PDFCONV_STARTUP_PROBE"):
+        # Used by benchmarks/bench_startup.py: paint once, report, exit
+        app.update()
+        print(f"first_frame {time.perf_counter() - _T0:.4f}", flush=True)
+        app.destroy()
+        sys.exit(0)
     app.mainloop()
\ No newline at end of file
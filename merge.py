@@ -0,0 +1,155 @@
+import io
+import os
+import zlib
+import shutil
+import tempfile
+
+from convert import open_image, HEIF_EXTS
+from instrument import span
+from strips import over_budget, band_rows, iter_bands, band_reader
+
+PAGE_RESOLUTION = 100.0    # Pixels per inch used for the page size (same as the old Pillow merge)
+HEIF_JPEG_QUALITY = 95     # HEIC has no PDF filter; photos are re-encoded once at high quality
+FLATE_LEVEL = 6
+COPY_CHUNK = 1024 * 1024
+
+# --- EMBEDDING DECISION ---
+# JPEG / JPEG2000 files are copied into the PDF byte-for-byte (never decoded).
+# Everything else is decoded once: lossless sources go in as Flate, HEIC as JPEG.
+# Returns a dict describing the image XObject plus either a source file or raw bytes.
+# Images over the memory budget are Flate-compressed band by band into a temp file
+# ("temp": True, removed once the page is written) instead of one in-memory buffer.
+def _flate_banded(im, path, mode):
+    read = band_reader(im, path)
+    z = zlib.compressobj(FLATE_LEVEL)
+    fd, tmp = tempfile.mkstemp(prefix="pdfconv_merge_", suffix=".flate")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for top, bottom in iter_bands(im.height, band_rows(im.width, len(mode))):
+                band = read(top, bottom)
+                if band.mode != mode: band = band.convert(mode)
+                f.write(z.compress(band.tobytes()))
+            f.write(z.flush())
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return tmp
+
+def _prepare(path):
+    with open_image(path) as im:
+        w, h = im.size
+        fmt = im.format
+        mode = im.mode
+        adobe = "adobe" in im.info
+
+        if fmt == "JPEG" and mode in ("L", "RGB", "CMYK"):
+            spec = {"w": w, "h": h, "filter": "DCTDecode", "bpc": 8, "file": path,
+                    "cs": {"L": "DeviceGray", "RGB": "DeviceRGB", "CMYK": "DeviceCMYK"}[mode]}
+            if mode == "CMYK" and adobe:
+                # Adobe CMYK JPEGs store inverted values
+                spec["decode"] = "[1 0 1 0 1 0 1 0]"
+            return spec
+        if fmt == "JPEG2000":
+            return {"w": w, "h": h, "filter": "JPXDecode", "file": path}
+
+        if path.lower().endswith(HEIF_EXTS):
+            rgb = im.convert("RGB")
+            buf = io.BytesIO()
+            rgb.save(buf, "JPEG", quality=HEIF_JPEG_QUALITY, subsampling=0)
+            return {"w": w, "h": h, "filter": "DCTDecode", "bpc": 8, "cs": "DeviceRGB", "data": buf.getvalue()}
+
+        if over_budget((w, h), len(im.getbands())):
+            flat = mode if mode in ("1", "L") else "RGB"
+            return {"w": w, "h": h, "filter": "FlateDecode", "bpc": 1 if flat == "1" else 8,
+                    "cs": "DeviceRGB" if flat == "RGB" else "DeviceGray", "file": _flate_banded(im, path, flat), "temp": True}
+
+        if mode == "1":
+            return {"w": w, "h": h, "filter": "FlateDecode", "bpc": 1, "cs": "DeviceGray",
+                    "data": zlib.compress(im.tobytes(), FLATE_LEVEL)}
+        if mode == "L":
+            return {"w": w, "h": h, "filter": "FlateDecode", "bpc": 8, "cs": "DeviceGray",
+                    "data": zlib.compress(im.tobytes(), FLATE_LEVEL)}
+        rgb = im if mode == "RGB" else im.convert("RGB")
+        return {"w": w, "h": h, "filter": "FlateDecode", "bpc": 8, "cs": "DeviceRGB",
+                "data": zlib.compress(rgb.tobytes(), FLATE_LEVEL)}
+
+# --- STREAMING PDF WRITER ---
+# Objects are written as soon as each page is ready; only the xref offsets are
+# kept, so peak memory is roughly one image regardless of batch size.
+class StreamingPdfWriter:
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self.kids = []
+        self.next_id = 3          # 1 = Catalog, 2 = Pages (written last)
+        f.write(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+        self._obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    def _obj(self, num, body):
+        self.offsets[num] = self.f.tell()
+        self.f.write(f"{num} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _stream_obj(self, num, dict_body, data=None, file=None):
+        length = len(data) if data is not None else os.path.getsize(file)
+        self.offsets[num] = self.f.tell()
+        self.f.write(f"{num} 0 obj\n<< {dict_body} /Length {length} >>\nstream\n".encode())
+        if data is not None:
+            self.f.write(data)
+        else:
+            with open(file, "rb") as src:
+                shutil.copyfileobj(src, self.f, COPY_CHUNK)
+        self.f.write(b"\nendstream\nendobj\n")
+
+    def add_image_page(self, spec):
+        img_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+
+        pw = spec["w"] * 72.0 / PAGE_RESOLUTION
+        ph = spec["h"] * 72.0 / PAGE_RESOLUTION
+
+        d = f"/Type /XObject /Subtype /Image /Width {spec['w']} /Height {spec['h']} /Filter /{spec['filter']}"
+        if "cs" in spec: d += f" /ColorSpace /{spec['cs']}"
+        if "bpc" in spec: d += f" /BitsPerComponent {spec['bpc']}"
+        if "decode" in spec: d += f" /Decode {spec['decode']}"
+        self._stream_obj(img_id, d, data=spec.get("data"), file=spec.get("file"))
+
+        content = f"q {pw:.4f} 0 0 {ph:.4f} 0 0 cm /Im0 Do Q".encode()
+        self._stream_obj(content_id, "", data=content)
+
+        self._obj(page_id, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {pw:.4f} {ph:.4f}] "
+                            f"/Resources << /XObject << /Im0 {img_id} 0 R >> >> /Contents {content_id} 0 R >>").encode())
+        self.kids.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{k} 0 R" for k in self.kids)
+        self._obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.kids)} >>".encode())
+
+        xref_at = self.f.tell()
+        size = self.next_id
+        self.f.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for num in range(1, size):
+            self.f.write(f"{self.offsets[num]:010d} 00000 n \n".encode())
+        self.f.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode())
+
+# --- MERGE ENGINE ---
+# progress(done, total) is called after each page is written.
+def merge_images_to_pdf(imgs, save_path, progress=None):
+    tmp_path = save_path + ".part"
+    try:
+        with open(tmp_path, "wb") as f:
+            writer = StreamingPdfWriter(f)
+            for i, img_path in enumerate(imgs):
+                with span("convert", file=os.path.basename(img_path)):
+                    spec = _prepare(img_path)
+                with span("write", passthrough="file" in spec):
+                    try: writer.add_image_page(spec)
+                    finally:
+                        if spec.get("temp"): os.remove(spec["file"])
+                if progress: progress(i + 1, len(imgs))
+            writer.close()
+        os.replace(tmp_path, save_path)
+    except BaseException:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+    return save_path
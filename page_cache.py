@@ -0,0 +1,259 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from renderers import open_renderer
+from instrument import span
+from strips import over_budget
+
+# --- RENDER SETTINGS ---
+RENDER_DPI = 300                      # Extraction resolution (what work_p2i saves)
+PREVIEW_DPI = 72                      # Gallery / split-detection resolution
+MEM_LIMIT_BYTES = 256 * 1024 * 1024   # ~10 Letter pages at 300 DPI RGB
+DISK_LIMIT_BYTES = 2 * 1024 ** 3
+DISK_PNG_LEVEL = 1                    # Fast zlib level; label pages still shrink ~10-20x
+PREVIEW_KEEP = 8                      # Preview renders of banded (over-budget) pages kept in memory
+
+# --- POPPLER LOCATOR ---
+# Bundled copy (PyInstaller) first, then a 'poppler' folder next to the app. Returns "" if none found.
+def find_poppler():
+    if getattr(sys, 'frozen', False):
+        base = sys._MEIPASS
+        p = os.path.join(base, 'poppler_bin')
+        if os.path.exists(os.path.join(p, 'pdftoppm.exe')): return p
+    local = os.path.join(os.getcwd(), 'poppler', 'Library', 'bin')
+    if os.path.exists(os.path.join(local, 'pdftoppm.exe')): return local
+    local2 = os.path.join(os.getcwd(), 'poppler', 'bin')
+    if os.path.exists(os.path.join(local2, 'pdftoppm.exe')): return local2
+    return ""
+
+def _image_bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+# --- PAGE RENDER CACHE ---
+# Each page is rasterized once at RENDER_DPI by the document's renderer (see
+# renderers.py). The raster lives in a memory LRU and is written to a PNG in a private
+# temp dir (disk LRU) only when it is evicted from memory, or when a pool worker needs it
+# as a file (disk_path): a document that fits the memory budget costs no disk I/O while
+# previewing. Previews are derived by downscaling, and extraction reuses the stored raster
+# instead of rendering the page again.
+# Pages whose 300 DPI raster exceeds the memory budget (strips.py) are never rendered whole:
+# they get a preview-resolution render only, and extraction renders them band by band.
+class PageRenderCache:
+    def __init__(self, pdf_path, poppler_path, dpi=RENDER_DPI, preview_dpi=PREVIEW_DPI,
+                 mem_limit=MEM_LIMIT_BYTES, disk_limit=DISK_LIMIT_BYTES, renderer=None):
+        self.pdf_path = pdf_path
+        self.poppler_path = poppler_path
+        # Backend name (None = PDFCONV_RENDERER / auto) or an already-open renderer
+        self.renderer = renderer if hasattr(renderer, "render") else open_renderer(pdf_path, poppler_path, renderer)
+        self.dpi = dpi
+        self.preview_dpi = preview_dpi
+        self.mem_limit = mem_limit
+        self.disk_limit = disk_limit
+
+        self.cache_dir = tempfile.mkdtemp(prefix="pdfconv_pages_")
+        self._mem = OrderedDict()    # page -> PIL image
+        self._spilling = {}          # page -> PIL image, evicted and being written to disk
+        self._disk = OrderedDict()   # page -> (path, size)
+        self._mem_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.RLock()
+        self.renders = 0             # pages rendered (for diagnostics)
+        self._large = {}             # page -> True/False: banded (over budget) or not
+        self._previews = OrderedDict()  # banded page -> preview-resolution render (last few)
+
+    # --- RENDERING ---
+    def page_count(self):
+        return self.renderer.page_count()
+
+    def is_large(self, page_num):
+        # True if the page is over budget at self.dpi and the renderer can draw it in bands
+        if page_num not in self._large:
+            size_fn = getattr(self.renderer, "page_size", None)
+            large = False
+            if size_fn and hasattr(self.renderer, "render_band"):
+                try: large = over_budget(size_fn(page_num, self.dpi))
+                except Exception: pass
+            self._large[page_num] = large
+        return self._large[page_num]
+
+    def render_range(self, first, last):
+        # One renderer call per run of normal pages; returns {page: high-res image}
+        # (the preview-resolution render for banded pages)
+        out = {}
+        run = []
+        for page_num in list(range(first, last + 1)) + [None]:
+            if page_num is not None and not self.is_large(page_num):
+                run.append(page_num)
+                continue
+            if run:
+                with span("rasterize", first=run[0], last=run[-1], dpi=self.dpi, backend=self.renderer.name):
+                    imgs = self.renderer.render(run[0], run[-1], self.dpi)
+                for p, img in zip(run, imgs):
+                    self.put(p, img)
+                    out[p] = img
+                self.renders += len(imgs)
+                run = []
+            if page_num is not None:
+                with span("rasterize", first=page_num, last=page_num, dpi=self.preview_dpi, backend=self.renderer.name):
+                    out[page_num] = self._previews[page_num] = self.renderer.render(page_num, page_num, self.preview_dpi)[0]
+                while len(self._previews) > PREVIEW_KEEP: self._previews.popitem(last=False)
+        return out
+
+    def get(self, page_num):
+        # Full raster of a page; None for banded pages (see is_large)
+        if self.is_large(page_num): return None
+        with self._lock:
+            img = self._mem.get(page_num)
+            if img is not None:
+                self._mem.move_to_end(page_num)
+                return img
+            img = self._spilling.get(page_num)
+            if img is not None: return img
+            entry = self._disk.get(page_num)
+        if entry is not None:
+            try:
+                with Image.open(entry[0]) as f:
+                    img = f.copy()
+                with self._lock:
+                    self._disk.move_to_end(page_num)
+                self._remember(page_num, img)
+                return img
+            except OSError:
+                self._forget_disk(page_num)
+        # Evicted (or never rendered): fall back to a single-page render
+        return self.render_range(page_num, page_num).get(page_num)
+
+    def disk_path(self, page_num):
+        # Path of the on-disk raster, re-rendering/re-spilling the page if it was evicted.
+        # Touching the entry keeps pages that are about to be handed to workers out of eviction.
+        if self.is_large(page_num): return None
+        with self._lock:
+            entry = self._disk.get(page_num)
+            if entry is not None:
+                self._disk.move_to_end(page_num)
+                return entry[0]
+            img = self._mem.get(page_num)
+            if img is None: img = self._spilling.get(page_num)
+        if img is None:
+            self.render_range(page_num, page_num)
+            with self._lock: img = self._mem.get(page_num)
+        return self._spill(page_num, img) if img is not None else None
+
+    def prefetch(self, page_nums, chunk_pages=4):
+        # Renders pages that are in neither tier, batching consecutive pages into one renderer call
+        with self._lock:
+            missing = sorted(p for p in set(page_nums) if p not in self._mem and p not in self._disk
+                             and p not in self._spilling and p not in self._previews)
+        run = []
+        for p in missing + [None]:
+            if run and (p is None or p != run[-1] + 1 or len(run) >= chunk_pages):
+                self.render_range(run[0], run[-1])
+                run = []
+            if p is not None: run.append(p)
+
+    def preview(self, page_num, img=None):
+        if self.is_large(page_num):
+            img = self._previews.get(page_num)
+            return img if img is not None else self.render_range(page_num, page_num)[page_num]
+        img = img if img is not None else self.get(page_num)
+        if img is None: return None
+        return self.downscale(img)
+
+    def low_preview(self, page_num):
+        # Preview-resolution picture (fingerprints, see dedup.py) without a 300 DPI render:
+        # downscaled from the raster if it is in memory, otherwise rendered at preview_dpi
+        with self._lock:
+            img = self._previews.get(page_num)
+            if img is not None: return img
+            img = self._mem.get(page_num)
+            if img is None: img = self._spilling.get(page_num)
+        if img is not None: return self.downscale(img)
+        with span("rasterize", first=page_num, last=page_num, dpi=self.preview_dpi, backend=self.renderer.name):
+            return self.renderer.render(page_num, page_num, self.preview_dpi)[0]
+
+    def downscale(self, img):
+        with span("downscale"):
+            return img.resize(self.preview_size(img.size), Image.LANCZOS, reducing_gap=3.0)
+
+    def preview_size(self, size):
+        # Preview dimensions for a raster of `size` at self.dpi
+        scale = self.preview_dpi / self.dpi
+        return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+    def vector_info(self, page_num):
+        # Drawing operations for the vector split detector; None if the backend can't read them
+        fn = getattr(self.renderer, "page_vector", None)
+        if fn is None: return None
+        try: return fn(page_num, self.dpi)
+        except Exception: return None
+
+    # --- STORAGE ---
+    def put(self, page_num, img):
+        self._remember(page_num, img)
+
+    def _spill(self, page_num, img):
+        # Writes the raster to the disk tier (once) and returns its path
+        with self._lock:
+            entry = self._disk.get(page_num)
+        if entry is not None: return entry[0]
+        path = os.path.join(self.cache_dir, f"p{page_num}.png")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with span("spill", page=page_num):
+            img.save(tmp, "PNG", compress_level=DISK_PNG_LEVEL)
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            old = self._disk.pop(page_num, None)
+            if old: self._disk_bytes -= old[1]
+            self._disk[page_num] = (path, size)
+            self._disk_bytes += size
+            self._evict_disk()
+        return path
+
+    def _remember(self, page_num, img):
+        evicted = []
+        with self._lock:
+            old = self._mem.pop(page_num, None)
+            if old is not None: self._mem_bytes -= _image_bytes(old)
+            self._mem[page_num] = img
+            self._mem_bytes += _image_bytes(img)
+            while self._mem_bytes > self.mem_limit and len(self._mem) > 1:
+                dropped_num, dropped = self._mem.popitem(last=False)
+                self._mem_bytes -= _image_bytes(dropped)
+                if dropped_num not in self._disk:
+                    self._spilling[dropped_num] = dropped
+                    evicted.append((dropped_num, dropped))
+        # Over budget: evicted pages go to disk (outside the lock, still readable meanwhile)
+        for dropped_num, dropped in evicted:
+            try: self._spill(dropped_num, dropped)
+            finally:
+                with self._lock: self._spilling.pop(dropped_num, None)
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_limit and len(self._disk) > 1:
+            page_num = next(iter(self._disk))
+            self._forget_disk(page_num)
+
+    def _forget_disk(self, page_num):
+        with self._lock:
+            entry = self._disk.pop(page_num, None)
+            if not entry: return
+            self._disk_bytes -= entry[1]
+        try: os.remove(entry[0])
+        except OSError: pass
+
+    def close(self):
+        with self._lock:
+            self._mem.clear()
+            self._spilling.clear()
+            self._disk.clear()
+            self._previews.clear()
+            self._mem_bytes = self._disk_bytes = 0
+        self.renderer.close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
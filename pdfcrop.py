@@ -0,0 +1,77 @@
+import os
+import time
+
+from instrument import span
+
+# --- DEPENDENCY CHECK: PYMUPDF ---
+try:
+    import pymupdf
+    PYMUPDF_AVAIL = True
+except ImportError:
+    PYMUPDF_AVAIL = False
+
+# --- RASTER-FREE EXTRACTION (output format "PDF") ---
+# Each selected part becomes a PDF page: a copy of its source page whose media box is cut
+# down to the part's region. Text, vector art and barcodes stay exactly as the carrier wrote
+# them; nothing is rendered or re-encoded. Part boxes come from the gallery / auto-split in
+# preview pixels (item['orig_w'] wide, rotation applied) and are scaled to points here.
+
+def part_rect(page, box, orig_w):
+    # Preview box -> region in the coordinates of page.cropbox (unrotated, y down from the
+    # media box top, x as in the PDF)
+    s = page.rect.width / orig_w
+    r = pymupdf.Rect(box[0] * s, box[1] * s, box[2] * s, box[3] * s) & page.rect
+    u = r * page.derotation_matrix
+    cb = page.cropbox
+    return pymupdf.Rect(u.x0 + cb.x0, u.y0 + cb.y0, u.x1 + cb.x0, u.y1 + cb.y0)
+
+def add_part(out, src, page_num, rect):
+    # Copies the page (resources are shared between copies of one source) and shrinks it
+    out.insert_pdf(src, from_page=page_num - 1, to_page=page_num - 1)
+    page = out[-1]
+    top = page.mediabox.y1
+    page.set_mediabox(pymupdf.Rect(rect.x0, top - rect.y1, rect.x1, top - rect.y0))
+    return page
+
+def _save(doc, path):
+    t0 = time.perf_counter()
+    with span("write", format="PDF"):
+        doc.save(path, garbage=3, deflate=True)
+    return path, os.path.getsize(path), time.perf_counter() - t0, "PDF"
+
+# Writes every part into <base_name>.pdf (combine; <base_name>_parts.pdf if that is the source
+# itself, as with the default "{dir}/{stem}" output) or <base_name>_p<n>[_<sub>].pdf, in the
+# order of `items`. progress(done, total, page_num) per source page; an exception raised
+# from it stops the extraction before anything is saved. Returns encoders-style rows
+# (path, bytes, seconds, "PDF").
+def extract_pdf_regions(pdf_path, items, out_dir, base_name, combine=True, progress=None):
+    if not PYMUPDF_AVAIL: raise RuntimeError("PDF output needs PyMuPDF (pip install pymupdf)")
+    from extract import group_by_page
+    pages_map = group_by_page(items)
+    src = pymupdf.open(pdf_path)
+    out = pymupdf.open() if combine else None
+    rows = []
+    try:
+        for done, (p_num, p_items) in enumerate(pages_map.items(), 1):
+            page = src[p_num - 1]
+            for item in p_items:
+                with span("crop", page=p_num, engine="pdf"):
+                    rect = part_rect(page, item['box'], item['orig_w'])
+                    if combine:
+                        add_part(out, src, p_num, rect)
+                        continue
+                    single = pymupdf.open()
+                    add_part(single, src, p_num, rect)
+                suffix = f"_p{p_num}"
+                if len(p_items) > 1: suffix += f"_{item['sub_idx']}"
+                try: rows.append(_save(single, os.path.join(out_dir, f"{base_name}{suffix}.pdf")))
+                finally: single.close()
+            if progress: progress(done, len(pages_map), p_num)
+        if combine and out.page_count:
+            path = os.path.join(out_dir, f"{base_name}.pdf")
+            if os.path.exists(path) and os.path.samefile(path, pdf_path): path = os.path.join(out_dir, f"{base_name}_parts.pdf")
+            rows.append(_save(out, path))
+    finally:
+        if out is not None: out.close()
+        src.close()
+    return rows
@@ -0,0 +1,142 @@
+import os
+import threading
+
+from PIL import Image
+
+# --- DEPENDENCY CHECK: PYMUPDF ---
+try:
+    import pymupdf
+    PYMUPDF_AVAIL = True
+except ImportError:
+    PYMUPDF_AVAIL = False
+
+# Set PDFCONV_RENDERER=poppler|pymupdf to force a backend. "auto" renders in-process
+# with PyMuPDF when it is installed and falls back to poppler's pdftoppm otherwise.
+RENDERER = os.environ.get("PDFCONV_RENDERER", "auto").lower()
+
+# --- PDF RENDERER INTERFACE ---
+# Every backend is opened once per document and provides:
+#   page_count()             -> number of pages
+#   render(first, last, dpi) -> [PIL RGB image per page], 1-based inclusive range
+#   close()
+# and optionally page_vector(page_num, dpi) -> drawing operations for the vector split detector,
+# page_size(page_num, dpi) and render_band(page_num, dpi, top, bottom) -> rows top..bottom of
+# the page as render() would draw them (memory-bounded strip extraction, see strips.py).
+# `name` is part of the split-cache key, since backends anti-alias slightly differently.
+
+# --- POPPLER BACKEND (pdftoppm subprocess per call) ---
+class PopplerRenderer:
+    name = "poppler"
+
+    def __init__(self, pdf_path, poppler_path=None):
+        self.pdf_path = pdf_path
+        self.poppler_path = poppler_path or None
+        self._pages = None
+
+    def page_count(self):
+        if self._pages is None:
+            from pdf2image import pdfinfo_from_path
+            self._pages = int(pdfinfo_from_path(self.pdf_path, poppler_path=self.poppler_path).get("Pages", 0))
+        return self._pages
+
+    def render(self, first, last, dpi):
+        from pdf2image import convert_from_path
+        return convert_from_path(self.pdf_path, dpi=dpi, poppler_path=self.poppler_path,
+                                 first_page=first, last_page=last)
+
+    def close(self):
+        pass
+
+# --- PYMUPDF BACKEND (in-process, document opened once) ---
+# Pixmaps are copied straight into PIL images: no subprocess and no temp files.
+# MuPDF documents are not thread-safe, so renders are serialized per document.
+class PyMuPDFRenderer:
+    name = "pymupdf"
+
+    def __init__(self, pdf_path, poppler_path=None):
+        self.pdf_path = pdf_path
+        self.doc = pymupdf.open(pdf_path)
+        self._lock = threading.Lock()
+        self._band_list = (None, None)   # (page_num, display list) of the page being banded
+
+    def page_count(self):
+        return self.doc.page_count
+
+    def render(self, first, last, dpi):
+        out = []
+        with self._lock:
+            for page_num in range(first, last + 1):
+                pix = self.doc[page_num - 1].get_pixmap(dpi=dpi, alpha=False, colorspace=pymupdf.csRGB)
+                out.append(Image.frombytes("RGB", (pix.width, pix.height), pix.samples))
+                del pix
+        return out
+
+    def page_size(self, page_num, dpi):
+        with self._lock:
+            irect = (self.doc[page_num - 1].rect * pymupdf.Matrix(dpi / 72.0, dpi / 72.0)).irect
+            return irect.width, irect.height
+
+    def render_band(self, page_num, dpi, top, bottom):
+        # The page's display list is built once and replayed per band, clipped to its rows
+        s = dpi / 72.0
+        with self._lock:
+            page = self.doc[page_num - 1]
+            if self._band_list[0] != page_num: self._band_list = (page_num, page.get_displaylist())
+            r = page.rect
+            pix = self._band_list[1].get_pixmap(matrix=pymupdf.Matrix(s, s), alpha=False, colorspace=pymupdf.csRGB,
+                                                clip=pymupdf.Rect(r.x0, r.y0 + top / s, r.x1, r.y0 + bottom / s))
+            img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            y0 = pix.irect[1]
+            del pix
+        # Rounding of the clip can add a row at either edge
+        if y0 != top or img.height != bottom - top: img = img.crop((0, top - y0, img.width, bottom - y0))
+        return img
+
+    def page_vector(self, page_num, dpi):
+        # Drawing operations of the page, oriented as rendered (rotation applied, crop box origin):
+        #   size   - pixel size render(dpi) would produce, without rendering
+        #   page   - (width, height) in points
+        #   shapes - [(x0, y0, x1, y1, gray 0-255)] bounding boxes of filled/stroked paths
+        #   images - [(x0, y0, x1, y1)] placed raster images
+        with self._lock:
+            page = self.doc[page_num - 1]
+            m = page.rotation_matrix
+            irect = (page.rect * pymupdf.Matrix(dpi / 72.0, dpi / 72.0)).irect
+            shapes = []
+            for d in page.get_drawings():
+                color = d.get("fill") if "f" in d["type"] else None
+                if color is None: color = d.get("color")
+                if color is None: continue
+                r = d["rect"] * m
+                if "s" in d["type"]:
+                    # Stroke width extends the path's box (a horizontal line has zero height)
+                    half = (d.get("width") or 1.0) / 2.0
+                    r = pymupdf.Rect(r.x0, r.y0 - half, r.x1, r.y1 + half)
+                shapes.append((r.x0, r.y0, r.x1, r.y1, _gray(color)))
+            images = [tuple(pymupdf.Rect(i["bbox"]) * m) for i in page.get_image_info()]
+            return {"size": (irect.width, irect.height), "page": (page.rect.width, page.rect.height),
+                    "shapes": shapes, "images": images}
+
+    def close(self):
+        with self._lock:
+            self._band_list = (None, None)
+            if not self.doc.is_closed: self.doc.close()
+
+def _gray(color):
+    # Device gray / RGB / CMYK (0-1 floats) -> 0-255 luminance
+    if len(color) == 1: return color[0] * 255
+    if len(color) == 3: return (0.299 * color[0] + 0.587 * color[1] + 0.114 * color[2]) * 255
+    c, m, y, k = color
+    return (1 - k) * (1 - min(1.0, 0.299 * c + 0.587 * m + 0.114 * y)) * 255
+
+BACKENDS = {"poppler": PopplerRenderer, "pymupdf": PyMuPDFRenderer}
+
+def backend_name(backend=None):
+    name = (backend or RENDERER).lower()
+    if name == "auto": return "pymupdf" if PYMUPDF_AVAIL else "poppler"
+    if name not in BACKENDS: raise ValueError(f"Unknown PDF renderer: {name}")
+    if name == "pymupdf" and not PYMUPDF_AVAIL: raise ImportError("PyMuPDF is not installed (pip install pymupdf)")
+    return name
+
+def open_renderer(pdf_path, poppler_path=None, backend=None):
+    return BACKENDS[backend_name(backend)](pdf_path, poppler_path)
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+
+# --- LOCATION / LIMITS ---
+# PDFCONV_CACHE_DIR overrides the location; PDFCONV_SPLIT_CACHE=0 disables the cache.
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+HASH_CHUNK = 1024 * 1024
+META_NAME = "meta.json"
+
+def default_cache_root():
+    env = os.environ.get("PDFCONV_CACHE_DIR")
+    if env: return os.path.join(env, "split_cache")
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "PDF_and_Image_Converter", "split_cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pdfconv", "split_cache")
+
+def cache_enabled():
+    return os.environ.get("PDFCONV_SPLIT_CACHE", "1") not in ("0", "false", "no")
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+# --- SPLIT RESULT CACHE ---
+# One directory per (PDF content hash, preview DPI, render DPI, renderer, detector signature):
+#   <root>/<key>/meta.json        {"pages": N, "items": [...]} - written last, marks the entry complete
+#   <root>/<key>/p<n>_<idx>.jpg   preview segment thumbnails used by the gallery
+# Reopening the same document (even renamed/moved) finds the entry by content.
+# Changing detector thresholds changes the signature, so old entries are never read
+# again; prune_stale() deletes them and size-bounded LRU eviction keeps the total in check.
+class SplitCache:
+    def __init__(self, root=None, max_bytes=CACHE_MAX_BYTES):
+        self.root = root or default_cache_root()
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def key(self, pdf_path, preview_dpi, render_dpi, signature, renderer="poppler"):
+        # The signature stays last: prune_stale() matches on it
+        return f"{file_digest(pdf_path)}_{preview_dpi}_{render_dpi}_{renderer}_{signature}"
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def load(self, key):
+        meta_path = os.path.join(self.entry_dir(key), META_NAME)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        entry = self.entry_dir(key)
+        for item in meta["items"]:
+            item["box"] = tuple(item["box"])
+            item["path"] = os.path.join(entry, item["file"])
+            if not os.path.exists(item["path"]):
+                return None
+        try: os.utime(meta_path)  # LRU touch
+        except OSError: pass
+        return meta
+
+    def begin(self, key):
+        # Segment files are written straight into the entry; it only counts once meta.json exists
+        entry = self.entry_dir(key)
+        os.makedirs(entry, exist_ok=True)
+        return entry
+
+    def commit(self, key, pages, items, **extra):
+        # extra: more meta.json fields (e.g. the dedup hash version of the items' "phash")
+        entry = self.entry_dir(key)
+        stored = [{k: v for k, v in item.items() if k != "path"} | {"file": os.path.basename(item["path"])}
+                  for item in items]
+        tmp = os.path.join(entry, META_NAME + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"pages": pages, "items": stored, "created": time.time(), **extra}, f)
+        os.replace(tmp, os.path.join(entry, META_NAME))
+        self.evict(keep=key)
+
+    def discard(self, key):
+        shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+
+    # --- MAINTENANCE ---
+    def _entries(self):
+        out = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path): continue
+            size = 0
+            for f in os.listdir(path):
+                try: size += os.path.getsize(os.path.join(path, f))
+                except OSError: pass
+            meta = os.path.join(path, META_NAME)
+            mtime = os.path.getmtime(meta) if os.path.exists(meta) else 0  # incomplete entries go first
+            out.append((mtime, size, name))
+        return out
+
+    def size(self):
+        return sum(e[1] for e in self._entries())
+
+    def evict(self, keep=None):
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        for mtime, size, name in entries:
+            if total <= self.max_bytes: break
+            if name == keep: continue
+            # Skip entries still being written by an open gallery (no meta yet, but fresh)
+            if mtime == 0 and time.time() - os.path.getmtime(self.entry_dir(name)) < 3600: continue
+            self.discard(name)
+            total -= size
+
+    def prune_stale(self, signature):
+        removed = 0
+        for _, _, name in self._entries():
+            if not name.endswith("_" + signature):
+                self.discard(name)
+                removed += 1
+        return removed
+
+    def clear(self):
+        for _, _, name in self._entries():
+            self.discard(name)
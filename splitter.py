@@ -0,0 +1,283 @@
+import os
+import json
+import hashlib
+
+# --- DEPENDENCY CHECK: NUMPY ---
+try:
+    import numpy as np
+    NUMPY_AVAIL = True
+except ImportError:
+    NUMPY_AVAIL = False
+
+# Set PDFCONV_SPLIT_ENGINE=py to force the reference engine (debugging / comparisons)
+SPLIT_ENGINE = os.environ.get("PDFCONV_SPLIT_ENGINE", "auto").lower()
+# Set PDFCONV_SPLIT_VECTOR=0 to ignore PDF drawing operations and always scan pixels
+VECTOR_SPLIT = os.environ.get("PDFCONV_SPLIT_VECTOR", "1") not in ("0", "false", "no")
+# PDFCONV_SPLIT_MODE: single = one rule near the centre (2 parts at most), rows = every
+# isolated horizontal rule, grid = rows plus vertical rules inside each row (2-up/4-up sheets)
+SPLIT_MODE = os.environ.get("PDFCONV_SPLIT_MODE", "single").lower()
+SPLIT_MODES = ("single", "rows", "grid")
+
+# --- DETECTOR PARAMETERS ---
+# Anything that changes which boxes come out must be listed here (or bump DETECTOR_VERSION):
+# cached split results are keyed on detector_signature().
+DETECTOR_VERSION = 1
+SPLIT_THRESHOLD = 100          # Gray level below which a pixel counts as dark
+BAND_START, BAND_END = 0.25, 0.75
+LINE_STEP, LINE_FRAC = 5, 0.45 # Sample every 5th px; >45% dark = candidate line
+ADJ_STEP, ADJ_FRAC = 10, 0.15  # Neighbour rows: every 10th px; >15% dark = busy (photo)
+ADJ_OFFSET = 10                # Neighbour rows checked at +/-10 px
+VECTOR_MAX_THICK = 6.0         # pt; drawn shapes taller than this are boxes/shading, not rules
+MIN_REGION_FRAC = 0.08         # rows/grid: rules leaving a thinner region (frames, edge underlines) are ignored
+
+def detector_signature(threshold=SPLIT_THRESHOLD):
+    params = [DETECTOR_VERSION, threshold, BAND_START, BAND_END, LINE_STEP, LINE_FRAC, ADJ_STEP, ADJ_FRAC, ADJ_OFFSET,
+              VECTOR_SPLIT, VECTOR_MAX_THICK]
+    # Appended only outside single mode so existing split-cache entries stay valid
+    if SPLIT_MODE != "single": params += [SPLIT_MODE, MIN_REGION_FRAC]
+    return hashlib.sha1(json.dumps(params).encode()).hexdigest()[:12]
+
+# --- REFINED SPLITTER ENGINE (Isolation Check) ---
+# Reference implementation. Walks the middle half of the page pixel by pixel.
+# The NumPy engine below must return exactly the same boxes as this one.
+def detect_split_structure_py(img, threshold=SPLIT_THRESHOLD):
+    w, h = img.size
+    gray = img.convert("L")
+    pixels = gray.load()
+
+    start_y = int(h * BAND_START)
+    end_y = int(h * BAND_END)
+
+    candidate_y = -1
+    best_score = 0
+
+    for y in range(start_y, end_y):
+        dark_pixel_count = 0
+        for x in range(0, w, LINE_STEP):
+            if pixels[x, y] < threshold:
+                dark_pixel_count += 1
+
+        dark_percent = dark_pixel_count / (w / LINE_STEP)
+
+        if dark_percent > LINE_FRAC:
+            is_isolated = True
+            for offset in [-ADJ_OFFSET, ADJ_OFFSET]:
+                check_y = y + offset
+                if 0 <= check_y < h:
+                    adj_dark_count = 0
+                    for ax in range(0, w, ADJ_STEP):
+                         if pixels[ax, check_y] < threshold:
+                             adj_dark_count += 1
+
+                    adj_percent = adj_dark_count / (w / ADJ_STEP)
+                    if adj_percent > ADJ_FRAC:
+                        is_isolated = False
+                        break
+
+            if is_isolated:
+                dist_from_center = abs(y - (h // 2))
+                score = 10000 - dist_from_center
+                if score > best_score:
+                    best_score = score
+                    candidate_y = y
+
+    if candidate_y != -1:
+        return [(0, 0, w, candidate_y - 2), (0, candidate_y + 2, w, h)]
+    else:
+        return [(0, 0, w, h)]
+
+# --- VECTORIZED SPLITTER ENGINE ---
+# Same sampling grid (every 5th column for the line, every 10th for the
+# neighbours) and the same float comparisons, evaluated for all rows at once.
+def detect_split_structure_np(img, threshold=SPLIT_THRESHOLD):
+    w, h = img.size
+    arr = np.asarray(img.convert("L"))
+
+    start_y = int(h * BAND_START)
+    end_y = int(h * BAND_END)
+    if end_y <= start_y:
+        return [(0, 0, w, h)]
+
+    # Row dark-fraction for the candidate band
+    dark_counts = (arr[start_y:end_y, ::LINE_STEP] < threshold).sum(axis=1)
+    is_line = (dark_counts / (w / LINE_STEP)) > LINE_FRAC
+    if not is_line.any():
+        return [(0, 0, w, h)]
+
+    # Isolation: a neighbour row 10px above/below that is itself "busy" disqualifies the line
+    lo = max(0, start_y - ADJ_OFFSET)
+    hi = min(h, end_y + ADJ_OFFSET)
+    adj_counts = (arr[lo:hi, ::ADJ_STEP] < threshold).sum(axis=1)
+    busy = (adj_counts / (w / ADJ_STEP)) > ADJ_FRAC
+
+    ys = np.arange(start_y, end_y)
+    isolated = np.ones(len(ys), dtype=bool)
+    for offset in (-ADJ_OFFSET, ADJ_OFFSET):
+        check = ys + offset
+        valid = (check >= 0) & (check < h)
+        idx = np.clip(check - lo, 0, len(busy) - 1)
+        isolated &= ~(valid & busy[idx])
+
+    hits = is_line & isolated
+    scores = 10000 - np.abs(ys - (h // 2))
+    hits &= scores > 0
+    if not hits.any():
+        return [(0, 0, w, h)]
+
+    # argmax keeps the first (topmost) of equally-scored rows, same as the strict '>' above
+    candidate_y = int(ys[np.argmax(np.where(hits, scores, -1))])
+    return [(0, 0, w, candidate_y - 2), (0, candidate_y + 2, w, h)]
+
+# --- MULTI-REGION SPLITTER ---
+# Every isolated rule on the whole page instead of the one nearest the centre. The page is
+# thresholded once; row profiles (and, in grid mode, column profiles of each row band) are
+# sums over that mask, so the cost follows the pixel count, not the number of rules. Rules
+# use the single engine's sampling; adjacent line rows form one rule.
+# Regions come back in reading order: top to bottom, left to right within a band.
+def _dark_counts(img, threshold):
+    # counts(axis, lo, hi, step): dark samples per row (axis 0, every step-th column) or per
+    # column (axis 1, every step-th row), for rows lo..hi
+    w, h = img.size
+    if NUMPY_AVAIL and SPLIT_ENGINE != "py":
+        mask = np.asarray(img.convert("L")) < threshold
+        def counts(axis, lo, hi, step):
+            if axis == 0: return mask[lo:hi, ::step].sum(axis=1).tolist()
+            return mask[lo:hi:step].sum(axis=0).tolist()
+        return counts
+
+    data = img.convert("L").point(lambda v: 1 if v < threshold else 0).tobytes()
+    def counts(axis, lo, hi, step):
+        if axis == 0: return [sum(data[y * w:(y + 1) * w:step]) for y in range(lo, hi)]
+        out = [0] * w
+        for y in range(lo, hi, step):
+            out = [a + b for a, b in zip(out, data[y * w:(y + 1) * w])]
+        return out
+    return counts
+
+def _rule_runs(line, adj, line_div, adj_div):
+    # Runs of line rows with nothing dark (no busy or line row) 3..ADJ_OFFSET px either side.
+    # Stricter than the single engine's +/-ADJ_OFFSET probe: dense stripes (tire treads)
+    # would otherwise yield a "rule" wherever two stripes happen to sit 11+ px apart.
+    n = len(line)
+    runs, busy = [], [0]
+    for i in range(n):
+        is_line = line[i] / line_div > LINE_FRAC
+        busy.append(busy[-1] + (is_line or adj[i] / adj_div > ADJ_FRAC))
+        if not is_line: continue
+        if runs and runs[-1][1] == i - 1: runs[-1][1] = i
+        else: runs.append([i, i])
+
+    def quiet(lo, hi):
+        lo, hi = max(0, lo), min(n, hi)
+        return lo >= hi or busy[hi] == busy[lo]
+    return [(a, b) for a, b in runs if quiet(a - ADJ_OFFSET, a - 2) and quiet(b + 3, b + ADJ_OFFSET + 1)]
+
+def _spans(rules, length, min_len):
+    # Rules (top, bottom) -> [(start, end)] covering 0..length, cut 2 px clear of each rule
+    spans, start = [], 0
+    for top, bottom in rules:
+        if top - 2 - start < min_len or length - (bottom + 2) < min_len: continue
+        spans.append((start, top - 2))
+        start = bottom + 2
+    spans.append((start, length))
+    return spans
+
+def detect_split_regions(img, threshold=SPLIT_THRESHOLD, vertical=False):
+    w, h = img.size
+    counts = _dark_counts(img, threshold)
+    rows = _rule_runs(counts(0, 0, h, LINE_STEP), counts(0, 0, h, ADJ_STEP), w / LINE_STEP, w / ADJ_STEP)
+    boxes = []
+    for y0, y1 in _spans(rows, h, h * MIN_REGION_FRAC):
+        if not vertical or y1 - y0 < ADJ_STEP:
+            boxes.append((0, y0, w, y1))
+            continue
+        band = y1 - y0
+        cols = _rule_runs(counts(1, y0, y1, LINE_STEP), counts(1, y0, y1, ADJ_STEP), band / LINE_STEP, band / ADJ_STEP)
+        boxes.extend((x0, y0, x1, y1) for x0, x1 in _spans(cols, w, w * MIN_REGION_FRAC))
+    return boxes
+
+def detect_split_structure(img, threshold=SPLIT_THRESHOLD, mode=None):
+    mode = mode or SPLIT_MODE
+    if mode != "single":
+        return detect_split_regions(img, threshold, vertical=mode == "grid")
+    if NUMPY_AVAIL and SPLIT_ENGINE != "py":
+        return detect_split_structure_np(img, threshold)
+    return detect_split_structure_py(img, threshold)
+
+# --- VECTOR SPLITTER (PDF drawing operations) ---
+# Carrier labels draw the separator as a filled rectangle or stroked line, so it can be
+# read from the page instead of the pixels: a dark shape at most VECTOR_MAX_THICK tall,
+# wider than LINE_FRAC of the page, centred in the same 25-75% band. Rules with another
+# rule within ADJ_OFFSET preview px (table grids, stripes) or on top of a placed image
+# are ignored, like the raster isolation check. Returns None when no rule qualifies so
+# the caller can fall back to the pixel engines (scanned pages have no drawings).
+# `vec` is a renderer's page_vector(); boxes are in the pixels of an image of `size`.
+def detect_split_vector(vec, size, threshold=SPLIT_THRESHOLD, mode=None):
+    mode = mode or SPLIT_MODE
+    if mode != "single": return _vector_regions(vec, size, threshold, vertical=mode == "grid")
+    w, h = size
+    page_w, page_h = vec["page"]
+    sy = h / page_h
+    rules = []
+    for x0, y0, x1, y1, gray in vec["shapes"]:
+        if gray >= threshold or y1 - y0 > VECTOR_MAX_THICK or (x1 - x0) <= page_w * LINE_FRAC: continue
+        if any(ix0 < x1 and x0 < ix1 and iy0 < y1 and y0 < iy1 for ix0, iy0, ix1, iy1 in vec["images"]): continue
+        rules.append((y0 * sy, y1 * sy))
+
+    start_y, end_y = int(h * BAND_START), int(h * BAND_END)
+    best = None
+    for top, bottom in rules:
+        mid = (top + bottom) / 2
+        if not start_y <= mid < end_y: continue
+        # Overlapping shapes (fill + outline of the same rule) are one rule, not neighbours
+        if any(t > bottom + 1 and t - bottom <= ADJ_OFFSET or b < top - 1 and top - b <= ADJ_OFFSET for t, b in rules):
+            continue
+        dist = abs(mid - h // 2)
+        if best is None or dist < best[0] or (dist == best[0] and top < best[1]):
+            best = (dist, top, bottom)
+    if best is None:
+        return None
+
+    _, top, bottom = best
+    cut = int(round((top + bottom) / 2))
+    return [(0, 0, w, min(cut - 2, int(top))), (0, max(cut + 2, -int(-bottom)), w, h)]
+
+# rows/grid from drawing operations: every isolated rule, same region rules as the pixel engine.
+# Overlapping shapes merge into one rule. None when the page has no qualifying rule.
+def _isolated(rules):
+    merged = []
+    for lo, hi in sorted(rules):
+        if merged and lo <= merged[-1][1] + 1: merged[-1][1] = max(merged[-1][1], hi)
+        else: merged.append([lo, hi])
+    return [(int(lo), -int(-hi)) for i, (lo, hi) in enumerate(merged)
+            if not (i > 0 and lo - merged[i - 1][1] <= ADJ_OFFSET)
+            and not (i + 1 < len(merged) and merged[i + 1][0] - hi <= ADJ_OFFSET)]
+
+def _vector_regions(vec, size, threshold, vertical):
+    w, h = size
+    page_w, page_h = vec["page"]
+    sx, sy = w / page_w, h / page_h
+    dark = []
+    for x0, y0, x1, y1, gray in vec["shapes"]:
+        if gray >= threshold: continue
+        if any(ix0 < x1 and x0 < ix1 and iy0 < y1 and y0 < iy1 for ix0, iy0, ix1, iy1 in vec["images"]): continue
+        dark.append((x0 * sx, y0 * sy, x1 * sx, y1 * sy, x1 - x0, y1 - y0))
+    rows = _isolated([(y0, y1) for x0, y0, x1, y1, pw, ph in dark if ph <= VECTOR_MAX_THICK and pw > page_w * LINE_FRAC])
+
+    boxes, found = [], bool(rows)
+    for b0, b1 in _spans(rows, h, h * MIN_REGION_FRAC):
+        cols = []
+        if vertical:
+            # A vertical rule must run along more than LINE_FRAC of its band
+            cols = _isolated([(x0, x1) for x0, y0, x1, y1, pw, ph in dark
+                              if pw <= VECTOR_MAX_THICK and min(y1, b1) - max(y0, b0) > (b1 - b0) * LINE_FRAC])
+        found = found or bool(cols)
+        boxes.extend((x0, b0, x1, b1) for x0, x1 in _spans(cols, w, w * MIN_REGION_FRAC))
+    return boxes if found else None
+
+# Vector rule when the page has one (and VECTOR_SPLIT is on), pixel scan otherwise.
+def detect_split_page(img, vec=None, threshold=SPLIT_THRESHOLD):
+    if vec is not None and VECTOR_SPLIT:
+        boxes = detect_split_vector(vec, img.size, threshold)
+        if boxes: return boxes
+    return detect_split_structure(img, threshold)
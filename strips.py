@@ -0,0 +1,201 @@
+import os
+import zlib
+import struct
+
+from PIL import Image
+
+# --- MEMORY BUDGET ---
+# PDFCONV_MEM_BUDGET_MB caps the pixel memory of one extraction / conversion (default 256 MB,
+# shared by its pool workers). A page or image whose raster does not fit is handled in
+# horizontal bands: rendered (PyMuPDF) band by band, cropped straight out of each band, and
+# written by the streaming encoders below, so peak memory follows the budget, not the page.
+MEM_BUDGET_BYTES = int(float(os.environ.get("PDFCONV_MEM_BUDGET_MB", "256") or 256) * 1024 * 1024)
+BAND_COPIES = 3          # band + cropped piece + converted/encoder copy
+MIN_BAND_ROWS = 16
+STREAM_FORMATS = ("PNG", "TIFF", "BMP")
+TIFF_STRIP_BYTES = 65536   # Pillow's strip size
+
+def budget(workers=1):
+    return max(1, MEM_BUDGET_BYTES // max(1, workers))
+
+def raster_bytes(size, bands=3):
+    return size[0] * size[1] * bands
+
+def over_budget(size, bands=3, workers=1):
+    return raster_bytes(size, bands) > budget(workers)
+
+def band_rows(width, bands=3, workers=1):
+    return max(MIN_BAND_ROWS, budget(workers) // (BAND_COPIES * max(1, width) * bands))
+
+def iter_bands(end, rows, start=0):
+    for top in range(start, end, rows):
+        yield top, min(top + rows, end)
+
+# --- BANDED SOURCES ---
+# read(top, bottom) -> rows top..bottom of an opened image. Uncompressed sources (raw TIFF
+# strips, BMP, PPM, TGA) are read straight from the file, band by band. Compressed ones
+# (PNG, JPEG, HEIC, LZW TIFF) can only be decoded whole by Pillow: they are decoded once
+# and cropped, which still keeps every converted/encoded copy band-sized.
+RAW_BAND_MODES = ("L", "RGB", "RGBA", "CMYK")
+
+def raw_band_reader(im, path):
+    if im.mode not in RAW_BAND_MODES or not im.tile: return None
+    w = im.width
+    tiles = []
+    for name, (x0, y0, x1, y1), offset, args in im.tile:
+        if name != "raw" or x0 != 0 or x1 != w: return None
+        rawmode, stride, ystep = (args, 0, 1) if isinstance(args, str) else (tuple(args) + (0, 1))[:3]
+        if not stride: stride = len(Image.new(im.mode, (w, 1)).tobytes("raw", rawmode))
+        tiles.append((y0, y1, offset, rawmode, stride, ystep))
+
+    def read(top, bottom):
+        out = None
+        with open(path, "rb") as f:
+            for y0, y1, offset, rawmode, stride, ystep in tiles:
+                a, b = max(top, y0), min(bottom, y1)
+                if a >= b: continue
+                # Bottom-up files (BMP, TGA) store the last row first
+                f.seek(offset + (a - y0 if ystep > 0 else y1 - b) * stride)
+                piece = Image.frombytes(im.mode, (w, b - a), f.read((b - a) * stride), "raw", rawmode, stride, ystep)
+                if a == top and b == bottom: return piece
+                if out is None: out = Image.new(im.mode, (w, bottom - top))
+                out.paste(piece, (0, a - top))
+        return out
+    return read
+
+def band_reader(im, path):
+    read = raw_band_reader(im, path)
+    if read: return read
+    im.load()
+    return lambda top, bottom: im.crop((0, top, im.width, bottom))
+
+# --- STREAMING ENCODERS ---
+# write(band) takes consecutive PIL bands of the final width, top to bottom; close() finishes
+# the file. Modes: L, RGB, RGBA (BMP: L, RGB). Anything else is converted per band by the caller.
+# params are the Pillow save() parameters of the encoder preset; only the PNG level applies.
+def stream_mode(mode, fmt):
+    # Mode a source band is converted to before writing; None = this format/mode is not streamed
+    if fmt not in STREAM_FORMATS: return None
+    if mode in ("1", "L"): return "L"
+    if mode in ("RGB", "P", "CMYK", "YCbCr"): return "RGB"
+    if mode in ("RGBA", "LA", "PA") and fmt != "BMP": return "RGBA"
+    return None
+
+class _PngStream:
+    # Filter type 0 per row, one zlib stream split over IDAT chunks as it is produced
+    def __init__(self, path, size, mode, params):
+        self.f = open(path, "wb")
+        self.w, self.h = size
+        self.bpp = {"L": 1, "RGB": 3, "RGBA": 4}[mode]
+        color = {"L": 0, "RGB": 2, "RGBA": 6}[mode]
+        self.z = zlib.compressobj(9 if params.get("optimize") else params.get("compress_level", 6))
+        self.f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", self.w, self.h, 8, color, 0, 0, 0))
+
+    def _chunk(self, tag, data):
+        self.f.write(struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+    def write(self, band):
+        raw = band.tobytes()
+        stride = self.w * self.bpp
+        rows = b"".join(b"\x00" + raw[i:i + stride] for i in range(0, len(raw), stride))
+        data = self.z.compress(rows)
+        if data: self._chunk(b"IDAT", data)
+
+    def close(self):
+        self._chunk(b"IDAT", self.z.flush())
+        self._chunk(b"IEND", b"")
+        self.f.close()
+
+class _TiffStream:
+    # Uncompressed strips of TIFF_STRIP_BYTES (like Pillow's default TIFF), IFD at the end.
+    # Bands come in any height (a part's first band is cut at its top), so rows are re-sliced
+    # into fixed-height strips: RowsPerStrip is one value, only the last strip may be short.
+    def __init__(self, path, size, mode, params):
+        self.f = open(path, "wb")
+        self.w, self.h = size
+        self.mode = mode
+        self.spp = {"L": 1, "RGB": 3, "RGBA": 4}[mode]
+        self.rows = max(1, TIFF_STRIP_BYTES // (self.w * self.spp))
+        self.pending = b""     # rows not making up a full strip yet
+        self.strips = []       # (offset, bytes)
+        self.f.write(b"II*\x00\x00\x00\x00\x00")   # IFD offset patched in close()
+
+    def _strip(self, data):
+        self.strips.append((self.f.tell(), len(data)))
+        self.f.write(data)
+
+    def write(self, band):
+        data = self.pending + band.tobytes()
+        size = self.rows * self.w * self.spp
+        full = len(data) - len(data) % size
+        for i in range(0, full, size): self._strip(data[i:i + size])
+        self.pending = data[full:]
+
+    def close(self):
+        if self.pending: self._strip(self.pending)
+        f = self.f
+        if f.tell() % 2: f.write(b"\x00")
+
+        def arr(values, fmt):
+            return b"".join(struct.pack("<" + fmt, v) for v in values)
+
+        tags = [(256, 4, 1, self.w), (257, 4, 1, self.h),
+                (258, 3, self.spp, arr([8] * self.spp, "H")), (259, 3, 1, 1),
+                (262, 3, 1, 1 if self.mode == "L" else 2),
+                (273, 4, len(self.strips), arr([s[0] for s in self.strips], "I")),
+                (277, 3, 1, self.spp), (278, 4, 1, self.rows),
+                (279, 4, len(self.strips), arr([s[1] for s in self.strips], "I"))]
+        if self.mode == "RGBA": tags.append((338, 3, 1, 2))   # unassociated alpha
+        # Values longer than 4 bytes go before the IFD
+        entries = []
+        for tag, typ, count, value in tags:
+            if isinstance(value, bytes) and len(value) > 4:
+                off = f.tell()
+                f.write(value)
+                if f.tell() % 2: f.write(b"\x00")
+                entries.append((tag, typ, count, struct.pack("<I", off)))
+            elif isinstance(value, bytes):
+                entries.append((tag, typ, count, value.ljust(4, b"\x00")))
+            else:
+                entries.append((tag, typ, count, struct.pack("<I" if typ == 4 else "<H", value).ljust(4, b"\x00")))
+        ifd = f.tell()
+        f.write(struct.pack("<H", len(entries)))
+        for tag, typ, count, value in entries:
+            f.write(struct.pack("<HHI", tag, typ, count) + value)
+        f.write(b"\x00\x00\x00\x00")
+        f.seek(4)
+        f.write(struct.pack("<I", ifd))
+        f.close()
+
+class _BmpStream:
+    # Bottom-up rows like Pillow's BMP writer: the file size is known up front, so each
+    # band is written at its final offset
+    def __init__(self, path, size, mode, params):
+        self.f = open(path, "wb")
+        self.w, self.h = size
+        self.mode = mode
+        bits = 8 if mode == "L" else 24
+        self.stride = (self.w * bits // 8 + 3) & ~3
+        palette = b"".join(bytes((i, i, i, 0)) for i in range(256)) if mode == "L" else b""
+        self.offset = 14 + 40 + len(palette)
+        self.f.write(b"BM" + struct.pack("<IHHI", self.offset + self.stride * self.h, 0, 0, self.offset))
+        self.f.write(struct.pack("<IiiHHIIiiII", 40, self.w, self.h, 1, bits, 0, self.stride * self.h,
+                                 2835, 2835, 256 if mode == "L" else 0, 0) + palette)
+        self.y = 0
+
+    def write(self, band):
+        raw = band.tobytes("raw", "BGR") if self.mode == "RGB" else band.tobytes()
+        row_bytes = len(raw) // band.height
+        pad = b"\x00" * (self.stride - row_bytes)
+        # Rows of this band end up in reverse order, directly above the previous band's
+        rows = [raw[i * row_bytes:(i + 1) * row_bytes] + pad for i in range(band.height - 1, -1, -1)]
+        self.f.seek(self.offset + (self.h - self.y - band.height) * self.stride)
+        self.f.write(b"".join(rows))
+        self.y += band.height
+
+    def close(self):
+        self.f.close()
+
+def open_stream(path, fmt, size, mode, params=None):
+    return {"PNG": _PngStream, "TIFF": _TiffStream, "BMP": _BmpStream}[fmt](path, size, mode, params or {})
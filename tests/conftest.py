@@ -0,0 +1,17 @@
+# Tests import the app modules and the synthetic corpora of benchmarks/ (same seeds, same inputs)
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+@pytest.fixture(scope="session")
+def label_pdf(tmp_path_factory):
+    # Vector label pages (text blocks + one separator rule) from bench_render
+    from bench_render import make_label_pdf
+    path = str(tmp_path_factory.mktemp("corpus") / "labels.pdf")
+    make_label_pdf(path, 6)
+    return path
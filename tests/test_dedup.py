@@ -0,0 +1,51 @@
+# The perceptual hash must tell different parts of the label corpus apart (skip mode would
+# drop real labels otherwise) and still match a part against copies of itself.
+import io
+import itertools
+
+import pytest
+from PIL import Image
+
+import dedup
+from extract import auto_split_items
+from page_cache import PageRenderCache
+
+@pytest.fixture(scope="module")
+def parts(label_pdf):
+    # (item, 72 DPI preview crop) per detected part
+    cache = PageRenderCache(label_pdf, None)
+    try:
+        items = auto_split_items(cache, cache.page_count())
+        previews = {p: cache.preview(p) for p in {it["page"] for it in items}}
+        return [(it, previews[it["page"]].crop(it["box"])) for it in items]
+    finally:
+        cache.close()
+
+def distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+def test_distinct_parts_are_not_flagged(label_pdf, parts):
+    items = [dict(it, phash=dedup.phash(img)) for it, img in parts]
+    assert len(items) > len({it["page"] for it in items})   # pages split into label + instructions
+    kept, dups = dedup.filter_parts(label_pdf, items, "skip")
+    assert dups == [] and len(kept) == len(items)
+    closest = min(distance(a["phash"], b["phash"]) for a, b in itertools.combinations(items, 2))
+    assert closest > 2 * dedup.DEDUP_DISTANCE
+
+def test_copies_of_a_part_match(parts):
+    for it, img in parts:
+        h = dedup.phash(img)
+        buf = io.BytesIO()
+        img.convert("RGB").save(buf, "JPEG", quality=60)
+        thumb = img.copy()
+        thumb.thumbnail((120, 160), reducing_gap=2.0)
+        shifted = img.crop((3, 3, img.width - 3, img.height - 3))
+        for copy in (Image.open(buf), thumb, shifted):
+            assert distance(h, dedup.phash(copy)) <= dedup.DEDUP_DISTANCE
+
+def test_numpy_and_plain_hash_agree(parts, monkeypatch):
+    if not dedup.NUMPY_AVAIL: pytest.skip("numpy not installed")
+    want = [dedup.phash(img) for _, img in parts]
+    monkeypatch.setattr(dedup, "NUMPY_AVAIL", False)
+    got = [dedup.phash(img) for _, img in parts]
+    assert max(distance(a, b) for a, b in zip(want, got)) <= 2
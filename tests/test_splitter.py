@@ -0,0 +1,36 @@
+# The NumPy engine must return exactly the reference engine's boxes, in every split mode, on
+# the seeded corpus of benchmarks/bench_split.py; grid mode must find the four labels of a 4-up sheet.
+import random
+
+import pytest
+
+import splitter
+from bench_split import build_corpus, make_four_up
+
+needs_numpy = pytest.mark.skipif(not splitter.NUMPY_AVAIL, reason="numpy not installed")
+
+@pytest.fixture(scope="module")
+def pages():
+    return build_corpus(30, seed=1234)
+
+@needs_numpy
+def test_single_mode_engines_agree(pages):
+    ref = [splitter.detect_split_structure_py(p) for p in pages]
+    assert [splitter.detect_split_structure_np(p) for p in pages] == ref
+    assert any(len(r) > 1 for r in ref)
+
+@needs_numpy
+@pytest.mark.parametrize("mode", ["rows", "grid"])
+def test_multi_region_engines_agree(pages, mode, monkeypatch):
+    monkeypatch.setattr(splitter, "SPLIT_ENGINE", "py")
+    ref = [splitter.detect_split_structure(p, mode=mode) for p in pages]
+    monkeypatch.setattr(splitter, "SPLIT_ENGINE", "auto")
+    assert [splitter.detect_split_structure(p, mode=mode) for p in pages] == ref
+
+@pytest.mark.parametrize("engine", ["py", "auto"])
+def test_grid_finds_four_up_labels(engine, monkeypatch):
+    monkeypatch.setattr(splitter, "SPLIT_ENGINE", engine)
+    rng = random.Random(1234)
+    for _ in range(4):
+        sheet, expected = make_four_up(rng)
+        assert splitter.detect_split_structure(sheet, mode="grid") == expected
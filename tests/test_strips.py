@@ -0,0 +1,35 @@
+# Banded extraction (pages over PDFCONV_MEM_BUDGET_MB) must write the same pixels as the
+# whole-page path, whatever band a part starts in.
+import os
+
+import pytest
+from PIL import Image
+
+import renderers
+import strips
+from extract import auto_split_items, extract_page_banded, save_page_parts
+from page_cache import PageRenderCache
+
+pytestmark = pytest.mark.skipif(not renderers.PYMUPDF_AVAIL, reason="banded rendering needs PyMuPDF")
+
+@pytest.mark.parametrize("fmt", strips.STREAM_FORMATS)
+def test_banded_matches_whole_page(label_pdf, tmp_path, monkeypatch, fmt):
+    cache = PageRenderCache(label_pdf, None, renderer="pymupdf")
+    try:
+        items = [it for it in auto_split_items(cache, 1) if it["page"] == 1]
+        assert len(items) > 1
+        whole = save_page_parts(cache.get(1), 1, items, str(tmp_path), "whole", fmt)
+        source = (cache.pdf_path, None, cache.renderer.name, cache.dpi)
+    finally:
+        cache.close()
+
+    # 8 MB: bands of a few hundred rows, so the lower part starts partway into one
+    monkeypatch.setattr(strips, "MEM_BUDGET_BYTES", 8 * 1024 * 1024)
+    banded = extract_page_banded(source, 1, items, str(tmp_path), "banded", fmt)[1]
+
+    assert len(banded) == len(whole)
+    for a, b in zip(sorted(r[0] for r in whole), sorted(r[0] for r in banded)):
+        assert os.path.basename(b).replace("banded", "whole") == os.path.basename(a)
+        with Image.open(a) as want, Image.open(b) as got:
+            assert got.size == want.size
+            assert got.convert("RGB").tobytes() == want.convert("RGB").tobytes()
@@ -0,0 +1,161 @@
+import io
+import os
+import time
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ExifTags
+
+from convert import open_image
+
+# --- THUMBNAIL PIPELINE ---
+# Gallery tiles are ~120 px, so decoding a 12-48 MP photo in full is wasted work.
+# Cheapest source first:
+#   exif   - the camera's embedded EXIF thumbnail (if it is big enough and has the photo's aspect)
+#   draft  - reduced-scale decode: JPEG DCT scaling (1/2, 1/4, 1/8) or a HEIF embedded thumbnail
+#   full   - full decode, then downscale
+# Set PDFCONV_THUMB_DECODE=full to force the full path (comparisons / debugging).
+THUMB_DECODE = os.environ.get("PDFCONV_THUMB_DECODE", "auto").lower()
+EXIF_ASPECT_TOL = 0.02     # Some cameras letterbox 16:9 photos into a 4:3 thumbnail; those are skipped
+
+JPEG_IF_OFFSET, JPEG_IF_LENGTH = 0x0201, 0x0202
+
+class ThumbStats:
+    # Per-method count and decode time, shared by every gallery (loader threads add to it)
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def add(self, method, seconds):
+        with self.lock:
+            n, total = self.data.get(method, (0, 0.0))
+            self.data[method] = (n + 1, total + seconds)
+
+    def summary(self):
+        with self.lock:
+            items = sorted(self.data.items())
+        return ", ".join(f"{m}: {n} x {total / n * 1000:.1f} ms" for m, (n, total) in items) or "no thumbnails"
+
+    def as_dict(self):
+        with self.lock:
+            return {m: {"count": n, "avg_ms": round(total / n * 1000, 2)} for m, (n, total) in sorted(self.data.items())}
+
+STATS = ThumbStats()
+
+def fit_size(size, box):
+    # Size of `size` scaled down to fit inside `box` (never up)
+    scale = min(box[0] / size[0], box[1] / size[1], 1.0)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+def _exif_thumbnail(im, target):
+    raw = im.info.get("exif")
+    if not raw: return None
+    if raw.startswith(b"Exif\x00\x00"): raw = raw[6:]
+    try:
+        ifd1 = im.getexif().get_ifd(ExifTags.IFD.IFD1)
+        off, length = ifd1.get(JPEG_IF_OFFSET), ifd1.get(JPEG_IF_LENGTH)
+        if not off or not length: return None
+        thumb = Image.open(io.BytesIO(raw[off:off + length]))
+        thumb.load()
+    except Exception:
+        return None
+    w, h = im.size
+    tw, th = thumb.size
+    if abs(tw / th - w / h) > EXIF_ASPECT_TOL * (w / h): return None
+    if tw < target[0] or th < target[1]: return None
+    return thumb
+
+# Returns an image that fits inside `size`. The method that produced it and its time go to
+# `stats` (a gallery's own ThumbStats) or the process-wide STATS.
+def make_thumbnail(path, size, stats=None):
+    t0 = time.perf_counter()
+    with open_image(path) as im:
+        target = fit_size(im.size, size)
+        method = "full"
+        thumb = None
+        if THUMB_DECODE != "full":
+            thumb = _exif_thumbnail(im, target)
+            if thumb is not None:
+                method = "exif"
+            else:
+                full_size = im.size
+                im.draft(None, target)
+                if im.size != full_size: method = "draft"
+        if thumb is None:
+            im.thumbnail(size, reducing_gap=None if THUMB_DECODE == "full" else 2.0)
+            thumb = im.copy()  # detach from the file before it is closed
+        else:
+            thumb.thumbnail(size)
+    (stats or STATS).add(method, time.perf_counter() - t0)
+    return thumb
+
+# --- IN-MEMORY THUMBNAIL STORE ---
+# Thumbnails made by a worker (PDF segment previews) reach the gallery as PIL images, with no
+# file round trip. Up to `budget` bytes stay in memory; past that the oldest are spilled to
+# JPEGs in a private temp dir (created on the first spill) and decoded again on demand.
+THUMB_MEM_BYTES = 64 * 1024 * 1024    # ~1100 tiles of 120x160 RGB
+
+def _bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+class ThumbStore:
+    def __init__(self, budget=THUMB_MEM_BYTES):
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.mem = OrderedDict()     # key -> PIL image (LRU)
+        self.files = {}              # key -> spilled JPEG
+        self.bytes = 0
+        self.dir = None
+
+    def put(self, key, img):
+        with self.lock:
+            prev = self.mem.pop(key, None)
+            if prev is not None: self.bytes -= _bytes(prev)
+            self.mem[key] = img
+            self.bytes += _bytes(img)
+            while self.bytes > self.budget and len(self.mem) > 1:
+                old, old_img = self.mem.popitem(last=False)
+                self.bytes -= _bytes(old_img)
+                if self.dir is None: self.dir = tempfile.mkdtemp(prefix="pdfconv_thumbs_")
+                path = os.path.join(self.dir, f"{len(self.files)}.jpg")
+                old_img.save(path, "JPEG", quality=90)
+                self.files[old] = path
+
+    def peek(self, key):
+        # In-memory thumbnail or None; never touches the disk (safe on the UI thread)
+        with self.lock:
+            img = self.mem.get(key)
+            if img is not None: self.mem.move_to_end(key)
+            return img
+
+    def get(self, key):
+        img = self.peek(key)
+        if img is not None: return img
+        path = self.files.get(key)
+        if path is None: return None
+        with Image.open(path) as f:
+            return f.copy()
+
+    def write(self, key, path):
+        # Persists one thumbnail as a JPEG (split cache); False if the key is unknown
+        src = self.files.get(key)
+        if src:
+            shutil.copyfile(src, path)
+            return True
+        img = self.peek(key)
+        if img is None: return False
+        img.save(path, "JPEG", quality=90)
+        return True
+
+    def spilled(self):
+        return len(self.files)
+
+    def close(self):
+        with self.lock:
+            self.mem.clear()
+            self.files.clear()
+            self.bytes = 0
+            folder, self.dir = self.dir, None
+        if folder: shutil.rmtree(folder, ignore_errors=True)
@@ -0,0 +1,153 @@
+import os
+import time
+import queue
+import shutil
+import signal
+import threading
+
+# --- DEPENDENCY CHECK: WATCHDOG ---
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAIL = True
+except ImportError:
+    WATCHDOG_AVAIL = False
+    FileSystemEventHandler = object
+
+QUEUE_SIZE = 32          # Paths waiting for a worker; a burst beyond this is picked up by a rescan
+SETTLE_SECONDS = 1.0     # A new file must keep the same size this long before it is opened
+SETTLE_TIMEOUT = 300     # Give up on files that are still growing after 5 minutes
+
+# --- EVENT HANDLER ---
+# Runs on the observer thread and never blocks it: a full queue only sets a flag.
+class _PdfEvents(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory: self.watcher.offer(event.src_path)
+
+    def on_moved(self, event):
+        # Atomic "write temp file, rename to .pdf" drops arrive as moves
+        if not event.is_directory: self.watcher.offer(event.dest_path)
+
+    def on_closed(self, event):
+        # inotify IN_CLOSE_WRITE (Linux): the writer is done
+        if not event.is_directory: self.watcher.offer(event.src_path)
+
+# --- WATCH-FOLDER DAEMON ---
+# New PDFs in `inbox` are auto-split and extracted at `dpi` like the PDF to Image card
+# (outputs keep the {base}_p{n}[_{sub}] naming), then moved to done_dir, or to
+# failed_dir on error. Discovery is event-driven (inotify / FSEvents / ReadDirectoryChangesW
+# via watchdog); memory is bounded by a fixed-size path queue and `jobs` documents in
+# flight, each with its own bounded page cache. Events that arrive while the queue is
+# full are not lost: the inbox is rescanned once the queue has room again.
+#   process(pdf_path) -> number of images written; raises on failure
+#   log(msg)          -> progress lines
+class FolderWatcher:
+    def __init__(self, inbox, process, done_dir, failed_dir, jobs=1, queue_size=QUEUE_SIZE, log=print):
+        self.inbox = os.path.abspath(inbox)
+        self.process = process
+        self.done_dir, self.failed_dir = done_dir, failed_dir
+        self.jobs = max(1, jobs)
+        self.log = log
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.known = set()            # queued or in progress
+        self.lock = threading.Lock()
+        self.overflow = threading.Event()
+        self.stop_event = threading.Event()
+        self.processed = self.failed = 0
+
+    def offer(self, path):
+        path = os.path.abspath(path)
+        if not path.lower().endswith(".pdf") or os.path.dirname(path) != self.inbox: return
+        with self.lock:
+            if path in self.known: return
+            try: self.queue.put_nowait(path)
+            except queue.Full:
+                self.overflow.set()   # backpressure: drop the event, rescan later
+                return
+            self.known.add(path)
+
+    def rescan(self):
+        self.overflow.clear()
+        for name in sorted(os.listdir(self.inbox)):
+            if self.queue.full():
+                self.overflow.set()
+                break
+            self.offer(os.path.join(self.inbox, name))
+
+    # --- WORKERS ---
+    def _wait_settled(self, path):
+        deadline = time.monotonic() + SETTLE_TIMEOUT
+        last = -1
+        while not self.stop_event.is_set() and time.monotonic() < deadline:
+            try: size = os.path.getsize(path)
+            except OSError: return False      # removed before we got to it
+            if size == last and size > 0: return True
+            last = size
+            self.stop_event.wait(SETTLE_SECONDS)
+        return False
+
+    def _move(self, path, folder):
+        os.makedirs(folder, exist_ok=True)
+        base, ext = os.path.splitext(os.path.basename(path))
+        target = os.path.join(folder, base + ext)
+        n = 1
+        while os.path.exists(target):
+            target = os.path.join(folder, f"{base} ({n}){ext}")
+            n += 1
+        shutil.move(path, target)
+        return target
+
+    def _worker(self):
+        while not self.stop_event.is_set():
+            try: path = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                if self.overflow.is_set(): self.rescan()
+                continue
+            try:
+                if not self._wait_settled(path): continue
+                t0 = time.perf_counter()
+                try:
+                    count = self.process(path)
+                    self._move(path, self.done_dir)
+                    self.processed += 1
+                    self.log(f"{os.path.basename(path)}: {count} images in {time.perf_counter() - t0:.1f}s")
+                except Exception as e:
+                    self.failed += 1
+                    self.log(f"error: {os.path.basename(path)}: {type(e).__name__}: {e}")
+                    try: self._move(path, self.failed_dir)
+                    except OSError: pass
+            finally:
+                with self.lock: self.known.discard(path)
+                self.queue.task_done()
+                if self.overflow.is_set() and not self.queue.full(): self.rescan()
+
+    # --- LIFECYCLE ---
+    def run(self):
+        if not WATCHDOG_AVAIL:
+            raise ImportError("watchdog is not installed (pip install watchdog)")
+        observer = Observer()
+        observer.schedule(_PdfEvents(self), self.inbox, recursive=False)
+        observer.start()
+        workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.jobs)]
+        for t in workers: t.start()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *a: self.stop())  # service managers: finish the current PDFs, then exit
+        self.rescan()  # files dropped while we were not running
+        self.log(f"watching {self.inbox} ({self.jobs} job(s), queue {self.queue.maxsize})")
+        try:
+            while not self.stop_event.is_set():
+                self.stop_event.wait(1.0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_event.set()
+            observer.stop()
+            observer.join()
+            for t in workers: t.join()
+        return self.failed
+
+    def stop(self):
+        self.stop_event.set()